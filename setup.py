@@ -31,6 +31,8 @@ setup(
     ],
     scripts=[
         'bin/txtcomplexity',
+        'bin/txtcomplexity-index',
+        'bin/txtcomplexity-server',
     ],
     package_data={
         "textcomplexity": ["de.json",
@@ -44,7 +46,6 @@ setup(
     install_requires=[
         "networkx",
         "nltk",
-        "nltk_tgrep",
         "numpy",
         "scipy",
     ],
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+
+def analyze_many(documents, preset="core", lang="none", jobs=1, **kwargs):
+    """Compute the measures of a preset for an iterable of documents
+    (texts in CoNLL-U format or parsed Document objects) and return an
+    iterator over their results. See textcomplexity.api.analyze_many.
+
+    """
+    # importing textcomplexity itself stays cheap
+    from textcomplexity import api
+    return api.analyze_many(documents, preset, lang, jobs, **kwargs)
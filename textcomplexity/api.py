@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import argparse
+import atexit
+import collections
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from textcomplexity import cli
+from textcomplexity.utils.document import Document
+from textcomplexity.utils.token import TokenArray
+from textcomplexity.utils.treebank import DependencyTrees
+from textcomplexity.utils.vocabulary import Vocabulary
+
+# chunk size for the documents that are sent to worker processes
+CHUNK_SIZE = 8
+# number of chunks per worker process that are submitted before the
+# first result is awaited
+PENDING_CHUNKS_PER_JOB = 2
+# worker pools keyed by number of jobs and options (see analyze_many)
+_pools = {}
+# options, language definition and vocabularies of a worker process
+# (see _init_worker)
+_worker_state = None
+
+
+@functools.lru_cache(maxsize=None)
+def language_definition(lang, lang_def, ignore_case):
+    """Language definitions are read once per process."""
+    return cli.language_definition(argparse.Namespace(lang=lang, lang_def=lang_def, ignore_case=ignore_case))
+
+
+def options(preset="core", lang="none", lang_def=None, window_size=1000, ignore_case=False, ignore_punct=False, trust_input=False):
+    """Return the arguments of txtcomplexity for the given options.
+    Raise ValueError for invalid options.
+
+    """
+    argv = ["--preset", preset, "--lang", lang, "--window-size", str(window_size), "--no-cache", "-i", "conllu"]
+    if lang_def is not None:
+        argv.extend(["--lang-def", lang_def])
+    for flag, value in (("--ignore-case", ignore_case), ("--ignore-punct", ignore_punct), ("--trust-input", trust_input)):
+        if value:
+            argv.append(flag)
+    try:
+        args = cli.arguments(argv)
+    except SystemExit:
+        raise ValueError("Invalid options (see txtcomplexity -h)")
+    if lang_def is not None and lang != "other":
+        raise ValueError("If you provide a language definition file, you need to set lang='other'")
+    if lang == "other" and lang_def is None:
+        raise ValueError("If you set lang='other', then you must provide a language definition file via lang_def")
+    if ignore_punct and not language_definition(args.lang, args.lang_def, args.ignore_case).punct_tags:
+        raise ValueError("ignore_punct requires a language with punctuation tags")
+    return args
+
+
+def analyze_document(document, args, ld, vocabularies):
+    """Compute the measures selected via args for a document, i.e. a
+    text in CoNLL-U format or a Document. Return a list of Result
+    tuples.
+
+    """
+    if isinstance(document, str):
+        f = io.StringIO(document)
+        f.name = "<document>"
+        return cli.analyze(f, args, ld, vocabularies)
+    if not isinstance(document, Document):
+        raise TypeError("Documents have to be strings in CoNLL-U format or Document objects, not %s" % type(document).__name__)
+    if document.dependency_trees is None and cli.DEPENDENCIES in cli.requirements(args, ld):
+        raise ValueError("The preset %s requires dependency trees" % args.preset)
+    tokens = document.tokens
+    if args.ignore_punct:
+        tokens = cli.without_punctuation(tokens, ld)
+    return cli.compute_measures(tokens, document, document.dependency_trees, None, args, ld)
+
+
+def _local_ids(ids, vocabulary):
+    """Return ids translated to a list of the strings of vocabulary
+    that occur in ids (in order of first occurrence) and this list.
+    Negative ids are kept.
+
+    """
+    ids = np.asarray(ids)
+    known = ids >= 0
+    unique, first, inverse = np.unique(ids[known], return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    ranks = np.empty(len(order), dtype=np.intc)
+    ranks[order] = np.arange(len(order), dtype=np.intc)
+    local_ids = np.full(len(ids), -1, dtype=np.intc)
+    local_ids[known] = ranks[inverse]
+    return local_ids, [vocabulary[i] for i in unique[order].tolist()]
+
+
+def _pack(document):
+    """Return what a worker process needs of a Document: its id arrays
+    and only those strings of its (possibly corpus-level) vocabularies
+    that it uses. Other documents are returned unchanged.
+
+    """
+    if not isinstance(document, Document):
+        return document
+    tokens, trees = document.tokens, document.dependency_trees
+    packed = {"words": _local_ids(tokens.word_ids, tokens.words),
+              "tags": _local_ids(tokens.tag_ids, tokens.tags),
+              "sentence_offsets": document.sentence_offsets}
+    if document.upos_ids is not None:
+        packed["upos"] = _local_ids(document.upos_ids, document.upos)
+    if trees is not None:
+        packed["dependency_trees"] = (trees.heads, _local_ids(trees.relations, trees.relation_vocabulary), trees.positions, trees.offsets, trees.graphs)
+    return packed
+
+
+def _unpack(packed):
+    """Inverse of _pack."""
+    if not isinstance(packed, dict):
+        return packed
+    (word_ids, words), (tag_ids, tags) = packed["words"], packed["tags"]
+    tokens = TokenArray(word_ids, tag_ids, Vocabulary(words), Vocabulary(tags))
+    upos_ids, upos = None, None
+    if "upos" in packed:
+        upos_ids, upos = packed["upos"][0], Vocabulary(packed["upos"][1])
+    trees = None
+    if "dependency_trees" in packed:
+        heads, (relations, relation_strings), positions, offsets, graphs = packed["dependency_trees"]
+        trees = DependencyTrees(heads, relations, positions, offsets, Vocabulary(relation_strings), graphs)
+    return Document(tokens, packed["sentence_offsets"], trees, upos_ids, upos)
+
+
+def _init_worker(args):
+    """Read the language definition once per worker process."""
+    global _worker_state
+    _worker_state = args, language_definition(args.lang, args.lang_def, args.ignore_case), cli.new_vocabularies()
+
+
+def _analyze_chunk_in_worker(chunk):
+    args, ld, vocabularies = _worker_state
+    return [analyze_document(_unpack(document), args, ld, vocabularies) for document in chunk]
+
+
+def _pool(jobs, args):
+    """Return a worker pool for args, which is created once and reused
+    by later calls.
+
+    """
+    key = (jobs, tuple(sorted((name, str(value)) for name, value in vars(args).items())))
+    if key not in _pools:
+        _pools[key] = multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(args,))
+    return _pools[key]
+
+
+@atexit.register
+def close():
+    """Shut down the worker pools of analyze_many."""
+    while _pools:
+        key, pool = _pools.popitem()
+        pool.terminate()
+        pool.join()
+
+
+def analyze_many(documents, preset="core", lang="none", jobs=1, **kwargs):
+    """Compute the measures of a preset for an iterable of documents and
+    return an iterator over a list of Result tuples for every document,
+    in input order. Documents are texts in CoNLL-U format or Document
+    objects, e.g. read with
+    textcomplexity.utils.conllu.read_conllu_document.
+
+    Further keyword arguments are the options of txtcomplexity (see
+    options). Results are computed lazily. Language definitions are
+    read once and, with jobs > 1 (or jobs = 0 for all CPUs), the
+    worker processes are kept for later calls with the same options
+    (see close). At most PENDING_CHUNKS_PER_JOB chunks of CHUNK_SIZE
+    documents per worker are read ahead of the results.
+
+    """
+    args = options(preset, lang, **kwargs)
+    if jobs < 0:
+        raise ValueError("The number of jobs must not be negative")
+    if jobs == 0:
+        jobs = os.cpu_count()
+    if jobs == 1:
+        return _analyze_serially(documents, args, language_definition(args.lang, args.lang_def, args.ignore_case))
+    return _analyze_in_pool(documents, _pool(jobs, args), jobs * PENDING_CHUNKS_PER_JOB)
+
+
+def _analyze_serially(documents, args, ld):
+    vocabularies = cli.new_vocabularies()
+    for document in documents:
+        yield analyze_document(document, args, ld, vocabularies)
+
+
+def _analyze_in_pool(documents, pool, max_pending):
+    """Submit chunks of documents to pool as their results are consumed,
+    so that at most max_pending chunks are in flight.
+
+    """
+    documents = iter(documents)
+    pending = collections.deque()
+    while True:
+        chunk = [_pack(document) for document in itertools.islice(documents, CHUNK_SIZE)]
+        if chunk:
+            pending.append(pool.apply_async(_analyze_chunk_in_worker, (chunk,)))
+        if not pending:
+            break
+        if len(pending) >= max_pending or not chunk:
+            yield from pending.popleft().get()
@@ -2,19 +2,46 @@
 
 import argparse
 import collections
+import contextlib
+import fnmatch
 import functools
+import io
 import itertools
 import json
+import math
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
 
 from textcomplexity import surface, sentence, pos, dependency, constituency
+from textcomplexity.streaming import StreamingAnalysis
+from textcomplexity.version import __version__
 from textcomplexity.utils.text import Text
-from textcomplexity.utils import conllu, custom_tsv, misc
+from textcomplexity.utils.token import TokenArray
+from textcomplexity.utils.cache import ResultCache
+from textcomplexity.utils.store import CorpusStore
+from textcomplexity.utils.vocabulary import Vocabulary
+from textcomplexity.utils import conllu, custom_tsv, misc, npz, shards, writers
 
 Result = collections.namedtuple("Result", ["name", "value", "stdev", "length", "length_stdev"])
+LanguageDefinition = collections.namedtuple("LanguageDefinition", ["language", "punct_tags", "name_tags", "open_tags", "reference_frequency_list"])
+Vocabularies = collections.namedtuple("Vocabularies", ["words", "tags", "upos", "relations", "labels"])
+# A complexity measure with the presets it belongs to and the
+# representations of the input it requires (see requirements)
+Measure = collections.namedtuple("Measure", ["function", "name", "lexical_core", "core", "extended_core", "requires"])
+TOKENS, TAGS, SENTENCES, DEPENDENCIES, CONSTITUENTS = "tokens", "tags", "sentences", "dependencies", "constituents"
+# number of sentences that are processed at once in streaming mode
+STREAMING_BATCH_SIZE = 10000
+# number of documents of a corpus store that are passed to a worker
+# process at once
+STORE_CHUNK_SIZE = 64
 
 
-def arguments():
+def arguments(argv=None):
     presets = {"lexical_core": "type_token_ratio evenness gini_based_dispersion rarity lexical_density average_token_length".split(),
                "core": "log_text_length_tokens sentence_length_tokens sentence_length_words punctuation_per_sentence average_dependency_distance closeness_centrality dependents_per_word".split(),
                "extended_core": "sichel_s honore_h simpson_d constituents_wo_leaves height t_units".split(),
@@ -27,141 +54,309 @@ def arguments():
     parser.add_argument("--ignore-punct", action="store_true", help="Ignore punctuation for surface-based and pos-based complexity measures (using the part-of-speech tags defined via --lang and --lang-def)")
     parser.add_argument("--ignore-case", action="store_true", help="Ignore case for surface-based and pos-based complexity measures")
     parser.add_argument("--window-size", default=1000, type=int, help="Window size for vocabulary-based complexity measures (default: 1000)")
-    parser.add_argument("-i", "--input-format", choices=["conllu", "tsv"], required=True, help="Format of the input files.")
-    parser.add_argument("-o", "--output-format", choices=["json", "tsv"], default="json", help="Format for outputting the results (default: json).")
-    parser.add_argument("TEXT", type=argparse.FileType("r", encoding="utf-8"), nargs="+", help="Input files. Paths to files or \"-\" for STDIN. Input files need to be text files in CoNLL-U format or in our custom format with six tab-separated columns and an empty line after each sentence. Missing values can be replaced with an underscore (_). Examples for both input formats can be found in README.md")
-    return parser.parse_args()
+    parser.add_argument("--trust-input", action="store_true", help="Do not check if the dependency annotation of every sentence is a sensible syntactic representation (i.e. rooted and connected). Only use this option for input that is known to be valid")
+    parser.add_argument("--streaming", action="store_true", help="Process CoNLL-U input sentence batch by sentence batch instead of reading whole files into memory. Results are the same, but every file is read twice (the first pass determines the text length). Use this for files that do not fit into memory")
+    parser.add_argument("-j", "--jobs", default=1, type=int, help="Number of worker processes that analyze input files in parallel; 0 uses all CPUs (default: 1). Results are the same as with a single process")
+    parser.add_argument("--shard-size", default=8, type=float, help="With --jobs, CoNLL-U files that are larger than this (in megabytes) are split into shards that are analyzed in parallel (default: 8). Results are the same as for the whole file")
+    parser.add_argument("--unordered", action="store_true", help="With --jobs, output results as soon as they are available instead of in input order")
+    parser.add_argument("--no-cache", action="store_true", help="Do not look up or store results in the result cache. By default, the results for every input file are cached, keyed by the file content and the options that influence the results")
+    parser.add_argument("--cache-dir", help="Directory of the result cache (default: $XDG_CACHE_HOME/textcomplexity or ~/.cache/textcomplexity)")
+    parser.add_argument("--cache-size", default=1024, type=float, help="Maximum size of the result cache in megabytes; the least recently used results are removed (default: 1024)")
+    parser.add_argument("-i", "--input-format", choices=["conllu", "tsv", "npz", "store"], required=True, help="Format of the input files. npz: binary files created with txtcomplexity-index from CoNLL-U or TSV files, which are read without parsing; store: corpus stores created with txtcomplexity-index --store, i.e. TEXT are store directories and every document in them is analyzed (results are not cached)")
+    parser.add_argument("-o", "--output-format", choices=["json", "jsonl", "tsv"], default="json", help="Format for outputting the results (default: json). The results for every file are written as soon as they are available. jsonl: one JSON object per line and file; tsv: one line per file with a fixed set of columns")
+    parser.add_argument("--input-list", metavar="FILE", help="File with the paths of further input files, one per line, or \"-\" for STDIN")
+    parser.add_argument("--glob", default="*", help="Pattern for the names of the files that are analyzed in input directories (default: *)")
+    parser.add_argument("TEXT", nargs="*", help="Input files. Paths to files, to directories (that are searched recursively for files matching --glob) or \"-\" for STDIN. Input files need to be text files in CoNLL-U format or in our custom format with six tab-separated columns and an empty line after each sentence. Missing values can be replaced with an underscore (_). Examples for both input formats can be found in README.md. Files are only opened when they are analyzed")
+    return parser.parse_args(argv)
 
 
-def surface_based(tokens, window_size, preset):
-    """"""
-    results = []
+def _in_preset(measure, preset):
+    """Does the Measure belong to preset?"""
+    return (preset == "lexical_core" and measure.lexical_core) or (preset == "core" and measure.core) or (preset == "extended_core" and measure.extended_core) or (preset == "all")
+
+
+def _selected(measures, preset):
+    """Return function and name of all measures in a list of Measure
+    tuples that belong to preset.
+
+    """
+    return [(measure.function, measure.name) for measure in measures if _in_preset(measure, preset)]
+
+
+def _evaluate(measure, data):
+    """Apply measure to data or, if data is a StreamingAnalysis, look up
+    its accumulated result.
+
+    """
+    if isinstance(data, StreamingAnalysis):
+        return data.evaluate(measure)
+    return measure(data)
+
+
+def surface_measures():
+    """Surface-based measures that are computed for disjoint windows."""
     gbd = functools.partial(surface.gini_based_dispersion, exclude_hapaxes=True)
     ebd = functools.partial(surface.evenness_based_dispersion, exclude_hapaxes=True)
-    measures = [(surface.type_token_ratio, "type-token ratio", True, True, True),
-                (surface.guiraud_r, "Guiraud's R", False, False, False),
-                (surface.herdan_c, "Herdan's C", False, False, False),
-                (surface.dugast_k, "Dugast's k", False, False, False),
-                (surface.maas_a2, "Maas' a²", False, False, False),
-                (surface.dugast_u, "Dugast's U", False, False, False),
-                (surface.tuldava_ln, "Tuldava's LN", False, False, False),
-                (surface.brunet_w, "Brunet's W", False, False, False),
-                (surface.cttr, "CTTR", False, False, False),
-                (surface.summer_s, "Summer's S", False, False, False),
-                (surface.sichel_s, "Sichel's S", False, False, True),
-                (surface.michea_m, "Michéa's M", False, False, False),
-                (surface.honore_h, "Honoré's H", False, False, True),
-                (surface.entropy, "entropy", False, False, False),
-                (surface.evenness, "evenness", True, True, True),
-                (surface.jarvis_evenness, "Jarvis's evenness", False, False, False),
-                (surface.yule_k, "Yule's K", False, False, False),
-                (surface.simpson_d, "Simpson's D", False, False, True),
-                (surface.herdan_vm, "Herdan's Vm", False, False, False),
-                (surface.hdd, "HD-D", False, False, False),
-                (surface.average_token_length, "average token length", True, True, True),
-                (surface.orlov_z, "Orlov's Z", False, False, False),
-                (gbd, "Gini-based dispersion", True, True, True),
-                (ebd, "evenness-based dispersion", True, True, True),
-                ]
+    return [Measure(surface.type_token_ratio, "type-token ratio", True, True, True, {TOKENS}),
+            Measure(surface.guiraud_r, "Guiraud's R", False, False, False, {TOKENS}),
+            Measure(surface.herdan_c, "Herdan's C", False, False, False, {TOKENS}),
+            Measure(surface.dugast_k, "Dugast's k", False, False, False, {TOKENS}),
+            Measure(surface.maas_a2, "Maas' a²", False, False, False, {TOKENS}),
+            Measure(surface.dugast_u, "Dugast's U", False, False, False, {TOKENS}),
+            Measure(surface.tuldava_ln, "Tuldava's LN", False, False, False, {TOKENS}),
+            Measure(surface.brunet_w, "Brunet's W", False, False, False, {TOKENS}),
+            Measure(surface.cttr, "CTTR", False, False, False, {TOKENS}),
+            Measure(surface.summer_s, "Summer's S", False, False, False, {TOKENS}),
+            Measure(surface.sichel_s, "Sichel's S", False, False, True, {TOKENS}),
+            Measure(surface.michea_m, "Michéa's M", False, False, False, {TOKENS}),
+            Measure(surface.honore_h, "Honoré's H", False, False, True, {TOKENS}),
+            Measure(surface.entropy, "entropy", False, False, False, {TOKENS}),
+            Measure(surface.evenness, "evenness", True, True, True, {TOKENS}),
+            Measure(surface.jarvis_evenness, "Jarvis's evenness", False, False, False, {TOKENS}),
+            Measure(surface.yule_k, "Yule's K", False, False, False, {TOKENS}),
+            Measure(surface.simpson_d, "Simpson's D", False, False, True, {TOKENS}),
+            Measure(surface.herdan_vm, "Herdan's Vm", False, False, False, {TOKENS}),
+            Measure(surface.hdd, "HD-D", False, False, False, {TOKENS}),
+            Measure(surface.average_token_length, "average token length", True, True, True, {TOKENS}),
+            Measure(surface.orlov_z, "Orlov's Z", False, False, False, {TOKENS}),
+            Measure(gbd, "Gini-based dispersion", True, True, True, {TOKENS}),
+            Measure(ebd, "evenness-based dispersion", True, True, True, {TOKENS}),
+            ]
+
+
+def surface_based(tokens, window_size, preset):
+    """tokens is a TokenArray or a StreamingAnalysis."""
+    results = []
+    streamed = isinstance(tokens, StreamingAnalysis)
     if preset != "lexical_core":
-        text = Text.from_tokens(tokens)
-        results.append(Result("log10 text length", surface.log_text_length_tokens(text), None, None, None))
-    for measure, name, lexical_core, core, extended_core in measures:
-        if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
+        if streamed:
+            log_text_length = math.log10(tokens.text_length)
+        else:
+            text = Text.from_tokens(tokens)
+            log_text_length = surface.log_text_length_tokens(text)
+        results.append(Result("log10 text length", log_text_length, None, None, None))
+    selected = _selected(surface_measures(), preset)
+    if selected:
+        if streamed:
+            bootstrapped = tokens.bootstrap()
+        else:
+            bootstrapped = misc.bootstrap_measures([measure for measure, name in selected], tokens, window_size, strategy="spread", batch_measures=surface.BATCH_MEASURES)
+        for (measure, name), (mean, stdev, _) in zip(selected, bootstrapped):
             name += " (disjoint windows)"
-            mean, stdev, _ = misc.bootstrap(measure, tokens, window_size, strategy="spread")
             results.append(Result(name, mean, stdev, None, None))
     if preset == "all":
-        results.append(Result("log10 text length (characters)", surface.log_text_length_characters(text), None, None, None))
-        mattr = surface.mattr(text, window_size)
+        if streamed:
+            log_text_length_characters = math.log10(tokens.text_length_characters_value())
+            mattr, mtld = tokens.mattr_value(), tokens.mtld_value()
+        else:
+            log_text_length_characters = surface.log_text_length_characters(text)
+            mattr, mtld = surface.mattr(text, window_size), surface.mtld(text)
+        results.append(Result("log10 text length (characters)", log_text_length_characters, None, None, None))
         results.append(Result("type-token ratio (moving windows)", mattr, None, None, None))
-        mtld = surface.mtld(text)
         results.append(Result("MTLD", mtld, None, None, None))
     return results
 
 
-def sentence_based(sentences, punct_tags, preset):
+def sentence_measures(punct_tags):
     """"""
-    results = []
     pps = functools.partial(sentence.punctuation_per_sentence, punctuation=punct_tags)
-    ppt = functools.partial(sentence.punctuation_per_token, punctuation=punct_tags)
     slw = functools.partial(sentence.sentence_length_words, punctuation=punct_tags)
-    measures_with_punct = [(slw, "average sentence length (words)", False, True, True),
-                           (pps, "punctuation per sentence", False, True, True)]
-    measures_wo_punct = [(sentence.sentence_length_tokens, "average sentence length (tokens)", False, True, True),
-                         (sentence.sentence_length_characters, "average sentence length (characters)", False, False, False)]
+    measures_with_punct = [Measure(slw, "average sentence length (words)", False, True, True, {SENTENCES, TAGS}),
+                           Measure(pps, "punctuation per sentence", False, True, True, {SENTENCES, TAGS})]
+    measures_wo_punct = [Measure(sentence.sentence_length_tokens, "average sentence length (tokens)", False, True, True, {SENTENCES}),
+                         Measure(sentence.sentence_length_characters, "average sentence length (characters)", False, False, False, {SENTENCES})]
     if punct_tags:
-        measures = measures_with_punct + measures_wo_punct
-        if preset == "all":
-            results.append(Result("punctuation per token", ppt(sentences), None, None, None))
-    else:
-        measures = measures_wo_punct
-    for measure, name, lexical_core, core, extended_core in measures:
-        if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
-            value, stdev = measure(sentences)
-            results.append(Result(name, value, stdev, None, None))
-    return results
+        return measures_with_punct + measures_wo_punct
+    return measures_wo_punct
 
 
-def pos_based(tokens, punct_tags, name_tags, open_tags, reference_frequency_list, preset):
+def sentence_based(sentences, punct_tags, preset):
     """"""
     results = []
+    ppt = functools.partial(sentence.punctuation_per_token, punctuation=punct_tags)
+    if punct_tags and preset == "all":
+        results.append(Result("punctuation per token", _evaluate(ppt, sentences), None, None, None))
+    for measure, name in _selected(sentence_measures(punct_tags), preset):
+        value, stdev = _evaluate(measure, sentences)
+        results.append(Result(name, value, stdev, None, None))
+    return results
+
+
+def pos_measures(name_tags, open_tags, reference_frequency_list):
+    """"""
     lexd = functools.partial(pos.lexical_density, open_tags=open_tags)
     rar = functools.partial(pos.rarity, reference_frequency_list=reference_frequency_list, open_tags_ex_names=(open_tags - name_tags))
     measures = []
     if open_tags:
-        measures.append((lexd, "lexical density", True, True, True))
+        measures.append(Measure(lexd, "lexical density", True, True, True, {TOKENS, TAGS}))
     if reference_frequency_list:
-        measures.append((rar, "rarity", True, True, True))
-    text = Text.from_tokens(tokens)
-    for measure, name, lexical_core, core, extended_core in measures:
-        if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
-            results.append(Result(name, measure(text), None, None, None))
+        measures.append(Measure(rar, "rarity", True, True, True, {TOKENS, TAGS}))
+    return measures
+
+
+def pos_based(tokens, punct_tags, name_tags, open_tags, reference_frequency_list, preset):
+    """"""
+    results = []
+    text = tokens if isinstance(tokens, StreamingAnalysis) else Text.from_tokens(tokens)
+    for measure, name in _selected(pos_measures(name_tags, open_tags, reference_frequency_list), preset):
+        results.append(Result(name, _evaluate(measure, text), None, None, None))
     return results
 
 
-def dependency_based(graphs, preset):
+def dependency_measures():
+    """"""
+    return [Measure(dependency.average_dependency_distance, "average dependency distance", False, True, True, {DEPENDENCIES}),
+            Measure(dependency.closeness_centrality, "closeness centrality", False, True, True, {DEPENDENCIES}),
+            Measure(dependency.outdegree_centralization, "outdegree centralization", False, False, False, {DEPENDENCIES}),
+            Measure(dependency.closeness_centralization, "closeness centralization", False, False, False, {DEPENDENCIES}),
+            Measure(dependency.longest_shortest_path, "longest shortest path", False, False, False, {DEPENDENCIES}),
+            Measure(dependency.dependents_per_word, "dependents per word", False, True, True, {DEPENDENCIES})]
+
+
+def dependency_based(dependency_trees, preset):
     """"""
     results = []
-    measures = [(dependency.average_dependency_distance, "average dependency distance", False, True, True),
-                (dependency.closeness_centrality, "closeness centrality", False, True, True),
-                (dependency.outdegree_centralization, "outdegree centralization", False, False, False),
-                (dependency.closeness_centralization, "closeness centralization", False, False, False),
-                (dependency.longest_shortest_path, "longest shortest path", False, False, False),
-                (dependency.dependents_per_word, "dependents per word", False, True, True)]
-    for measure, name, lexical_core, core, extended_core in measures:
-        if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
-            value, stdev = measure(graphs)
-            results.append(Result(name, value, stdev, None, None))
+    for measure, name in _selected(dependency_measures(), preset):
+        value, stdev = _evaluate(measure, dependency_trees)
+        results.append(Result(name, value, stdev, None, None))
     return results
 
 
+def constituency_measures():
+    """Return the constituency-based measures that also compute the
+    lengths of the constituents (for the NEGRA parsing scheme) and
+    those that do not.
+
+    """
+    measures_with_length = [Measure(constituency.t_units, "t-units", False, False, True, {CONSTITUENTS}),
+                            Measure(constituency.complex_t_units, "complex t-units", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.clauses, "clauses", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.dependent_clauses, "dependent clauses", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.nps, "noun phrases", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.vps, "verb phrases", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.pps, "prepositional phrases", False, False, False, {CONSTITUENTS}),
+                            Measure(constituency.coordinate_phrases, "coordinate phrases", False, False, False, {CONSTITUENTS})]
+    measures_wo_length = [Measure(constituency.constituents, "constituents", False, False, False, {CONSTITUENTS}),
+                          Measure(constituency.constituents_wo_leaves, "non-terminal constituents", False, False, True, {CONSTITUENTS}),
+                          Measure(constituency.height, "parse tree height", False, False, True, {CONSTITUENTS})]
+    return measures_with_length, measures_wo_length
+
+
 def constituency_based(trees, de_negra, preset):
     """"""
     results = []
-    measures_with_length = [(constituency.t_units, "t-units", False, False, True),
-                            (constituency.complex_t_units, "complex t-units", False, False, False),
-                            (constituency.clauses, "clauses", False, False, False),
-                            (constituency.dependent_clauses, "dependent clauses", False, False, False),
-                            (constituency.nps, "noun phrases", False, False, False),
-                            (constituency.vps, "verb phrases", False, False, False),
-                            (constituency.pps, "prepositional phrases", False, False, False),
-                            (constituency.coordinate_phrases, "coordinate phrases", False, False, False)]
-    measures_wo_length = [(constituency.constituents, "constituents", False, False, False),
-                          (constituency.constituents_wo_leaves, "non-terminal constituents", False, False, True),
-                          (constituency.height, "parse tree height", False, False, True)]
+    measures_with_length, measures_wo_length = constituency_measures()
+    # lists of nltk trees are traversed only once for all measures
+    trees = constituency.analyze(trees)
     if de_negra:
-        for measure, name, lexical_core, core, extended_core in measures_with_length:
-            if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
-                value, stdev, length, length_sd = measure(trees)
-                results.append(Result(name, value, stdev, length, length_sd))
-    for measure, name, lexical_core, core, extended_core in measures_wo_length:
-        if (preset == "lexical_core" and lexical_core) or (preset == "core" and core) or (preset == "extended_core" and extended_core) or (preset == "all"):
-            value, stdev = measure(trees)
-            results.append(Result(name, value, stdev, None, None))
+        for measure, name in _selected(measures_with_length, preset):
+            value, stdev, length, length_sd = measure(trees)
+            results.append(Result(name, value, stdev, length, length_sd))
+    for measure, name in _selected(measures_wo_length, preset):
+        value, stdev = measure(trees)
+        results.append(Result(name, value, stdev, None, None))
     return results
 
 
+def result_names(args, ld, constituents=None):
+    """Names of the results of compute_measures for the measures
+    selected via args, in the same order. They can be used as a fixed
+    set of columns. constituents tells whether the input contains
+    constituency trees; by default, TSV input and binary files are
+    assumed to contain them.
+
+    """
+    preset = args.preset
+    names = []
+    if preset != "lexical_core":
+        names.append("log10 text length")
+    names.extend(name + " (disjoint windows)" for measure, name in _selected(surface_measures(), preset))
+    if preset == "all":
+        names.extend(["log10 text length (characters)", "type-token ratio (moving windows)", "MTLD"])
+    names.extend(name for measure, name in _selected(pos_measures(ld.name_tags, ld.open_tags, ld.reference_frequency_list), preset))
+    if ld.punct_tags and preset == "all":
+        names.append("punctuation per token")
+    names.extend(name for measure, name in _selected(sentence_measures(ld.punct_tags), preset))
+    names.extend(name for measure, name in _selected(dependency_measures(), preset))
+    if constituents is None:
+        constituents = args.input_format in ("tsv", "npz")
+    if constituents:
+        measures_with_length, measures_wo_length = constituency_measures()
+        if args.lang == "de":
+            names.extend(name for measure, name in _selected(measures_with_length, preset))
+        names.extend(name for measure, name in _selected(measures_wo_length, preset))
+    return names
+
+
+def requirements(args, ld):
+    """Return the set of representations of the input (TOKENS, TAGS,
+    SENTENCES, DEPENDENCIES, CONSTITUENTS) that the measures selected
+    via args require. Only these are built when reading the input.
+
+    """
+    measures_with_length, measures_wo_length = constituency_measures()
+    measures = surface_measures() + pos_measures(ld.name_tags, ld.open_tags, ld.reference_frequency_list) + sentence_measures(ld.punct_tags) + dependency_measures() + measures_wo_length
+    if args.lang == "de":
+        measures += measures_with_length
+    # every preset contains surface-based measures
+    required = {TOKENS}
+    for measure in measures:
+        if _in_preset(measure, args.preset):
+            required.update(measure.requires)
+    return required
+
+
+def _read_batches(f, args, vocabularies, rejections, dependencies=True):
+    """Read a CoNLL-U file in batches of sentences."""
+    words, tags, upos, relations, labels = vocabularies
+    return conllu.read_conllu_batches(f, batch_size=STREAMING_BATCH_SIZE, ignore_case=args.ignore_case, words=words, tags=tags, upos=upos, relation_vocabulary=relations, validate=not args.trust_input, rejections=rejections, dependencies=dependencies)
+
+
+def count_tokens(f, args, ld, vocabularies):
+    """Number of tokens in a CoNLL-U file (without punctuation, if
+    args.ignore_punct is set).
+
+    """
+    tags = vocabularies.tags
+    text_length = 0
+    for document in _read_batches(f, args, vocabularies, collections.Counter(), dependencies=False):
+        if args.ignore_punct:
+            punct_ids = [tags.ids[t] for t in ld.punct_tags if t in tags]
+            text_length += int(np.count_nonzero(~np.isin(document.tokens.tag_ids, punct_ids)))
+        else:
+            text_length += len(document.tokens)
+    return text_length
+
+
+def new_streaming_analysis(args, ld, text_length, span=None):
+    """Return a StreamingAnalysis for the measures selected via args."""
+    window_measures = [measure for measure, name in _selected(surface_measures(), args.preset)]
+    selected_dependency_measures = [measure for measure, name in _selected(dependency_measures(), args.preset)]
+    return StreamingAnalysis(text_length, args.window_size, window_measures, selected_dependency_measures, punct_tags=ld.punct_tags, open_tags=ld.open_tags, name_tags=ld.name_tags,
+                             reference_frequency_list=ld.reference_frequency_list, ignore_punct=args.ignore_punct, moving_windows=args.preset == "all", mtld=args.preset == "all",
+                             batch_measures=surface.BATCH_MEASURES, span=span)
+
+
+def streaming_analysis(f, args, ld, vocabularies, rejections):
+    """Read a CoNLL-U file twice in batches of sentences: first to
+    determine the text length, then to accumulate all measures in a
+    StreamingAnalysis. Input that is not seekable (e.g. STDIN) is
+    spooled to a temporary file first.
+
+    """
+    if not f.seekable():
+        spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        shutil.copyfileobj(f, spool)
+        f = spool
+    f.seek(0)
+    text_length = count_tokens(f, args, ld, vocabularies)
+    f.seek(0)
+    analysis = new_streaming_analysis(args, ld, text_length)
+    for document in _read_batches(f, args, vocabularies, rejections, DEPENDENCIES in requirements(args, ld)):
+        analysis.add(document)
+    return analysis
+
+
 def read_language_definition(filename):
     """"""
     with open(filename, encoding="utf-8") as f:
@@ -169,58 +364,462 @@ def read_language_definition(filename):
     return ld["language"], set(ld["punctuation"]), set(ld["proper_names"]), set(ld["open_classes"]), set([(t, f) for t, f in ld["most_common"]])
 
 
+def _language_definition_file(args):
+    """Return the path of the language definition file selected via
+    --lang and --lang-def (or None).
+
+    """
+    if args.lang in ("de", "en"):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "%s.json" % args.lang)
+    elif args.lang == "other":
+        assert args.lang_def is not None, "If you set --lang=other, then you must provide a language definition file via --lang-def"
+        return args.lang_def
+    return None
+
+
+def language_definition(args):
+    """Return the LanguageDefinition selected via --lang and --lang-def."""
+    language, punct_tags, name_tags, open_tags, reference_frequency_list = "none", set(), set(), set(), set()
+    filename = _language_definition_file(args)
+    if filename is not None:
+        language, punct_tags, name_tags, open_tags, reference_frequency_list = read_language_definition(filename)
+    if args.ignore_case:
+        reference_frequency_list = set([(w.lower(), t) for w, t in reference_frequency_list])
+    return LanguageDefinition(language, punct_tags, name_tags, open_tags, reference_frequency_list)
+
+
+def result_cache(args):
+    """Return the ResultCache selected via args (or None). The cache
+    key includes all options that influence the results.
+
+    """
+    if args.no_cache:
+        return None
+    filename = _language_definition_file(args)
+    lang_def = None
+    if filename is not None:
+        with open(filename, encoding="utf-8") as f:
+            lang_def = f.read()
+    options = {"version": __version__, "input_format": args.input_format, "preset": args.preset, "lang": args.lang, "lang_def": lang_def,
+               "window_size": args.window_size, "ignore_case": args.ignore_case, "ignore_punct": args.ignore_punct, "trust_input": args.trust_input}
+    cache_dir = args.cache_dir
+    if cache_dir is None:
+        cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "textcomplexity")
+    return ResultCache(cache_dir, int(args.cache_size * 2 ** 20), options)
+
+
+def new_vocabularies():
+    """Vocabularies for word forms, tags, dependency relations and
+    constituent labels that can be shared by several input files.
+
+    """
+    return Vocabularies(Vocabulary(), Vocabulary(), Vocabulary(), Vocabulary(), Vocabulary())
+
+
+def analyze(f, args, ld, vocabularies):
+    """Compute the measures selected via args for the input file f.
+    Return a list of Result tuples.
+
+    """
+    words, tags, upos, relations, labels = vocabularies
+    tokens, sentences, dependency_trees, ps_trees = None, None, None, None
+    required = requirements(args, ld)
+    dependencies, constituents = DEPENDENCIES in required, CONSTITUENTS in required
+    rejections = collections.Counter()
+    if args.streaming:
+        # all measures are accumulated while reading the file
+        analysis = streaming_analysis(f, args, ld, vocabularies, rejections)
+        tokens, sentences, dependency_trees = analysis, analysis, analysis
+    elif args.input_format == "conllu":
+        document = conllu.read_conllu_document(f, ignore_case=args.ignore_case, words=words, tags=tags, upos=upos, relation_vocabulary=relations, validate=not args.trust_input, rejections=rejections, dependencies=dependencies)
+        tokens, sentences, dependency_trees = document.tokens, document, document.dependency_trees
+    elif args.input_format == "tsv":
+        sentences, dependency_trees, ps_trees = custom_tsv.read_tsv_treebank(f, ignore_case=args.ignore_case, relation_vocabulary=relations, label_vocabulary=labels, validate=not args.trust_input, rejections=rejections, dependencies=dependencies, constituents=constituents)
+        tokens = TokenArray.from_tokens(list(itertools.chain.from_iterable(sentences)), words, tags)
+    elif args.input_format == "npz":
+        if not f.seekable():
+            f = io.BytesIO(f.read())
+        document, ps_trees = npz.load_document(f, ignore_case=args.ignore_case, words=words, tags=tags, upos=upos, relation_vocabulary=relations, label_vocabulary=labels, dependencies=dependencies, constituents=constituents)
+        tokens, sentences, dependency_trees = document.tokens, document, document.dependency_trees
+    conllu.log_rejections(f.name, rejections)
+    if args.ignore_punct and not args.streaming:
+        tokens = without_punctuation(tokens, ld)
+    return compute_measures(tokens, sentences, dependency_trees, ps_trees, args, ld)
+
+
+def without_punctuation(tokens, ld):
+    """Return the tokens whose tags are not punctuation tags of the
+    language definition ld.
+
+    """
+    tags = tokens.tags
+    return tokens[~np.isin(tokens.tag_ids, [tags.ids[t] for t in ld.punct_tags if t in tags])]
+
+
+@functools.lru_cache(maxsize=None)
+def open_store(directory, ignore_case):
+    """Open a CorpusStore once per process."""
+    return CorpusStore(directory, ignore_case)
+
+
+def analyze_store_document(directory, i, args, ld):
+    """Compute the measures selected via args for document i of a
+    CorpusStore. The arrays of the document are views into the
+    memory-mapped store. Return a name and a list of Result tuples.
+
+    """
+    store = open_store(directory, args.ignore_case)
+    document = store.document(i, dependencies=DEPENDENCIES in requirements(args, ld))
+    tokens = document.tokens
+    if args.ignore_punct:
+        tokens = without_punctuation(tokens, ld)
+    return store.names[i], compute_measures(tokens, document, document.dependency_trees, None, args, ld)
+
+
+def _analyze_store_document_in_worker(task):
+    """task is a tuple of store directory and document index."""
+    args, ld, vocabularies, cache = _worker_state
+    return analyze_store_document(*task, args, ld)
+
+
+def compute_measures(tokens, sentences, dependency_trees, ps_trees, args, ld):
+    """Return a list of Result tuples for the measures selected via
+    args. tokens, sentences and dependency_trees can also be a
+    StreamingAnalysis.
+
+    """
+    results = []
+    results.extend(surface_based(tokens, args.window_size, args.preset))
+    results.extend(pos_based(tokens, ld.punct_tags, ld.name_tags, ld.open_tags, ld.reference_frequency_list, args.preset))
+    results.extend(sentence_based(sentences, ld.punct_tags, args.preset))
+    results.extend(dependency_based(dependency_trees, args.preset))
+    if ps_trees is not None:
+        # We assume that German constituency trees follow the
+        # NEGRA parsing scheme
+        de_negra = args.lang == "de"
+        results.extend(constituency_based(ps_trees, de_negra, args.preset))
+    return results
+
+
+# language definition and vocabularies of a worker process (see
+# _init_worker)
+_worker_state = None
+
+
+def _init_worker(args):
+    """Read the language definition once per worker process."""
+    global _worker_state
+    _worker_state = args, language_definition(args), new_vocabularies(), result_cache(args)
+
+
+def _analyze_in_worker(task):
+    """Analyze a file in a worker process. task is a tuple of file name
+    and file content; the content is None if the worker can open the
+    file itself.
+
+    """
+    name, content = task
+    args, ld, vocabularies, cache = _worker_state
+    if content is None:
+        return name, analyze_path(name, args, ld, vocabularies, cache)
+    f = io.BytesIO(content) if isinstance(content, bytes) else io.StringIO(content)
+    f.name = name
+    return name, analyze(f, args, ld, vocabularies)
+
+
+def analyze_path(path, args, ld, vocabularies, cache=None):
+    """Like analyze, but for the path of an input file. If cache is a
+    ResultCache, the results are looked up there first (and stored
+    after the analysis). STDIN is not cached.
+
+    """
+    if path == "-":
+        return analyze(_stdin(args), args, ld, vocabularies)
+    key = None
+    if cache is not None:
+        key = cache.key(path)
+        cached = cache.get(key)
+        if cached is not None:
+            return [Result(*r) for r in cached]
+    with _open(path, args) as f:
+        results = analyze(f, args, ld, vocabularies)
+    if cache is not None:
+        cache.put(key, results)
+    return results
+
+
+def _count_shard(task):
+    """Count the tokens of a shard (see count_tokens) in a worker
+    process. task is a tuple of file name, start and end of the
+    shard.
+
+    """
+    filename, start, end = task
+    args, ld, vocabularies, cache = _worker_state
+    with shards.open_byte_range(filename, start, end) as f:
+        return count_tokens(f, args, ld, new_vocabularies())
+
+
+def _analyze_shard(task):
+    """Analyze a shard in a worker process. task is a tuple of file
+    name, start and end of the shard, span of its tokens and text
+    length. Return a StreamingAnalysis and the rejected sentences.
+
+    """
+    filename, start, end, span, text_length = task
+    args, ld, vocabularies, cache = _worker_state
+    vocabularies = new_vocabularies()
+    rejections = collections.Counter()
+    analysis = new_streaming_analysis(args, ld, text_length, span)
+    try:
+        with shards.open_byte_range(filename, start, end) as f:
+            for document in _read_batches(f, args, vocabularies, rejections, DEPENDENCIES in requirements(args, ld)):
+                analysis.add(document)
+    except BaseException:
+        analysis.close()
+        raise
+    return analysis, rejections
+
+
+def _byte_ranges(filename, args, jobs):
+    """Return the byte ranges of the shards of a file or None if the
+    file should be analyzed as a whole.
+
+    """
+    if args.input_format != "conllu" or filename == "-" or not os.path.isfile(filename):
+        return None
+    n = min(jobs, int(os.path.getsize(filename) // (args.shard_size * 2 ** 20)))
+    if n < 2:
+        return None
+    ranges = shards.split_at_blank_lines(filename, n)
+    if len(ranges) < 2:
+        return None
+    return ranges
+
+
+def analyze_shards(pool, filename, ranges, args, ld, cache=None):
+    """Analyze the shards of a CoNLL-U file in the worker processes of
+    pool and merge the results. The shards are read twice, first to
+    determine the positions of their tokens in the text. Return a list
+    of Result tuples. For cache, see analyze_path.
+
+    """
+    if cache is not None:
+        key = cache.key(filename)
+        cached = cache.get(key)
+        if cached is not None:
+            return [Result(*r) for r in cached]
+    counts = pool.map(_count_shard, [(filename, start, end) for start, end in ranges])
+    # every shard needs at least window_size tokens (see
+    # StreamingAnalysis), so small shards are joined with their
+    # neighbors
+    joined = []
+    for (start, end), count in zip(ranges, counts):
+        if joined and joined[-1][2] < args.window_size:
+            joined[-1] = (joined[-1][0], end, joined[-1][2] + count)
+        else:
+            joined.append((start, end, count))
+    if len(joined) > 1 and joined[-1][2] < args.window_size:
+        start, end, count = joined.pop()
+        joined[-1] = (joined[-1][0], end, joined[-1][2] + count)
+    text_length = sum(count for start, end, count in joined)
+    tasks, offset = [], 0
+    for start, end, count in joined:
+        tasks.append((filename, start, end, (offset, offset + count), text_length))
+        offset += count
+    analysis, rejections = None, collections.Counter()
+    shard_results = pool.imap(_analyze_shard, tasks)
+    received = []
+    try:
+        for shard_analysis, shard_rejections in shard_results:
+            received.append(shard_analysis)
+            if analysis is None:
+                analysis = shard_analysis
+            else:
+                analysis.merge(shard_analysis)
+            rejections.update(shard_rejections)
+        conllu.log_rejections(filename, rejections)
+        results = compute_measures(analysis, analysis, analysis, None, args, ld)
+    except Exception:
+        # collect the shards that are still analyzed, so that their
+        # temporary files are removed as well
+        while True:
+            try:
+                shard_analysis, shard_rejections = shard_results.next()
+            except StopIteration:
+                break
+            except Exception:
+                continue
+            received.append(shard_analysis)
+        raise
+    finally:
+        for shard_analysis in received:
+            shard_analysis.close()
+    if cache is not None:
+        cache.put(key, results)
+    return results
+
+
+def input_files(args):
+    """Yield the paths of all input files: the files given as TEXT,
+    the files in directories given as TEXT whose names match
+    args.glob and the files listed in args.input_list. "-" stands for
+    STDIN.
+
+    """
+    for path in args.TEXT:
+        if os.path.isdir(path) and args.input_format != "store":
+            yield from _files_in_directory(path, args.glob)
+        else:
+            yield path
+    if args.input_list is not None:
+        f = sys.stdin if args.input_list == "-" else open(args.input_list, encoding="utf-8")
+        with contextlib.ExitStack() as stack:
+            if f is not sys.stdin:
+                stack.enter_context(f)
+            for line in f:
+                path = line.strip()
+                if path:
+                    yield path
+
+
+def _peek_constituents(paths, args):
+    """Return an iterator over paths and whether the input contains
+    constituency trees (None if that is not known in advance).
+    Binary files contain them if they have been created from TSV
+    files; the first file decides.
+
+    """
+    if args.input_format != "npz":
+        return paths, None
+    first = next(paths, None)
+    if first is None or first == "-":
+        return itertools.chain([] if first is None else [first], paths), None
+    return itertools.chain([first], paths), npz.has_constituency_trees(first)
+
+
+def _files_in_directory(directory, pattern):
+    """Recursively yield the files in directory whose names match
+    pattern (in sorted order).
+
+    """
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(fnmatch.filter(filenames, pattern)):
+            yield os.path.join(root, filename)
+
+
+def _open(path, args):
+    """Open an input file (in binary mode for binary formats)."""
+    if args.input_format == "npz":
+        return open(path, "rb")
+    return open(path, encoding="utf-8")
+
+
+def _stdin(args):
+    """STDIN (in binary mode for binary formats)."""
+    if args.input_format == "npz":
+        return sys.stdin.buffer
+    return sys.stdin
+
+
+def _name(path):
+    """Name of an input file in the output."""
+    return sys.stdin.name if path == "-" else path
+
+
+def analyze_files(paths, args):
+    """Analyze the input files and yield a (file name, results) tuple
+    for every file. With args.jobs > 1, the files are distributed over
+    a pool of worker processes; results are yielded in input order
+    unless args.unordered is set. Large CoNLL-U files are split into
+    shards at sentence boundaries that are analyzed in parallel (see
+    analyze_shards). Files are only opened when they are analyzed.
+    Unless args.no_cache is set, results are cached (see
+    result_cache); the cache is shrunk to its maximum size at the
+    end. For corpus stores, the results of every document are yielded
+    (see analyze_stores).
+
+    """
+    jobs = os.cpu_count() if args.jobs == 0 else args.jobs
+    ld = language_definition(args)
+    if args.input_format == "store":
+        yield from analyze_stores(paths, args, jobs, ld)
+        return
+    cache = result_cache(args)
+    if jobs == 1:
+        vocabularies = new_vocabularies()
+        for path in paths:
+            yield _name(path), analyze_path(path, args, ld, vocabularies, cache)
+    else:
+        yield from _analyze_files_in_pool(paths, args, jobs, ld, cache)
+    if cache is not None:
+        cache.evict()
+
+
+def _analyze_files_in_pool(paths, args, jobs, ld, cache):
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(args,)) as pool:
+        # consecutive files that are analyzed as a whole are passed
+        # to the pool at once
+        paths = ((path, _byte_ranges(path, args, jobs)) for path in paths)
+        for whole, group in itertools.groupby(paths, key=lambda item: item[1] is None):
+            if whole:
+                tasks = (_task(path, args) for path, ranges in group)
+                if args.unordered:
+                    yield from pool.imap_unordered(_analyze_in_worker, tasks)
+                else:
+                    yield from pool.imap(_analyze_in_worker, tasks)
+            else:
+                for path, ranges in group:
+                    yield path, analyze_shards(pool, path, ranges, args, ld, cache)
+
+
+def analyze_stores(directories, args, jobs, ld):
+    """Analyze all documents in the corpus stores in directories and
+    yield a (document name, results) tuple for every document. With
+    jobs > 1, chunks of documents are analyzed by worker processes,
+    which map the stores themselves, i.e. only document indices are
+    passed to them.
+
+    """
+    if jobs == 1:
+        for directory in directories:
+            for i in range(len(open_store(directory, args.ignore_case))):
+                yield analyze_store_document(directory, i, args, ld)
+        return
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(args,)) as pool:
+        tasks = ((directory, i) for directory in directories for i in range(len(open_store(directory, args.ignore_case))))
+        imap = pool.imap_unordered if args.unordered else pool.imap
+        yield from imap(_analyze_store_document_in_worker, tasks, chunksize=STORE_CHUNK_SIZE)
+
+
+def _task(path, args):
+    """Worker task for an input file (see _analyze_in_worker). STDIN is
+    read here, other files are opened by the worker.
+
+    """
+    if path == "-":
+        return sys.stdin.name, _stdin(args).read()
+    return path, None
+
+
 def main():
     """"""
     args = arguments()
     if args.lang_def:
         assert args.lang == "other", "If you provide a language definition file, you need to set --lang=other"
-    language, punct_tags, name_tags, open_tags, reference_frequency_list = "none", set(), set(), set(), set()
-    if args.lang == "de":
-        language, punct_tags, name_tags, open_tags, reference_frequency_list = read_language_definition(os.path.join(os.path.dirname(os.path.abspath(__file__)), "de.json"))
-    elif args.lang == "en":
-        language, punct_tags, name_tags, open_tags, reference_frequency_list = read_language_definition(os.path.join(os.path.dirname(os.path.abspath(__file__)), "en.json"))
-    elif args.lang == "other":
-        assert args.lang_def is not None, "If you set --lang=other, then you must provide a language definition file via --lang-def"
-        language, punct_tags, name_tags, open_tags, reference_frequency_list = read_language_definition(args.lang_def)
-    if args.ignore_case:
-        reference_frequency_list = set([(w.lower(), t) for w, t in reference_frequency_list])
     if args.ignore_punct:
         assert args.lang != "none", "You can only use --ignore-punct if you specify the input language via --lang (and --lang-def, if necessary)"
-        assert punct_tags, "You can only use --ignore-punct if you specify a list of part-of-speech tags that indicate punctuation"
-    all_results = {}
-    for i, f in enumerate(args.TEXT):
-        tokens, sentences, graphs, ps_trees = None, None, None, None
-        if args.input_format == "conllu":
-            sentences, graphs = zip(*conllu.read_conllu_sentences(f, ignore_case=args.ignore_case))
-            tokens = list(itertools.chain.from_iterable(sentences))
-        elif args.input_format == "tsv":
-            sentences, graphs, ps_trees = zip(*custom_tsv.read_tsv_sentences(f, ignore_case=args.ignore_case))
-            tokens = list(itertools.chain.from_iterable(sentences))
-        if args.ignore_punct and tokens is not None:
-            tokens = [t for t in tokens if t.pos not in punct_tags]
-        results = []
-        results.extend(surface_based(tokens, args.window_size, args.preset))
-        results.extend(pos_based(tokens, punct_tags, name_tags, open_tags, reference_frequency_list, args.preset))
-        results.extend(sentence_based(sentences, punct_tags, args.preset))
-        results.extend(dependency_based(graphs, args.preset))
-        if ps_trees is not None:
-            # We assume that German constituency trees follow the
-            # NEGRA parsing scheme
-            de_negra = args.lang == "de"
-            results.extend(constituency_based(ps_trees, de_negra, args.preset))
-        all_results[f.name] = {}
-        for r in results:
-            all_results[f.name][r.name] = {"value": r.value}
-            if r.stdev is not None:
-                all_results[f.name][r.name]["stdev"] = r.stdev
-            if r.length is not None:
-                all_results[f.name][r.name]["length"] = r.length
-                all_results[f.name][r.name]["length stdev"] = r.length_stdev
-        if args.output_format == "tsv":
-            if i == 0:
-                print("filename", end="\t")
-                print("\t".join([r.name for r in results]))
-            print(f.name, end="\t")
-            print("\t".join([str(r.value) for r in results]))
-    if args.output_format == "json":
-        print(json.dumps(all_results, ensure_ascii=False, indent=4))
+        assert language_definition(args).punct_tags, "You can only use --ignore-punct if you specify a list of part-of-speech tags that indicate punctuation"
+    if args.streaming:
+        assert args.input_format == "conllu", "Streaming mode (--streaming) is only available for CoNLL-U input"
+    if args.input_format == "store":
+        assert "-" not in args.TEXT, "Corpus stores cannot be read from STDIN"
+    assert args.jobs >= 0, "The number of jobs (--jobs) must not be negative"
+    assert args.TEXT or args.input_list, "You need to specify input files (TEXT or --input-list)"
+    assert not (args.input_list == "-" and "-" in args.TEXT), "STDIN cannot be used for both an input file and the list of input files"
+    paths, constituents = _peek_constituents(input_files(args), args)
+    writer = writers.WRITERS[args.output_format](sys.stdout, result_names(args, language_definition(args), constituents))
+    for name, results in analyze_files(paths, args):
+        writer.write(name, results)
+    writer.close()
@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 
-import nltk
-import nltk_tgrep
+import collections
+import statistics
+
+import numpy as np
 
 from textcomplexity.utils import misc
+from textcomplexity.utils.treebank import ConstituencyTrees
+
+Analysis = collections.namedtuple("Analysis", "t_units complex_t_units clauses dependent_clauses nps vps pps coordinate_phrases constituents constituents_wo_leaves height".split())
+COORDINATE_PHRASES = {"CAP", "CAVP", "CNP", "CVP"}
 
 
 def t_units(trees):
-    return misc.average_measure_and_length(_t_units, trees)
+    return _average_measure_and_length(t_units, trees)
 
 
 def _t_units(tree):
@@ -20,11 +26,11 @@ def _t_units(tree):
     TOP. S = sentence, CS = coordinated sentence.
 
     """
-    return _tgrep_count_and_lengths(tree, "S > (CS > TOP) | > TOP")
+    return _analysis(tree).t_units
 
 
 def complex_t_units(trees):
-    return misc.average_measure_and_length(_complex_t_units, trees)
+    return _average_measure_and_length(complex_t_units, trees)
 
 
 def _complex_t_units(tree):
@@ -34,11 +40,11 @@ def _complex_t_units(tree):
     We operationalize it as a t-unit that dominates an S node.
 
     """
-    return _tgrep_count_and_lengths(tree, "(S > (CS > TOP) | > TOP) << S")
+    return _analysis(tree).complex_t_units
 
 
 def clauses(trees):
-    return misc.average_measure_and_length(_clauses, trees)
+    return _average_measure_and_length(clauses, trees)
 
 
 def _clauses(tree):
@@ -50,47 +56,47 @@ def _clauses(tree):
     (http://www.coli.uni-saarland.de/projects/sfb378/negra-corpus/knoten.html#S).
 
     """
-    return _tgrep_count_and_lengths(tree, "S")
+    return _analysis(tree).clauses
 
 
 def dependent_clauses(trees):
-    return misc.average_measure_and_length(_dependent_clauses, trees)
+    return _average_measure_and_length(dependent_clauses, trees)
 
 
 def _dependent_clauses(tree):
     """A clause that is immediately dominated by another clause."""
-    return _tgrep_count_and_lengths(tree, "S > S")
+    return _analysis(tree).dependent_clauses
 
 
 def nps(trees):
-    return misc.average_measure_and_length(_nps, trees)
+    return _average_measure_and_length(nps, trees)
 
 
 def _nps(tree):
     """Number and lengths of NPs."""
-    return _tgrep_count_and_lengths(tree, "NP")
+    return _analysis(tree).nps
 
 
 def vps(trees):
-    return misc.average_measure_and_length(_vps, trees)
+    return _average_measure_and_length(vps, trees)
 
 
 def _vps(tree):
     """Number and lengths of VPs."""
-    return _tgrep_count_and_lengths(tree, "VP")
+    return _analysis(tree).vps
 
 
 def pps(trees):
-    return misc.average_measure_and_length(_pps, trees)
+    return _average_measure_and_length(pps, trees)
 
 
 def _pps(tree):
     """Number and lengths of PPs."""
-    return _tgrep_count_and_lengths(tree, "PP")
+    return _analysis(tree).pps
 
 
 def coordinate_phrases(trees):
-    return misc.average_measure_and_length(_coordinate_phrases, trees)
+    return _average_measure_and_length(coordinate_phrases, trees)
 
 
 def _coordinate_phrases(tree):
@@ -98,39 +104,255 @@ def _coordinate_phrases(tree):
     coordinate phrases (Cooper 1976).
 
     """
-    return _tgrep_count_and_lengths(tree, "CAP|CAVP|CNP|CVP")
+    return _analysis(tree).coordinate_phrases
 
 
 def constituents(trees):
-    return misc.average_measure(_constituents, trees)
+    return _average_measure(constituents, trees)
 
 
 def _constituents(tree):
     """Number of constituents."""
-    return len(list(tree.subtrees()))
+    return _analysis(tree).constituents
 
 
 def constituents_wo_leaves(trees):
-    return misc.average_measure(_constituents_wo_leaves, trees)
+    return _average_measure(constituents_wo_leaves, trees)
 
 
 def _constituents_wo_leaves(tree):
     """Number of constituents (not counting leaves)."""
-    return len(list(tree.subtrees())) - len(tree.leaves())
+    return _analysis(tree).constituents_wo_leaves
 
 
 def height(trees):
-    return misc.average_measure(_height, trees)
+    return _average_measure(height, trees)
 
 
 def _height(tree):
     """Height of the parse tree."""
-    return tree.height()
+    return _analysis(tree).height
+
+
+def _average_measure_and_length(measure, trees):
+    """Mean and standard deviation of the number of matching nodes per
+    sentence and of their lengths.
+
+    """
+    if isinstance(trees, ConstituencyTrees):
+        matches = _IMPLEMENTATIONS[measure][0](trees)
+        counts = np.bincount(trees.sentence_index()[matches], minlength=len(trees)).tolist()
+        lengths = (trees.ends - trees.starts)[matches].tolist()
+        return statistics.mean(counts), statistics.stdev(counts), statistics.mean(lengths), statistics.stdev(lengths)
+    return misc.average_measure_and_length(_IMPLEMENTATIONS[measure][1], analyze(trees))
+
+
+def _average_measure(measure, trees):
+    """Mean and standard deviation of a measure over all sentences."""
+    if isinstance(trees, ConstituencyTrees):
+        results = _IMPLEMENTATIONS[measure][0](trees).tolist()
+        return statistics.mean(results), statistics.stdev(results)
+    return misc.average_measure(_IMPLEMENTATIONS[measure][1], analyze(trees))
+
+
+def analyze(trees):
+    """Analyze every tree (see _analyze). Trees that have already been
+    analyzed are passed through, i.e. the result can be used as input
+    for all measures in this module. ConstituencyTrees are returned
+    as they are, since all measures are computed directly on their
+    arrays.
+
+    """
+    if isinstance(trees, ConstituencyTrees):
+        return trees
+    return [_analysis(tree) for tree in trees]
+
+
+def _analysis(tree):
+    if isinstance(tree, Analysis):
+        return tree
+    return _analyze(tree)
+
+
+def _analyze(tree):
+    """Compute all measures for a parse tree in a single traversal.
+
+    For every node, we only need its label, the labels of its parent
+    and grandparent, whether it dominates an S node and its number of
+    leaves. In tgrep syntax, the patterns are:
+
+    t-units: S > (CS > TOP) | > TOP
+    complex t-units: (S > (CS > TOP) | > TOP) << S
+    clauses: S
+    dependent clauses: S > S
+    noun, verb and prepositional phrases: NP, VP, PP
+    coordinate phrases: CAP|CAVP|CNP|CVP
+
+    Unlike in tgrep, leaves never match a label, i.e. a word form "S"
+    does not make a t-unit complex.
+
+    """
+    import nltk
+    lengths = {name: [] for name in Analysis._fields[:8]}
+    n_constituents = 0
+
+    def visit(node, parent, grandparent):
+        """Return number of leaves, height and whether node dominates
+        an S node.
+
+        """
+        nonlocal n_constituents
+        n_constituents += 1
+        label = node.label()
+        n_leaves, max_child_height, dominates_s = 0, 0, False
+        for child in node:
+            if isinstance(child, nltk.tree.Tree):
+                child_leaves, child_height, child_dominates_s = visit(child, label, parent)
+                n_leaves += child_leaves
+                max_child_height = max(max_child_height, child_height)
+                dominates_s = dominates_s or child_dominates_s or child.label() == "S"
+            else:
+                n_leaves += 1
+                max_child_height = max(max_child_height, 1)
+        if label == "S":
+            lengths["clauses"].append(n_leaves)
+            if parent == "S":
+                lengths["dependent_clauses"].append(n_leaves)
+            if parent == "TOP" or (parent == "CS" and grandparent == "TOP"):
+                lengths["t_units"].append(n_leaves)
+                if dominates_s:
+                    lengths["complex_t_units"].append(n_leaves)
+        elif label == "NP":
+            lengths["nps"].append(n_leaves)
+        elif label == "VP":
+            lengths["vps"].append(n_leaves)
+        elif label == "PP":
+            lengths["pps"].append(n_leaves)
+        elif label in COORDINATE_PHRASES:
+            lengths["coordinate_phrases"].append(n_leaves)
+        return n_leaves, max_child_height + 1, dominates_s
+
+    n_leaves, height, _ = visit(tree, None, None)
+    return Analysis(*[(len(lengths[name]), lengths[name]) for name in Analysis._fields[:8]],
+                    n_constituents, n_constituents - n_leaves, height)
+
+
+# ----------------------------------------
+#  Measures for ConstituencyTrees objects
+# ----------------------------------------
+def _label_id(trees, label):
+    """Id of label (-2 if it does not occur in the trees)."""
+    return trees.label_vocabulary.ids.get(label, -2)
+
+
+def _has_label(trees, labels, nodes=None):
+    """Boolean array: Do the nodes have one of the labels? Nodes with
+    index -1 (i.e. the parents of roots) never do.
+
+    """
+    ids = [_label_id(trees, label) for label in labels]
+    if nodes is None:
+        return np.isin(trees.labels, ids)
+    return (nodes != -1) & np.isin(trees.labels[nodes], ids)
+
+
+def _t_unit_nodes(trees):
+    parents = trees.global_parents()
+    grandparents = np.where(parents == -1, -1, parents[parents])
+    return _has_label(trees, ["S"]) & (_has_label(trees, ["TOP"], parents) | (_has_label(trees, ["CS"], parents) & _has_label(trees, ["TOP"], grandparents)))
+
+
+def _dominates_s(trees):
+    """Boolean array: Does the node dominate an S node?"""
+    parents = trees.global_parents()
+    dominates = np.zeros(len(trees.labels), dtype=bool)
+    ancestors = parents[_has_label(trees, ["S"])]
+    while len(ancestors) > 0:
+        ancestors = ancestors[ancestors != -1]
+        # ancestors that are already marked have been visited
+        ancestors = np.unique(ancestors[~dominates[ancestors]])
+        dominates[ancestors] = True
+        ancestors = parents[ancestors]
+    return dominates
+
+
+def _depths(trees):
+    """Depth of every node (0 for the roots)."""
+    parents = trees.global_parents()
+    depths = np.zeros(len(trees.labels), dtype=np.intc)
+    ancestors = parents
+    while True:
+        has_ancestor = ancestors != -1
+        if not has_ancestor.any():
+            return depths
+        depths += has_ancestor
+        ancestors = np.where(has_ancestor, parents[ancestors], -1)
+
+
+def _height_trees(trees):
+    """Height of every parse tree, as in nltk.tree.Tree.height: leaves
+    have height 1 and every node is one higher than its highest
+    child.
+
+    """
+    parents = trees.global_parents()
+    has_parent = parents != -1
+    spans = trees.ends - trees.starts
+    covered = np.zeros(len(spans), dtype=spans.dtype)
+    np.add.at(covered, parents[has_parent], spans[has_parent])
+    has_leaf_children = spans > covered
+    heights = _depths(trees) + np.where(has_leaf_children, 2, 1)
+    return np.maximum.reduceat(heights, trees.offsets[:-1])
+
+
+def _constituents_trees(trees):
+    return np.diff(trees.offsets)
+
+
+def _constituents_wo_leaves_trees(trees):
+    roots = trees.offsets[:-1]
+    return np.diff(trees.offsets) - (trees.ends[roots] - trees.starts[roots])
+
+
+def _complex_t_unit_nodes(trees):
+    return _t_unit_nodes(trees) & _dominates_s(trees)
+
+
+def _clause_nodes(trees):
+    return _has_label(trees, ["S"])
+
+
+def _dependent_clause_nodes(trees):
+    return _has_label(trees, ["S"]) & _has_label(trees, ["S"], trees.global_parents())
+
+
+def _np_nodes(trees):
+    return _has_label(trees, ["NP"])
+
+
+def _vp_nodes(trees):
+    return _has_label(trees, ["VP"])
+
+
+def _pp_nodes(trees):
+    return _has_label(trees, ["PP"])
+
+
+def _coordinate_phrase_nodes(trees):
+    return _has_label(trees, COORDINATE_PHRASES)
 
 
-def _tgrep_count_and_lengths(tree, pattern):
-    """Number and lengths of constituent"""
-    result = nltk_tgrep.tgrep_nodes(tree, pattern)
-    result = [r for r in result if isinstance(r, nltk.tree.ParentedTree)]
-    lengths = [len(r.leaves()) for r in result]
-    return len(result), lengths
+# For every measure, the implementation for ConstituencyTrees (a
+# boolean array of matching nodes for measures with lengths, values
+# per sentence otherwise) and the implementation for a single tree
+_IMPLEMENTATIONS = {t_units: (_t_unit_nodes, _t_units),
+                    complex_t_units: (_complex_t_unit_nodes, _complex_t_units),
+                    clauses: (_clause_nodes, _clauses),
+                    dependent_clauses: (_dependent_clause_nodes, _dependent_clauses),
+                    nps: (_np_nodes, _nps),
+                    vps: (_vp_nodes, _vps),
+                    pps: (_pp_nodes, _pps),
+                    coordinate_phrases: (_coordinate_phrase_nodes, _coordinate_phrases),
+                    constituents: (_constituents_trees, _constituents),
+                    constituents_wo_leaves: (_constituents_wo_leaves_trees, _constituents_wo_leaves),
+                    height: (_height_trees, _height)}
@@ -2,9 +2,10 @@
 
 import statistics
 
-import networkx
+import numpy as np
 
 from textcomplexity.utils import misc
+from textcomplexity.utils.treebank import DependencyTrees
 
 
 # ---------------------
@@ -12,7 +13,7 @@ from textcomplexity.utils import misc
 # ---------------------
 def average_dependency_distance(sentence_graphs):
     """Oya (2011)"""
-    return misc.average_measure(_average_dependency_distance, sentence_graphs)
+    return _average_measure(average_dependency_distance, sentence_graphs)
 
 
 def _average_dependency_distance(g):
@@ -32,6 +33,17 @@ def _dependency_distances(g):
     return distances
 
 
+def _average_dependency_distance_trees(trees):
+    """Oya (2011), for all sentences at once."""
+    lengths = trees.sentence_lengths()
+    heads = _global_heads(trees)
+    dependent = heads != -1
+    distances = np.where(dependent, np.abs(trees.positions - trees.positions[heads]), 0)
+    # a tree has one edge less than vertices
+    with np.errstate(invalid="ignore"):
+        return np.where(lengths > 1, _segment_reduce(np.add, distances, trees) / (lengths - 1), 0)
+
+
 # ----------------------
 #  Closeness centrality
 # ----------------------
@@ -41,7 +53,7 @@ def closeness_centrality(sentence_graphs):
     vertices. Used by Oya (2012).
 
     """
-    return misc.average_measure(_closeness_centrality, sentence_graphs)
+    return _average_measure(closeness_centrality, sentence_graphs)
 
 
 def _closeness_centrality(g):
@@ -52,11 +64,24 @@ def _closeness_centrality(g):
     """
     if len(g) > 1:
         root = [v for v, l in g.nodes(data=True) if "root" in l][0]
+        import networkx
         return networkx.algorithms.centrality.closeness_centrality(g.reverse(), root)
     else:
         return 1
 
 
+def _closeness_centrality_trees(trees):
+    """Closeness centrality of the root vertex, for all sentences at
+    once. In a tree, this is (n - 1) divided by the sum of the depths
+    of all vertices.
+
+    """
+    lengths = trees.sentence_lengths()
+    depths, sizes, distance_sums = _tree_statistics(trees)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(lengths > 1, (lengths - 1) / _segment_reduce(np.add, depths, trees), 1)
+
+
 # --------------------------
 #  Outdegree centralization
 # --------------------------
@@ -66,7 +91,7 @@ def outdegree_centralization(sentence_graphs):
     dependent on the root vertex. Used by Oya (2012).
 
     """
-    return misc.average_measure(_outdegree_centralization, sentence_graphs)
+    return _average_measure(outdegree_centralization, sentence_graphs)
 
 
 def _outdegree_centralization(g):
@@ -87,6 +112,18 @@ def _outdegree_centralization(g):
         return 1
 
 
+def _outdegree_centralization_trees(trees):
+    """Outdegree centralization (Freeman, 1978), for all sentences at
+    once.
+
+    """
+    lengths = trees.sentence_lengths()
+    max_out_degrees = _segment_reduce(np.maximum, _out_degrees(trees), trees)
+    # the out-degrees of a tree sum up to n - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(lengths > 1, (lengths * max_out_degrees - (lengths - 1)) / (lengths ** 2 - 2 * lengths + 1), 1)
+
+
 # --------------------------
 #  Closeness centralization
 # --------------------------
@@ -96,7 +133,7 @@ def closeness_centralization(sentence_graphs):
     dependent on the root vertex. Used by Oya (2012).
 
     """
-    return misc.average_measure(_closeness_centralization, sentence_graphs)
+    return _average_measure(closeness_centralization, sentence_graphs)
 
 
 def _closeness_centralization(g):
@@ -106,6 +143,7 @@ def _closeness_centralization(g):
 
     """
     if len(g) > 1:
+        import networkx
         cc = networkx.algorithms.centrality.closeness_centrality(g.reverse()).values()
         max_cc = max(cc)
         # for directed graphs, the denominator should be n - 1
@@ -117,6 +155,23 @@ def _closeness_centralization(g):
         return 1
 
 
+def _closeness_centralization_trees(trees):
+    """Closeness centralization (Freeman, 1978), for all sentences at
+    once. As in _closeness_centralization, closeness centrality of a
+    vertex is based on the distances to all vertices that it
+    dominates, i.e. it only depends on the size of its subtree and on
+    the sum of distances to the vertices in the subtree.
+
+    """
+    lengths = trees.sentence_lengths()
+    vertex_lengths = np.repeat(lengths, lengths)
+    depths, sizes, distance_sums = _tree_statistics(trees)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cc = np.where(distance_sums > 0, ((sizes - 1) / distance_sums) * ((sizes - 1) / (vertex_lengths - 1)), 0)
+        max_cc = np.repeat(_segment_reduce(np.maximum, cc, trees), lengths)
+        return np.where(lengths > 1, _segment_reduce(np.add, max_cc - cc, trees) / (lengths - 1), 1)
+
+
 # -----------------------
 #  Longest shortest path
 # -----------------------
@@ -125,7 +180,7 @@ def longest_shortest_path(sentence_graphs):
     tree.
 
     """
-    return misc.average_measure(_longest_shortest_path, sentence_graphs)
+    return _average_measure(longest_shortest_path, sentence_graphs)
 
 
 def _longest_shortest_path(g):
@@ -135,19 +190,124 @@ def _longest_shortest_path(g):
     """
     if len(g) > 1:
         root = [v for v, l in g.nodes(data=True) if "root" in l][0]
+        import networkx
         return max(networkx.algorithms.shortest_path_length(g, source=root).values())
     else:
         return 0
 
 
+def _longest_shortest_path_trees(trees):
+    """Depth of the tree, for all sentences at once."""
+    depths, sizes, distance_sums = _tree_statistics(trees)
+    return _segment_reduce(np.maximum, depths, trees)
+
+
 # ---------------------
 #  Dependents per word
 # ---------------------
 def dependents_per_word(sentence_graphs):
-    return misc.average_measure(_dependents_per_word, sentence_graphs)
+    return _average_measure(dependents_per_word, sentence_graphs)
 
 
 def _dependents_per_word(g):
     """Average number of dependents per word."""
     outdegrees = [deg for v, deg in g.out_degree()]
     return statistics.mean(outdegrees)
+
+
+def _dependents_per_word_trees(trees):
+    """Average number of dependents per word, for all sentences at
+    once. In a tree, every vertex except the root is a dependent.
+
+    """
+    lengths = trees.sentence_lengths()
+    return (lengths - 1) / lengths
+
+
+# ----------------------------
+#  Measures for all sentences
+# ----------------------------
+def per_sentence(measure, sentence_graphs):
+    """Return an array with the values of a dependency-based measure
+    (e.g. dependency.average_dependency_distance) for every sentence.
+    sentence_graphs is either a DependencyTrees object or an iterable
+    of networkx.DiGraph objects. For DependencyTrees, the measure is
+    computed for all trees at once; sentences that are not trees are
+    processed one by one.
+
+    """
+    for_trees, for_graph = _IMPLEMENTATIONS[measure]
+    if isinstance(sentence_graphs, DependencyTrees) and for_trees is not None:
+        values = for_trees(sentence_graphs)
+        for i, g in sentence_graphs.graphs.items():
+            values[i] = for_graph(g)
+        return values
+    return np.array([for_graph(g) for g in sentence_graphs])
+
+
+def _average_measure(measure, sentence_graphs):
+    """Return mean and standard deviation of measure across sentences."""
+    if isinstance(sentence_graphs, DependencyTrees):
+        values = per_sentence(measure, sentence_graphs).tolist()
+        return statistics.mean(values), statistics.stdev(values)
+    return misc.average_measure(_IMPLEMENTATIONS[measure][1], sentence_graphs)
+
+
+def _global_heads(trees):
+    """Return the corpus-wide indices of the governors (-1 for roots)."""
+    starts = np.repeat(trees.offsets[:-1], trees.sentence_lengths())
+    return np.where(trees.heads == -1, -1, trees.heads + starts)
+
+
+def _tree_statistics(trees):
+    """Return three arrays with the depth of every vertex, the size of
+    its subtree and the sum of the distances to all vertices in its
+    subtree. Computed for all trees at once in O(n log h) (depths, via
+    pointer jumping) and O(n) (subtrees, level by level from the
+    deepest vertices upwards) time.
+
+    """
+    heads = _global_heads(trees)
+    vertices = np.arange(len(heads))
+    dependent = heads != -1
+    # depths via pointer jumping: after k iterations, ancestors[v] is
+    # the ancestor 2^k levels up (or the root) and depths[v] the
+    # distance to it
+    ancestors = np.where(dependent, heads, vertices)
+    depths = dependent.astype(np.int64)
+    while np.any(ancestors[ancestors] != ancestors):
+        depths = depths + depths[ancestors]
+        ancestors = ancestors[ancestors]
+    sizes = np.ones(len(heads), dtype=np.int64)
+    distance_sums = np.zeros(len(heads), dtype=np.int64)
+    by_depth = np.argsort(depths, kind="stable")
+    level_starts = np.searchsorted(depths[by_depth], np.arange(depths.max(initial=0) + 2))
+    for level in range(len(level_starts) - 2, 0, -1):
+        level_vertices = by_depth[level_starts[level]:level_starts[level + 1]]
+        governors = heads[level_vertices]
+        np.add.at(distance_sums, governors, distance_sums[level_vertices] + sizes[level_vertices])
+        np.add.at(sizes, governors, sizes[level_vertices])
+    return depths, sizes, distance_sums
+
+
+def _out_degrees(trees):
+    """Return the out-degree of every vertex."""
+    heads = _global_heads(trees)
+    return np.bincount(heads[heads != -1], minlength=len(heads))
+
+
+def _segment_reduce(ufunc, values, trees):
+    """Reduce values per sentence with ufunc, e.g. np.add."""
+    if len(trees) == 0:
+        return np.zeros(0, dtype=values.dtype)
+    return ufunc.reduceat(values, trees.offsets[:-1])
+
+
+# For every measure, the implementation for DependencyTrees (or None)
+# and the implementation for a single networkx.DiGraph
+_IMPLEMENTATIONS = {average_dependency_distance: (_average_dependency_distance_trees, _average_dependency_distance),
+                    closeness_centrality: (_closeness_centrality_trees, _closeness_centrality),
+                    outdegree_centralization: (_outdegree_centralization_trees, _outdegree_centralization),
+                    closeness_centralization: (_closeness_centralization_trees, _closeness_centralization),
+                    longest_shortest_path: (_longest_shortest_path_trees, _longest_shortest_path),
+                    dependents_per_word: (_dependents_per_word_trees, _dependents_per_word)}
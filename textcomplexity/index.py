@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import itertools
+import os
+
+import numpy as np
+
+from textcomplexity.utils import conllu, custom_tsv, npz
+from textcomplexity.utils.document import Document
+from textcomplexity.utils.store import CorpusStoreBuilder
+from textcomplexity.utils.token import TokenArray
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Convert parsed texts into a binary format (uncompressed NumPy .npz files) that txtcomplexity can read without parsing (txtcomplexity -i npz). Use this if you analyze the same texts several times, e.g. with different settings.")
+    parser.add_argument("--trust-input", action="store_true", help="Do not check if the dependency annotation of every sentence is a sensible syntactic representation (i.e. rooted and connected). Only use this option for input that is known to be valid")
+    parser.add_argument("--output-dir", help="Directory for the output files (default: the directory of the input file). The output files have the names of the input files with the extension .npz")
+    parser.add_argument("--store", metavar="DIR", help="Write all input files (in CoNLL-U format) to a single memory-mapped corpus store in DIR instead of one .npz file per input file. Every input file becomes a document of the store; analyze it with txtcomplexity -i store DIR")
+    parser.add_argument("-i", "--input-format", choices=["conllu", "tsv"], required=True, help="Format of the input files.")
+    parser.add_argument("TEXT", nargs="+", help="Input files in CoNLL-U format or in the custom TSV format (see txtcomplexity -h)")
+    return parser.parse_args(argv)
+
+
+def read_document(f, input_format, validate=True, rejections=None):
+    """Read a CoNLL-U or TSV file. Return a Document and the
+    ConstituencyTrees of its sentences (or None).
+
+    """
+    if input_format == "conllu":
+        return conllu.read_conllu_document(f, validate=validate, rejections=rejections), None
+    sentences, dependency_trees, ps_trees = custom_tsv.read_tsv_treebank(f, validate=validate, rejections=rejections)
+    tokens = TokenArray.from_tokens(list(itertools.chain.from_iterable(sentences)))
+    sentence_offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+    sentence_offsets[1:] = np.cumsum([len(s) for s in sentences])
+    return Document(tokens, sentence_offsets, dependency_trees), ps_trees
+
+
+def output_path(path, output_dir=None):
+    """Return the name of the binary file for an input file."""
+    root, extension = os.path.splitext(path)
+    if output_dir is not None:
+        root = os.path.join(output_dir, os.path.basename(root))
+    return root + ".npz"
+
+
+def build_store(directory, paths, validate=True):
+    """Write the CoNLL-U files in paths to a CorpusStore in directory,
+    one document per file.
+
+    """
+    builder = CorpusStoreBuilder(directory)
+    for path in paths:
+        rejections = collections.Counter()
+        with open(path, encoding="utf-8") as f:
+            document = conllu.read_conllu_document(f, words=builder.words, tags=builder.tags, upos=builder.upos, relation_vocabulary=builder.relation_vocabulary, validate=validate, rejections=rejections)
+        conllu.log_rejections(path, rejections)
+        builder.add_document(path, document)
+    return builder.build()
+
+
+def main():
+    """"""
+    args = arguments()
+    if args.store is not None:
+        assert args.input_format == "conllu", "Corpus stores (--store) can only be built from CoNLL-U files"
+        build_store(args.store, args.TEXT, validate=not args.trust_input)
+        return
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for path in args.TEXT:
+        rejections = collections.Counter()
+        with open(path, encoding="utf-8") as f:
+            document, ps_trees = read_document(f, args.input_format, validate=not args.trust_input, rejections=rejections)
+        conllu.log_rejections(path, rejections)
+        with open(output_path(path, args.output_dir), "wb") as f:
+            npz.save_document(f, document, ps_trees)
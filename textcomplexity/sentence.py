@@ -1,8 +1,39 @@
 #!/usr/bin/env python3
 
 import functools
+import statistics
+
+import numpy as np
 
 from textcomplexity.utils import misc
+from textcomplexity.utils.document import Document
+
+
+# All measures accept a list of sentences (sequences of tokens) or a
+# Document. For a Document, the per-sentence values are computed on
+# its arrays, which can also be views into a CorpusStore.
+def _mean_stdev(values):
+    """Mean and standard deviation of an array of per-sentence values
+    (the same as misc.average_measure).
+
+    """
+    values = values.tolist()
+    return statistics.mean(values), statistics.stdev(values)
+
+
+def _per_sentence(document, token_values):
+    """Sum of an array of per-token values for every sentence of a
+    Document.
+
+    """
+    cumulative = np.concatenate(([0], np.cumsum(token_values)))
+    return cumulative[document.sentence_offsets[1:]] - cumulative[document.sentence_offsets[:-1]]
+
+
+def _punctuation_counts(document, punctuation):
+    """Number of punctuation tokens in every sentence of a Document."""
+    tags = document.tokens.tags
+    return _per_sentence(document, np.isin(document.tokens.tag_ids, [tags.ids[t] for t in punctuation if t in tags]))
 
 
 # -----------------
@@ -13,6 +44,8 @@ def sentence_length_words(sentences, punctuation):
     returns the standard deviation.
 
     """
+    if isinstance(sentences, Document):
+        return _mean_stdev(sentences.sentence_lengths() - _punctuation_counts(sentences, punctuation))
     slw = functools.partial(_sentence_length_words, punctuation=punctuation)
     return misc.average_measure(slw, sentences)
 
@@ -27,6 +60,8 @@ def sentence_length_tokens(sentences):
     returns the standard deviation.
 
     """
+    if isinstance(sentences, Document):
+        return _mean_stdev(sentences.sentence_lengths())
     return misc.average_measure(_sentence_length_tokens, sentences)
 
 
@@ -42,6 +77,10 @@ def sentence_length_characters(sentences):
     between all tokens.
 
     """
+    if isinstance(sentences, Document):
+        tokens = sentences.tokens
+        token_lengths = np.array([len(w) for w in tokens.words.decode(tokens.word_ids)], dtype=np.int64)
+        return _mean_stdev(_per_sentence(sentences, token_lengths) + sentences.sentence_lengths() - 1)
     return misc.average_measure(_sentence_length_characters, sentences)
 
 
@@ -59,6 +98,8 @@ def punctuation_per_sentence(sentences, punctuation):
     `punctuation`, a set of part-of-speech tags).
 
     """
+    if isinstance(sentences, Document):
+        return _mean_stdev(_punctuation_counts(sentences, punctuation))
     pps = functools.partial(_punctuation_per_sentence, punctuation=punctuation)
     return misc.average_measure(pps, sentences)
 
@@ -72,6 +113,8 @@ def punctuation_per_token(sentences, punctuation):
     a set of part-of-speech tags).
 
     """
+    if isinstance(sentences, Document):
+        return int(_punctuation_counts(sentences, punctuation).sum()) / int(sentences.sentence_lengths().sum())
     punct, tokens = 0, 0
     for s in sentences:
         punct += _punctuation_per_sentence(s, punctuation)
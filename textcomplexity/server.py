@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import io
+import json
+import logging
+import os
+import time
+import urllib.parse
+
+from textcomplexity import cli
+from textcomplexity.api import language_definition
+from textcomplexity.utils import writers
+
+# query parameters of /analyze and the corresponding options of
+# txtcomplexity; flags are set if the parameter is "1" or "true"
+OPTIONS = {"input_format": "--input-format",
+           "preset": "--preset",
+           "lang": "--lang",
+           "window_size": "--window-size"}
+FLAGS = {"ignore_case": "--ignore-case",
+         "ignore_punct": "--ignore-punct",
+         "trust_input": "--trust-input"}
+# number of latencies that are kept for the percentiles in /stats
+LATENCY_WINDOW = 1000
+# HTTP status codes of the outcomes of analyze_payload: the text is
+# invalid (the fault of the client) or the analysis failed
+STATUS_CODES = {"ok": 200, "invalid": 400, "error": 500}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 411: "Length Required", 413: "Content Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serve txtcomplexity over HTTP, on localhost or on a Unix socket. POST a text in CoNLL-U or TSV format to /analyze?input_format=conllu&preset=core&lang=de (further parameters: window_size, ignore_case, ignore_punct, trust_input) to get its results as JSON object. GET /stats returns request, latency and throughput counters. Requests are collected in micro-batches that are analyzed by worker processes; if too many requests are waiting, further requests are rejected with status 503.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", default=8080, type=int, help="Port to listen on (default: 8080)")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--lang-def", type=os.path.abspath, help="Language definition file in JSON format that is used for requests with lang=other")
+    parser.add_argument("-j", "--jobs", default=1, type=int, help="Number of worker processes that analyze the batches; 0 uses all CPUs (default: 1)")
+    parser.add_argument("--max-batch-size", default=32, type=int, help="Maximum number of requests per batch (default: 32)")
+    parser.add_argument("--max-delay", default=5, type=float, help="Maximum time (in milliseconds) that a request waits for further requests to fill its batch if a worker is idle (default: 5)")
+    parser.add_argument("--max-queue-size", default=256, type=int, help="Maximum number of requests that wait for a worker; further requests are rejected (default: 256)")
+    parser.add_argument("--max-body-size", default=16, type=float, help="Maximum size (in megabytes) of a posted text; larger requests are rejected with status 413 (default: 16)")
+    return parser.parse_args(argv)
+
+
+def request_arguments(params, lang_def=None):
+    """Convert the query parameters of a request into the arguments of
+    txtcomplexity. Raise ValueError for invalid parameters.
+
+    """
+    argv = []
+    for name, values in params.items():
+        if name in OPTIONS:
+            argv.extend([OPTIONS[name], values[-1]])
+        elif name in FLAGS:
+            if values[-1].lower() in ("1", "true"):
+                argv.append(FLAGS[name])
+        else:
+            raise ValueError("Unknown parameter: %s" % name)
+    if lang_def is not None and params.get("lang", [None])[-1] == "other":
+        argv.extend(["--lang-def", lang_def])
+    try:
+        args = cli.arguments(argv + ["--no-cache"])
+    except SystemExit:
+        raise ValueError("Invalid parameters (see txtcomplexity -h)")
+    if args.input_format not in ("conllu", "tsv"):
+        raise ValueError("The input format must be conllu or tsv")
+    if args.lang == "other" and args.lang_def is None:
+        raise ValueError("lang=other requires a server that was started with --lang-def")
+    return args
+
+
+def analyze_payload(args, payload, vocabularies=None):
+    """Analyze a text (in the format args.input_format). Return a tuple
+    of a status and the results as dictionary (see
+    writers.result_dict) or an error message. The status is "ok",
+    "invalid" if the text cannot be analyzed (a ValueError, e.g. from
+    the readers) or "error" for any other exception.
+
+    """
+    if vocabularies is None:
+        vocabularies = cli.new_vocabularies()
+    f = io.StringIO(payload)
+    f.name = "<request>"
+    try:
+        ld = language_definition(args.lang, args.lang_def, args.ignore_case)
+        return "ok", writers.result_dict(cli.analyze(f, args, ld, vocabularies))
+    except ValueError as e:
+        logging.warning("Invalid request: %s: %s" % (type(e).__name__, e))
+        return "invalid", "%s: %s" % (type(e).__name__, e)
+    except Exception as e:
+        logging.exception("Failed to analyze request")
+        return "error", "%s: %s" % (type(e).__name__, e)
+
+
+def analyze_batch(tasks):
+    """Analyze a list of (args, payload) tuples with shared vocabularies
+    and return a list of analyze_payload outcomes. This is what a
+    worker process does with a batch.
+
+    """
+    vocabularies = cli.new_vocabularies()
+    return [analyze_payload(args, payload, vocabularies) for args, payload in tasks]
+
+
+class Batcher:
+    """Collect requests in micro-batches and dispatch them to executor
+    (e.g. a ProcessPoolExecutor). At most max_pending_batches batches
+    are analyzed at the same time. As soon as one of them is finished,
+    the next batch is formed of the waiting requests; if none are
+    waiting, it is dispatched after max_batch_size requests have
+    arrived or max_delay seconds after the first one. Under load,
+    batches thus grow instead of the queue.
+
+    The queue holds at most max_queue_size requests; submit raises
+    asyncio.QueueFull if it is full, so that clients can back off.
+
+    """
+
+    def __init__(self, executor, max_pending_batches=1, max_batch_size=32, max_delay=0.005, max_queue_size=256):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue(max_queue_size)
+        self.slots = asyncio.Semaphore(max_pending_batches)
+        self.batches = 0
+        self.batched_requests = 0
+        self.pending = set()
+
+    def submit(self, args, payload):
+        """Return an asyncio.Future for the result of analyze_payload."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((args, payload, future))
+        return future
+
+    async def run(self):
+        """Form and dispatch batches until cancelled."""
+        while True:
+            await self.slots.acquire()
+            try:
+                batch = [await self.queue.get()]
+            except asyncio.CancelledError:
+                self.slots.release()
+                raise
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._analyze(batch))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def _analyze(self, batch):
+        tasks = [(args, payload) for args, payload, future in batch]
+        try:
+            outcomes = await asyncio.get_running_loop().run_in_executor(self.executor, analyze_batch, tasks)
+        except Exception as e:
+            logging.exception("Failed to analyze batch")
+            outcomes = [("error", "%s: %s" % (type(e).__name__, e))] * len(batch)
+        finally:
+            self.slots.release()
+        self.batches += 1
+        self.batched_requests += len(batch)
+        for (args, payload, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+
+class Counters:
+    """Request, error, latency and throughput counters of a server."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.server_errors = 0
+        self.rejected = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add(self, latency, code=200):
+        """Count a request that was answered with status code after
+        latency seconds; 4xx are errors of the client, 5xx errors of
+        the server.
+
+        """
+        self.requests += 1
+        self.errors += 400 <= code < 500
+        self.server_errors += code >= 500
+        self.latencies.append(latency)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def as_dict(self, batcher):
+        """Counters as JSON-serializable dictionary; latencies are in
+        milliseconds and percentiles refer to the last LATENCY_WINDOW
+        requests.
+
+        """
+        uptime = time.monotonic() - self.start
+        latencies = sorted(self.latencies)
+        latency = {"mean": 1000 * self.total_latency / self.requests if self.requests else None,
+                   "max": 1000 * self.max_latency}
+        for name, p in (("median", 0.5), ("95th percentile", 0.95), ("99th percentile", 0.99)):
+            latency[name] = 1000 * latencies[int(p * (len(latencies) - 1))] if latencies else None
+        return {"uptime": uptime,
+                "requests": self.requests,
+                "errors": self.errors,
+                "server errors": self.server_errors,
+                "rejected": self.rejected,
+                "requests per second": self.requests / uptime,
+                "queued": batcher.queue.qsize(),
+                "batches": batcher.batches,
+                "mean batch size": batcher.batched_requests / batcher.batches if batcher.batches else None,
+                "latency": latency}
+
+
+class AnalysisServer:
+    """HTTP/1.1 front end of a Batcher: POST /analyze and GET /stats
+    (see arguments).
+
+    """
+
+    def __init__(self, batcher, lang_def=None, max_body_size=16 * 2**20):
+        self.batcher = batcher
+        self.lang_def = lang_def
+        self.max_body_size = max_body_size
+        self.counters = Counters()
+
+    async def start(self, host="127.0.0.1", port=8080, socket=None):
+        """Start listening on host and port or, if socket is given, on
+        that Unix socket. Return the asyncio.Server.
+
+        """
+        if socket is not None:
+            if os.path.exists(socket):
+                os.unlink(socket)
+            return await asyncio.start_unix_server(self.handle_connection, socket)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        """Answer the requests of a (persistent) connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    content_length = int(headers.get("content-length", 0))
+                    if content_length < 0:
+                        raise ValueError("negative content length")
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request"}, False)
+                    break
+                # the body is not read, i.e. the connection is closed
+                if "transfer-encoding" in headers:
+                    await self._respond(writer, 411, {"error": "Transfer-Encoding is not supported, use Content-Length"}, False)
+                    break
+                if content_length > self.max_body_size:
+                    await self._respond(writer, 413, {"error": "The body must not be larger than %d bytes" % self.max_body_size}, False)
+                    break
+                body = await reader.readexactly(content_length)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                code, obj = await self.respond(method, target, body)
+                await self._respond(writer, code, obj, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, body):
+        """Return status code and JSON object for a request."""
+        url = urllib.parse.urlsplit(target)
+        if method == "GET" and url.path == "/stats":
+            return 200, self.counters.as_dict(self.batcher)
+        if method != "POST" or url.path != "/analyze":
+            return 404, {"error": "Not found"}
+        start = time.monotonic()
+        try:
+            args = request_arguments(urllib.parse.parse_qs(url.query), self.lang_def)
+            payload = body.decode("utf-8")
+        except ValueError as e:
+            self.counters.add(time.monotonic() - start, 400)
+            return 400, {"error": str(e)}
+        try:
+            ld = language_definition(args.lang, args.lang_def, args.ignore_case)
+        except Exception as e:
+            # e.g. an unreadable or invalid language definition file
+            logging.exception("Failed to read the language definition")
+            self.counters.add(time.monotonic() - start, 500)
+            return 500, {"error": "%s: %s" % (type(e).__name__, e)}
+        if args.ignore_punct and not ld.punct_tags:
+            self.counters.add(time.monotonic() - start, 400)
+            return 400, {"error": "ignore_punct requires a language with punctuation tags"}
+        try:
+            future = self.batcher.submit(args, payload)
+        except asyncio.QueueFull:
+            self.counters.rejected += 1
+            return 503, {"error": "Too many requests are waiting"}
+        status, value = await future
+        code = STATUS_CODES[status]
+        self.counters.add(time.monotonic() - start, code)
+        if status == "ok":
+            return code, value
+        return code, {"error": value}
+
+    async def _respond(self, writer, code, obj, keep_alive):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        head = ["HTTP/1.1 %d %s" % (code, REASONS[code]),
+                "Content-Type: application/json; charset=utf-8",
+                "Content-Length: %d" % len(body),
+                "Connection: %s" % ("keep-alive" if keep_alive else "close")]
+        if code == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def _init_worker(lang_def):
+    """Read the language definitions once per process."""
+    for ignore_case in (False, True):
+        for lang in ("none", "de", "en"):
+            language_definition(lang, None, ignore_case)
+        if lang_def is not None:
+            language_definition("other", lang_def, ignore_case)
+
+
+async def serve(args):
+    """Run the server described by args until cancelled."""
+    jobs = os.cpu_count() if args.jobs == 0 else args.jobs
+    with concurrent.futures.ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(args.lang_def,)) as executor:
+        batcher = Batcher(executor, jobs, args.max_batch_size, args.max_delay / 1000, args.max_queue_size)
+        analysis_server = AnalysisServer(batcher, args.lang_def, int(args.max_body_size * 2**20))
+        server = await analysis_server.start(args.host, args.port, args.socket)
+        logging.info("Listening on %s" % (args.socket if args.socket is not None else "http://%s:%d" % (args.host, args.port)))
+        batcher_task = asyncio.create_task(batcher.run())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+            if args.socket is not None:
+                os.unlink(args.socket)
+
+
+def main():
+    """"""
+    args = arguments()
+    assert args.jobs >= 0, "The number of jobs (--jobs) must not be negative"
+    assert args.max_queue_size > 0, "The queue size (--max-queue-size) must be positive"
+    assert args.max_body_size > 0, "The maximum body size (--max-body-size) must be positive"
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
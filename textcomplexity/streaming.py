@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+import collections
+import math
+import os
+import statistics
+import tempfile
+
+import numpy as np
+
+from textcomplexity import dependency, pos, sentence
+from textcomplexity.utils import misc, windows
+from textcomplexity.utils.token import TokenArray
+
+
+class StreamingAnalysis:
+    """Accumulate complexity measures over a stream of documents (e.g.
+    the batches of conllu.read_conllu_batches), so that a text never
+    has to be held in memory as a whole. The results are the same as
+    for the whole text.
+
+    text_length: Number of tokens in the whole text (after removing
+    punctuation, if ignore_punct is set). It determines the positions
+    of the disjoint windows and has to be known in advance, e.g. from
+    a first pass over the text.
+
+    window_measures: Surface-based measures that are computed for
+    disjoint windows of size window_size (see
+    misc.bootstrap_measures). Windows are evaluated as soon as they
+    are filled.
+
+    dependency_measures: Dependency-based measures (e.g.
+    dependency.average_dependency_distance).
+
+    moving_windows, mtld: Compute the moving-average type-token ratio
+    and MTLD. For the reverse pass of MTLD, the token ids are spooled
+    to a temporary file.
+
+    Peak memory depends on the window size and the size of the
+    documents, not on the length of the text (apart from the
+    vocabulary and one value per window and measure).
+
+    span: If the documents are only a part of the text, e.g. a shard
+    that is analyzed in a separate process, span is the (start, end)
+    position of their tokens in the whole text. Only the windows
+    within the span are evaluated; the remaining ones are evaluated
+    when the analyses of consecutive parts are merged (see merge).
+    Every part has to contain at least window_size tokens.
+
+    """
+
+    def __init__(self, text_length, window_size, window_measures=(), dependency_measures=(), *, punct_tags=frozenset(), open_tags=frozenset(), name_tags=frozenset(), reference_frequency_list=frozenset(), ignore_punct=False, moving_windows=False, mtld=False, strategy="spread", batch_measures=None, span=None):
+        self.window_size = window_size
+        self.window_measures = list(window_measures)
+        self.dependency_measures = list(dependency_measures)
+        self.punct_tags = punct_tags
+        self.open_tags = open_tags
+        self.open_tags_ex_names = open_tags - name_tags
+        self.reference_frequency_list = reference_frequency_list
+        self.ignore_punct = ignore_punct
+        self.batch_measures = batch_measures
+        # surface
+        self.text_length = 0
+        self.text_length_characters = 0
+        self.span = span
+        self.words, self.tags = None, None
+        self.window_starts = np.array(windows.window_starts(text_length, window_size, strategy) if self.window_measures else [], dtype=np.int64)
+        self.buffer_start = 0 if span is None else span[0]
+        self.next_window = int(np.searchsorted(self.window_starts, self.buffer_start))
+        self.buffer = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        self.window_results = [[] for measure in self.window_measures]
+        # the first tokens of a part, for the windows that span
+        # several parts
+        self.head = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        self.mattr = _MovingWindowTTR(window_size) if moving_windows else None
+        self.mtld = _MTLD(forward=span is None) if mtld else None
+        # pos
+        self.content_words = 0
+        self.content_words_ex_names = 0
+        self.rare_words = 0
+        # sentence
+        self.statistics = collections.defaultdict(misc.RunningStatistics)
+        self.punctuation = 0
+        self.tokens_in_sentences = 0
+
+    def add(self, document):
+        """Add the sentences of a document (see
+        textcomplexity.utils.document.Document).
+
+        """
+        if len(document) == 0:
+            return
+        tokens = document.tokens
+        is_punct = np.isin(tokens.tag_ids, _ids(tokens.tags, self.punct_tags))
+        self._add_sentences(document, is_punct)
+        for measure in self.dependency_measures:
+            self.statistics[measure].update(dependency.per_sentence(measure, document.dependency_trees).tolist())
+        if self.ignore_punct:
+            tokens = tokens[~is_punct]
+        self._add_tokens(tokens)
+
+    def _add_sentences(self, document, is_punct):
+        lengths = document.sentence_lengths()
+        cumulative = np.concatenate(([0], np.cumsum(is_punct)))
+        punctuation = cumulative[document.sentence_offsets[1:]] - cumulative[document.sentence_offsets[:-1]]
+        word_lengths = np.array([len(w) for w in document.tokens.words.decode(document.tokens.word_ids)], dtype=np.int64)
+        cumulative = np.concatenate(([0], np.cumsum(word_lengths)))
+        characters = cumulative[document.sentence_offsets[1:]] - cumulative[document.sentence_offsets[:-1]] + lengths - 1
+        self.statistics[sentence.sentence_length_tokens].update(lengths.tolist())
+        self.statistics[sentence.sentence_length_words].update((lengths - punctuation).tolist())
+        self.statistics[sentence.sentence_length_characters].update(characters.tolist())
+        self.statistics[sentence.punctuation_per_sentence].update(punctuation.tolist())
+        self.punctuation += int(punctuation.sum())
+        self.tokens_in_sentences += int(lengths.sum())
+
+    def _add_tokens(self, tokens):
+        self.words, self.tags = tokens.words, tokens.tags
+        if self.span is not None and len(self.head[0]) < self.window_size - 1:
+            missing = self.window_size - 1 - len(self.head[0])
+            self.head = np.concatenate((self.head[0], tokens.word_ids[:missing])), np.concatenate((self.head[1], tokens.tag_ids[:missing]))
+        words = tokens.words.decode(tokens.word_ids)
+        self.text_length += len(tokens)
+        self.text_length_characters += sum(len(w) for w in words)
+        is_content = np.isin(tokens.tag_ids, _ids(tokens.tags, self.open_tags))
+        self.content_words += int(is_content.sum())
+        is_content = np.isin(tokens.tag_ids, _ids(tokens.tags, self.open_tags_ex_names))
+        self.content_words_ex_names += int(is_content.sum())
+        tags = tokens.tags.decode(tokens.tag_ids[is_content])
+        self.rare_words += sum((w, t) not in self.reference_frequency_list for w, t in zip((words[i] for i in np.flatnonzero(is_content)), tags))
+        if self.mattr is not None:
+            self.mattr.add(tokens.word_ids)
+        if self.mtld is not None:
+            self.mtld.add(tokens.word_ids)
+        if self.window_measures:
+            self._add_to_windows(tokens)
+
+    def _add_to_windows(self, tokens):
+        """Evaluate all windows that are filled."""
+        word_ids = np.concatenate((self.buffer[0], tokens.word_ids))
+        tag_ids = np.concatenate((self.buffer[1], tokens.tag_ids))
+        buffer_end = self.buffer_start + len(word_ids)
+        complete = np.searchsorted(self.window_starts + self.window_size, buffer_end, side="right")
+        if complete > self.next_window:
+            starts = self.window_starts[self.next_window:complete] - self.buffer_start
+            indices = (starts.reshape(-1, 1) + np.arange(self.window_size)).ravel()
+            filled = TokenArray(word_ids[indices], tag_ids[indices], tokens.words, tokens.tags)
+            consecutive = np.arange(complete - self.next_window) * self.window_size
+            results = misc.window_results(self.window_measures, filled, self.window_size, batch_measures=self.batch_measures, starts=consecutive)
+            for measure_results, new in zip(self.window_results, results):
+                measure_results.extend(new)
+            self.next_window = complete
+        # keep the tokens from the start of the next window onwards
+        keep_from = self.window_starts[self.next_window] if self.next_window < len(self.window_starts) else buffer_end
+        keep_from = min(max(keep_from, self.buffer_start), buffer_end)
+        self.buffer = word_ids[keep_from - self.buffer_start:].copy(), tag_ids[keep_from - self.buffer_start:].copy()
+        self.buffer_start = keep_from
+
+    def merge(self, other):
+        """Add the analysis of the part of the text that follows this
+        one (see span). The windows that span both parts are evaluated
+        with the help of the first tokens of other.
+
+        """
+        assert self.span is not None and other.span is not None and self.span[1] == other.span[0], "Only analyses of consecutive parts of a text can be merged"
+        if self.words is None:
+            self.words, self.tags = other.words, other.tags
+        word_map = self.words.encode(other.words.strings)
+        tag_map = self.tags.encode(other.tags.strings)
+        head = TokenArray(word_map[other.head[0]], tag_map[other.head[1]], self.words, self.tags)
+        # surface
+        if self.window_measures:
+            self._add_to_windows(head)
+            for measure_results, new in zip(self.window_results, other.window_results):
+                measure_results.extend(new)
+            self.next_window = other.next_window
+            self.buffer = word_map[other.buffer[0]], tag_map[other.buffer[1]]
+            self.buffer_start = other.buffer_start
+        if self.mattr is not None:
+            self.mattr.add(head.word_ids)
+            self.mattr.merge(other.mattr, word_map)
+        if self.mtld is not None:
+            self.mtld.merge(other.mtld, word_map)
+        self.text_length += other.text_length
+        self.text_length_characters += other.text_length_characters
+        # pos
+        self.content_words += other.content_words
+        self.content_words_ex_names += other.content_words_ex_names
+        self.rare_words += other.rare_words
+        # sentence
+        for measure, results in other.statistics.items():
+            self.statistics[measure].merge(results)
+        self.punctuation += other.punctuation
+        self.tokens_in_sentences += other.tokens_in_sentences
+        self.span = self.span[0], other.span[1]
+
+    def __getstate__(self):
+        # the reference frequency list is only needed for adding
+        # documents
+        state = self.__dict__.copy()
+        state["reference_frequency_list"] = None
+        return state
+
+    def bootstrap(self):
+        """Return a (mean, confidence interval, results) tuple for every
+        window measure (see misc.bootstrap_measures).
+
+        """
+        return [misc.summarize_bootstrap(results) for results in self.window_results]
+
+    def evaluate(self, measure):
+        """Return the result of a sentence-based, pos-based or
+        dependency-based measure, i.e. mean and standard deviation or,
+        for measures that are not averaged over sentences, the value.
+
+        """
+        # measures can be given as functools.partial objects
+        measure = getattr(measure, "func", measure)
+        if measure is sentence.punctuation_per_token:
+            return self.punctuation / self.tokens_in_sentences
+        if measure is pos.lexical_density:
+            return self.content_words / self.text_length
+        if measure is pos.rarity:
+            assert len(self.open_tags_ex_names) > 0, "You need to define proper names and open word classes in the language definition file"
+            return self.rare_words / self.content_words_ex_names
+        results = self.statistics[measure]
+        return results.mean(), results.stdev()
+
+    def text_length_characters_value(self):
+        """See surface.text_length_characters."""
+        return self.text_length_characters + self.text_length - 1
+
+    def mattr_value(self):
+        """See surface.mattr."""
+        return self.mattr.result()
+
+    def mtld_value(self):
+        """See surface.mtld."""
+        return self.mtld.result()
+
+    def close(self):
+        """Remove the temporary files of MTLD. The analysis of a span
+        has to be closed by the process that merges it, also if the
+        results are not needed.
+
+        """
+        if self.mtld is not None:
+            self.mtld.close()
+
+
+def _ids(vocabulary, strings):
+    """Ids of those strings that are in the vocabulary."""
+    return [vocabulary.ids[s] for s in strings if s in vocabulary]
+
+
+class _MovingWindowTTR:
+    """Incremental version of surface.mattr."""
+
+    def __init__(self, window_size):
+        self.window_size = window_size
+        self.window = collections.deque()
+        self.frequencies = collections.Counter()
+        self.ttr_values = misc.RunningStatistics()
+
+    def add(self, word_ids):
+        window, frequencies, window_size = self.window, self.frequencies, self.window_size
+        values = []
+        for word in word_ids.tolist():
+            window.append(word)
+            frequencies[word] += 1
+            if len(window) > window_size:
+                old = window.popleft()
+                frequencies[old] -= 1
+                if frequencies[old] == 0:
+                    del frequencies[old]
+            if len(window) == window_size:
+                values.append(len(frequencies) / window_size)
+        self.ttr_values.update(values)
+
+    def merge(self, other, word_map):
+        """Continue with the state of other, a moving window over the
+        text that follows this one. word_map translates the word ids
+        of other.
+
+        """
+        self.ttr_values.merge(other.ttr_values)
+        self.window = collections.deque(word_map[np.array(other.window, dtype=np.int64)].tolist())
+        self.frequencies = collections.Counter(self.window)
+
+    def result(self):
+        if self.ttr_values.count == 0:
+            # text shorter than the window
+            return len(self.frequencies) / self.window_size
+        return self.ttr_values.mean()
+
+
+class _MTLD:
+    """Incremental version of surface.mtld. The token ids are written to
+    a temporary file that is read backwards in chunks for the reverse
+    pass. The forward pass is computed on the fly; if forward is
+    False, it is computed from the temporary file as well. In this
+    case, the temporary file has a name, so that the object can be
+    sent to another process and merged with others (see merge).
+
+    """
+
+    def __init__(self, factor_size=0.72, chunk_size=1 << 20, forward=True):
+        self.factor_size = factor_size
+        self.chunk_size = chunk_size
+        self.spool = tempfile.TemporaryFile() if forward else tempfile.NamedTemporaryFile(delete=False)
+        self.text_length = 0
+        self.forward = _MTLDPass(factor_size) if forward else None
+        # spooled token ids of consecutive parts of the text: file,
+        # number of tokens and an array that translates the ids (or
+        # None)
+        self.segments = [[self.spool, 0, None]]
+
+    def add(self, word_ids):
+        word_ids = np.ascontiguousarray(word_ids, dtype=np.int32)
+        self.spool.write(word_ids.tobytes())
+        self.text_length += len(word_ids)
+        self.segments[-1][1] += len(word_ids)
+        if self.forward is not None:
+            self.forward.add(word_ids.tolist())
+
+    def merge(self, other, word_map):
+        """Append the token ids of other, which follow the ones of this
+        object; word_map translates the word ids of other.
+
+        """
+        self.spool.flush()
+        self.forward = None
+        for spool, length, translation in other.segments:
+            self.segments.append([spool, length, word_map if translation is None else word_map[translation]])
+        self.spool = other.spool
+        self.text_length += other.text_length
+
+    def __getstate__(self):
+        self.spool.flush()
+        state = self.__dict__.copy()
+        state["spool"] = None
+        state["segments"] = [[spool.name, length, translation] for spool, length, translation in self.segments]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.segments = [[open(name, "rb"), length, translation] for name, length, translation in self.segments]
+        self.spool = self.segments[-1][0]
+
+    def _chunks(self, reverse=False):
+        """Yield the spooled token ids in chunks."""
+        itemsize = np.dtype(np.int32).itemsize
+        for spool, length, translation in (reversed(self.segments) if reverse else self.segments):
+            starts = range(0, length, self.chunk_size)
+            for start in (reversed(starts) if reverse else starts):
+                end = min(start + self.chunk_size, length)
+                spool.seek(start * itemsize)
+                chunk = np.frombuffer(spool.read((end - start) * itemsize), dtype=np.int32)
+                if translation is not None:
+                    chunk = translation[chunk]
+                yield chunk[::-1] if reverse else chunk
+
+    def result(self):
+        self.spool.flush()
+        forward = self.forward
+        if forward is None:
+            forward = _MTLDPass(self.factor_size)
+            for chunk in self._chunks():
+                forward.add(chunk.tolist())
+        reverse = _MTLDPass(self.factor_size)
+        for chunk in self._chunks(reverse=True):
+            reverse.add(chunk.tolist())
+        self.close()
+        return statistics.mean((forward.result(self.text_length), reverse.result(self.text_length)))
+
+    def close(self):
+        """Close and remove the temporary files."""
+        for spool, length, translation in self.segments:
+            spool.close()
+            if isinstance(spool.name, str) and os.path.exists(spool.name):
+                os.unlink(spool.name)
+
+
+class _MTLDPass:
+    """State of one pass of surface.mtld."""
+
+    def __init__(self, factor_size):
+        self.factor_size = factor_size
+        self.factors = 0
+        self.types = set()
+        self.token_count = 0
+
+    def add(self, tokens):
+        factor_size = self.factor_size
+        for token in tokens:
+            self.types.add(token)
+            self.token_count += 1
+            if len(self.types) / self.token_count <= factor_size:
+                self.factors += 1
+                self.types = set()
+                self.token_count = 0
+
+    def result(self, text_length):
+        factors = self.factors
+        if self.token_count > 0:
+            ttr = len(self.types) / self.token_count
+            factors += (1 - ttr) / (1 - self.factor_size)
+        try:
+            return text_length / factors
+        except ZeroDivisionError:
+            return math.nan
@@ -6,10 +6,9 @@ import operator
 import statistics
 
 import numpy as np
-import scipy.optimize
-import scipy.stats
 
 from textcomplexity.utils import misc
+from textcomplexity.utils.text import EncodedText
 
 
 # ------------------------------------------------- #
@@ -397,20 +396,37 @@ def kl_divergence(text, n_parts):
     return np.mean(kld_scores)
 
 
-def _get_distances_for_gini(text):
-    distances = {t: [] for t in text.frequency_list.keys()}
-    first, last = {}, {}
-    for i, token in enumerate(text.tokens):
-        if token in first:
-            dist = i - last[token]
-            distances[token].append(dist)
-        else:
-            first[token] = i
-        last[token] = i
-    for token in distances.keys():
-        dist = first[token] + text.text_length - last[token]
-        distances[token].append(dist)
-    return {t: np.array(dists) for t, dists in distances.items()}
+def _token_ids(text):
+    """Return the tokens of text as an array of integer ids."""
+    if isinstance(text, EncodedText):
+        return text.token_ids
+    type_ids = {t: i for i, t in enumerate(text.frequency_list.keys())}
+    return np.fromiter((type_ids[t] for t in text.tokens), dtype=np.int64, count=text.text_length)
+
+
+def _get_distances(text):
+    """Return the distances between consecutive tokens of the same type
+    (including the distance from the last token around the end of the
+    text to the first one) in compressed sparse row format: a flat
+    array of distances that is grouped by type, the offsets at which
+    the groups start and the sizes of the groups, i.e. the type
+    frequencies.
+
+    """
+    ids = _token_ids(text)
+    # positions of the tokens, grouped by type and in ascending order
+    positions = np.argsort(ids, kind="stable")
+    sorted_ids = ids[positions]
+    new_type = np.ones(len(ids), dtype=bool)
+    new_type[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    offsets = np.flatnonzero(new_type)
+    frequencies = np.diff(np.append(offsets, len(ids)))
+    distances = np.empty_like(positions)
+    distances[1:] = positions[1:] - positions[:-1]
+    # the first distance of every type wraps around the end of the text
+    last = offsets + frequencies - 1
+    distances[offsets] = positions[offsets] + text.text_length - positions[last]
+    return distances, offsets, frequencies
 
 
 def gini_based_dispersion(text, exclude_hapaxes=False):
@@ -425,18 +441,37 @@ def gini_based_dispersion(text, exclude_hapaxes=False):
     exclude_hapaxes=True and the text only consists of hapax legomena.
 
     """
-    distances = _get_distances_for_gini(text)
-    ginis = {t: scipy.spatial.distance.squareform(scipy.spatial.distance.pdist(dists.reshape(-1, 1))).mean() / (2 * dists.mean()) for t, dists in distances.items()}
-    gini_max = {t: (text.text_length - f) * (f - 1) / (f * text.text_length) for t, f in text.frequency_list.items()}
-    dispersions = {t: 1 if g == 0 else 1 - (g / gini_max[t]) for t, g in ginis.items()}
+    distances, offsets, frequencies = _get_distances(text)
+    ginis = _grouped_gini(distances, offsets, frequencies)
+    gini_max = (text.text_length - frequencies) * (frequencies - 1) / (frequencies * text.text_length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dispersions = np.where(ginis == 0, 1, 1 - (ginis / gini_max))
     if exclude_hapaxes:
-        dispersions = {t: d for t, d in dispersions.items() if text.frequency_list[t] > 1}
+        dispersions = dispersions[frequencies > 1]
     try:
-        return statistics.mean(dispersions.values())
+        return statistics.mean(dispersions.tolist())
     except statistics.StatisticsError:
         return math.nan
 
 
+def _grouped_gini(values, offsets, sizes):
+    """Gini coefficients of groups of non-negative integers, e.g. the
+    distances between the tokens of every type. The groups are
+    consecutive in values and start at offsets. This is equivalent to
+    the mean absolute difference of all pairs divided by twice the
+    mean, but only needs O(f log f) time for a group of size f: For
+    the sorted values x_1, …, x_f of a group,
+
+    G = sum((2i - f - 1) * x_i) / (f * sum(x_i))
+
+    """
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    values = values[np.lexsort((values, group))]
+    ranks = np.arange(1, len(values) + 1) - np.repeat(offsets, sizes)
+    weighted = (2 * ranks - np.repeat(sizes, sizes) - 1) * values
+    return np.add.reduceat(weighted, offsets) / (sizes * np.add.reduceat(values, offsets))
+
+
 def evenness_based_dispersion(text, exclude_hapaxes=False):
     """This measure indicates how evenly the distances between tokens of
     the same type are distributed based on evenness (also known as
@@ -450,14 +485,19 @@ def evenness_based_dispersion(text, exclude_hapaxes=False):
     exclude_hapaxes=True and the text only consists of hapax legomena.
 
     """
-    distances = _get_distances_for_gini(text)
-    evenness_scores = {t: (-1 * np.multiply(np.divide(dists, text.text_length), np.log2(np.divide(dists, text.text_length))).sum()) / math.log2(text.frequency_list[t]) if text.frequency_list[t] > 1 else 0 for t, dists in distances.items()}
-    evenness_min = {t: ((1 - f) * (1 / text.text_length) * math.log2(1 / text.text_length) - ((text.text_length - f + 1) / text.text_length) * math.log2((text.text_length - f + 1) / text.text_length)) / math.log2(f) if f > 1 else 0 for t, f in text.frequency_list.items()}
-    dispersions = {t: (e - evenness_min[t]) / (1 - evenness_min[t]) for t, e in evenness_scores.items()}
+    distances, offsets, frequencies = _get_distances(text)
+    n = text.text_length
+    p = distances / n
+    entropies = -np.add.reduceat(p * np.log2(p), offsets)
+    log_f = np.log2(frequencies)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        evenness_scores = np.where(frequencies > 1, entropies / log_f, 0)
+        evenness_min = np.where(frequencies > 1, ((1 - frequencies) * (1 / n) * math.log2(1 / n) - ((n - frequencies + 1) / n) * np.log2((n - frequencies + 1) / n)) / log_f, 0)
+    dispersions = (evenness_scores - evenness_min) / (1 - evenness_min)
     if exclude_hapaxes:
-        dispersions = {t: d for t, d in dispersions.items() if text.frequency_list[t] > 1}
+        dispersions = dispersions[frequencies > 1]
     try:
-        return statistics.mean(dispersions.values())
+        return statistics.mean(dispersions.tolist())
     except statistics.StatisticsError:
         return math.nan
 
@@ -488,6 +528,15 @@ def log_text_length_characters(text):
 
 def orlov_z(text, max_iterations=100, tolerance=1):
     """Orlov (1983)"""
+    most_frequent = max(text.frequency_spectrum.keys())
+    return _orlov_z(text.text_length, text.vocabulary_size, most_frequent, max_iterations, tolerance)
+
+
+def _orlov_z(text_length, vocabulary_size, most_frequent, max_iterations=100, tolerance=1):
+    """Orlov's Z for a text with the given text length, vocabulary size
+    and frequency of the most frequent type.
+
+    """
     def f(z, text_length, vocabulary_size, p_star):
         if z <= 0:
             return math.nan
@@ -511,17 +560,18 @@ def orlov_z(text, max_iterations=100, tolerance=1):
     #         return math.nan
     #     return -(text_length * (math.log(text_length / z) * ((text_length ** 2 - z ** 2) * math.log(p_star * z) - 2 * text_length * z * math.log(p_star * z) ** 2 - 2 * (text_length - z) ** 2) + (text_length - z) * math.log(p_star * z) * ((text_length + z) * math.log(p_star * z) - 2 * text_length + 2 * z)))/(z * (text_length - z) ** 3 * math.log(p_star * z) ** 3)
 
-    most_frequent = max(text.frequency_spectrum.keys())
-    p_star = most_frequent / text.text_length
+    p_star = most_frequent / text_length
     # try values between 10 and 1,000,000,000:
-    values = [(10 ** i + 0.1, f(10 ** i + 0.1, text.text_length, text.vocabulary_size, p_star)) for i in range(1, 10)]
+    values = [(10 ** i + 0.1, f(10 ** i + 0.1, text_length, vocabulary_size, p_star)) for i in range(1, 10)]
     try:
         z_min = max([t for t in values if t[1] < 0], key=operator.itemgetter(1))[0]
         z_max = min([t for t in values if t[1] > 0 and t[0] > z_min], key=operator.itemgetter(1))[0]
     except ValueError:
         return math.nan
-    sol_toms748 = scipy.optimize.root_scalar(f, args=(text.text_length, text.vocabulary_size, p_star), method="toms748", bracket=(z_min, z_max), xtol=tolerance, maxiter=max_iterations)
-    # sol_halley = scipy.optimize.root_scalar(f, args=(text.text_length, text.vocabulary_size, p_star), method="halley", fprime=fprime, fprime2=fprime2, x0=z_max / 2, xtol=tolerance, maxiter=max_iterations)
+    # scipy is slow to import and only needed here
+    import scipy.optimize
+    sol_toms748 = scipy.optimize.root_scalar(f, args=(text_length, vocabulary_size, p_star), method="toms748", bracket=(z_min, z_max), xtol=tolerance, maxiter=max_iterations)
+    # sol_halley = scipy.optimize.root_scalar(f, args=(text_length, vocabulary_size, p_star), method="halley", fprime=fprime, fprime2=fprime2, x0=z_max / 2, xtol=tolerance, maxiter=max_iterations)
     return sol_toms748.root
 
 
@@ -544,4 +594,150 @@ def sttr(tokens, window_size=1000, strategy="spread"):
     http://purl.org/stefan.evert/PUB/EvertWankerlNoeth2017.pdf
 
     """
-    return misc.bootstrap(type_token_ratio, tokens, window_size, strategy)
+    return misc.bootstrap_measures([type_token_ratio], tokens, window_size, strategy, batch_measures=BATCH_MEASURES)[0]
+
+
+# ---------------------------------------------------- #
+# VECTORIZED MEASURES FOR ALL DISJOINT WINDOWS AT ONCE #
+# ---------------------------------------------------- #
+
+# The following functions compute the measures that only depend on
+# text length, vocabulary size and frequency spectrum for all windows
+# at once. They take a windows.WindowStatistics object and return an
+# array with one value per window. Where the scalar versions return
+# NaN or raise an exception, the vectorized versions return NaN or
+# inf; misc.window_results computes these windows with the scalar
+# versions, so that the results (and exceptions) are the same.
+
+def _frequencies(stats):
+    """Frequency classes (starting at 1) as a row vector, text lengths
+    as a column vector and the corresponding columns of the frequency
+    spectrum, for broadcasting.
+
+    """
+    freqs = np.arange(1, stats.frequency_spectrum.shape[1])
+    return freqs, stats.text_length.reshape(-1, 1), stats.frequency_spectrum[:, 1:]
+
+
+def _type_token_ratio_batch(stats):
+    return stats.vocabulary_size / stats.text_length
+
+
+def _guiraud_r_batch(stats):
+    return stats.vocabulary_size / np.sqrt(stats.text_length)
+
+
+def _herdan_c_batch(stats):
+    return np.log(stats.vocabulary_size) / np.log(stats.text_length)
+
+
+def _dugast_k_batch(stats):
+    return np.log(stats.vocabulary_size) / np.log(np.log(stats.text_length))
+
+
+def _maas_a2_batch(stats):
+    return (np.log(stats.text_length) - np.log(stats.vocabulary_size)) / (np.log(stats.text_length) ** 2)
+
+
+def _dugast_u_batch(stats):
+    u = (np.log(stats.text_length) ** 2) / (np.log(stats.text_length) - np.log(stats.vocabulary_size))
+    return np.where(stats.text_length == stats.vocabulary_size, math.nan, u)
+
+
+def _tuldava_ln_batch(stats):
+    v_squared = stats.vocabulary_size ** 2
+    return (1 - v_squared) / (v_squared * np.log(stats.text_length))
+
+
+def _brunet_w_batch(stats, *, a=0.172):
+    return stats.text_length ** (stats.vocabulary_size.astype(float) ** -a)
+
+
+def _cttr_batch(stats):
+    return stats.vocabulary_size / np.sqrt(2 * stats.text_length)
+
+
+def _summer_s_batch(stats):
+    return np.log(np.log(stats.vocabulary_size)) / np.log(np.log(stats.text_length))
+
+
+def _sichel_s_batch(stats):
+    return stats.frequency_spectrum[:, 2] / stats.vocabulary_size
+
+
+def _michea_m_batch(stats):
+    return np.where(stats.frequency_spectrum[:, 2] == 0, math.nan, stats.vocabulary_size / stats.frequency_spectrum[:, 2])
+
+
+def _honore_h_batch(stats):
+    h = 100 * (np.log(stats.text_length) / (1 - (stats.hapaxes / stats.vocabulary_size)))
+    return np.where(stats.hapaxes == stats.vocabulary_size, math.nan, h)
+
+
+def _entropy_batch(stats):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    p = freqs / text_length
+    return (freq_sizes * (-np.log2(p)) * p).sum(axis=1)
+
+
+def _evenness_batch(stats):
+    return _entropy_batch(stats) / np.log2(stats.vocabulary_size)
+
+
+def _jarvis_evenness_batch(stats):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    mean = (stats.text_length / stats.vocabulary_size).reshape(-1, 1)
+    squared_deviations = (freq_sizes * (freqs - mean) ** 2).sum(axis=1)
+    return np.sqrt(squared_deviations / (stats.vocabulary_size - 1))
+
+
+def _yule_k_batch(stats):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    return 10000 * ((freq_sizes * (freqs / text_length) ** 2).sum(axis=1) - (1 / stats.text_length))
+
+
+def _simpson_d_batch(stats):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    return (freq_sizes * (freqs / text_length) * ((freqs - 1) / (text_length - 1))).sum(axis=1)
+
+
+def _herdan_vm_batch(stats):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    return np.sqrt((freq_sizes * (freqs / text_length) ** 2).sum(axis=1) - (1 / stats.vocabulary_size))
+
+
+def _hdd_batch(stats, sample_size=42):
+    freqs, text_length, freq_sizes = _frequencies(stats)
+    terms = np.where(freq_sizes > 0, (1 - misc.hypergeom_pmf_array(0, text_length, freq_sizes, sample_size)) / sample_size, 0)
+    return terms.sum(axis=1)
+
+
+def _orlov_z_batch(stats, max_iterations=100, tolerance=1):
+    freqs = np.arange(stats.frequency_spectrum.shape[1])
+    most_frequent = np.where(stats.frequency_spectrum > 0, freqs, 0).max(axis=1)
+    return np.array([_orlov_z(n, v, m, max_iterations, tolerance) for n, v, m in zip(stats.text_length.tolist(), stats.vocabulary_size.tolist(), most_frequent.tolist())])
+
+
+# Vectorized equivalents of the scalar measures, to be used with
+# misc.bootstrap_measures
+BATCH_MEASURES = {type_token_ratio: _type_token_ratio_batch,
+                  guiraud_r: _guiraud_r_batch,
+                  herdan_c: _herdan_c_batch,
+                  dugast_k: _dugast_k_batch,
+                  maas_a2: _maas_a2_batch,
+                  dugast_u: _dugast_u_batch,
+                  tuldava_ln: _tuldava_ln_batch,
+                  brunet_w: _brunet_w_batch,
+                  cttr: _cttr_batch,
+                  summer_s: _summer_s_batch,
+                  sichel_s: _sichel_s_batch,
+                  michea_m: _michea_m_batch,
+                  honore_h: _honore_h_batch,
+                  entropy: _entropy_batch,
+                  evenness: _evenness_batch,
+                  jarvis_evenness: _jarvis_evenness_batch,
+                  yule_k: _yule_k_batch,
+                  simpson_d: _simpson_d_batch,
+                  herdan_vm: _herdan_vm_batch,
+                  hdd: _hdd_batch,
+                  orlov_z: _orlov_z_batch}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# generated CoNLL-U samples that are shared by several tests
+
+import random
+
+
+def random_trees(n_sentences, seed):
+    """Random dependency trees in CoNLL-U format; some sentences contain
+    multi-word tokens or enhanced dependencies that are not trees.
+
+    """
+    rng = random.Random(seed)
+    lines = []
+    for s in range(n_sentences):
+        n = rng.randint(1, 30)
+        heads = [0] * n
+        order = list(range(n))
+        rng.shuffle(order)
+        attached = [order[0]]
+        for i in order[1:]:
+            heads[i] = rng.choice(attached) + 1
+            attached.append(i)
+        mwt = n > 2 and rng.random() < 0.2
+        enhanced = n > 2 and rng.random() < 0.2
+        for i in range(n):
+            if mwt and i == 1:
+                lines.append("2-3\tzum\t_\t_\t_\t_\t_\t_\t_\t_")
+            relation = "root" if heads[i] == 0 else "dep"
+            deps = "_"
+            if enhanced:
+                deps = "%d:%s" % (heads[i], relation)
+                if heads[i] != 0 and i == n - 1:
+                    deps += "|%d:conj" % rng.choice([h for h in range(1, n + 1) if h not in (i + 1, heads[i])])
+            lines.append("%d\tw\tw\tX\tX\t_\t%d\t%s\t%s\t_" % (i + 1, heads[i], relation, deps))
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def random_text(n_sentences, seed):
+    """Random sentences in CoNLL-U format."""
+    rng = random.Random(seed)
+    words = "a b c d e f g h i j k l m n o p".split()
+    lines = []
+    for s in range(n_sentences):
+        n = rng.randint(1, 25)
+        for i in range(n):
+            word, tag = (".", "PUNCT") if rng.random() < 0.1 else (rng.choice(words), rng.choice(["NN", "VV"]))
+            head = 0 if i == 0 else rng.randint(1, i)
+            relation = "root" if i == 0 else "dep"
+            lines.append("%d\t%s\t_\tX\t%s\t_\t%d\t%s\t_\t_" % (i + 1, word, tag, head, relation))
+        lines.append("")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import io
+import itertools
+import unittest
+
+import textcomplexity
+from textcomplexity import api, cli
+from textcomplexity.test.samples import random_text
+from textcomplexity.utils import conllu
+
+
+class TestAnalyzeMany(unittest.TestCase):
+    def setUp(self):
+        self.texts = [random_text(20, i) for i in range(3)]
+        args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "20", "--no-cache", "-i", "conllu"])
+        ld = cli.language_definition(args)
+        self.expected = []
+        for text in self.texts:
+            f = io.StringIO(text)
+            f.name = "<document>"
+            self.expected.append(cli.analyze(f, args, ld, cli.new_vocabularies()))
+
+    def tearDown(self):
+        api.close()
+
+    def test_strings(self):
+        results = textcomplexity.analyze_many(iter(self.texts), preset="core", lang="de", window_size=20)
+        self.assertEqual(list(results), self.expected)
+
+    def test_documents(self):
+        documents = [conllu.read_conllu_document(io.StringIO(text)) for text in self.texts]
+        results = textcomplexity.analyze_many(documents, preset="core", lang="de", window_size=20)
+        self.assertEqual(list(results), self.expected)
+
+    def test_packed_documents(self):
+        # workers get only the strings of a document, not the shared
+        # vocabularies
+        vocabularies = cli.new_vocabularies()
+        vocabularies.words.encode(["unused%d" % i for i in range(1000)])
+        documents = [conllu.read_conllu_document(io.StringIO(text), words=vocabularies.words, tags=vocabularies.tags, upos=vocabularies.upos, relation_vocabulary=vocabularies.relations)
+                     for text in self.texts]
+        packed = api._pack(documents[1])
+        self.assertEqual(packed["words"][1], list(dict.fromkeys(t.word for t in documents[1].tokens)))
+        unpacked = api._unpack(packed)
+        self.assertEqual([(t.word, t.pos) for t in unpacked.tokens], [(t.word, t.pos) for t in documents[1].tokens])
+        results = textcomplexity.analyze_many(documents, preset="core", lang="de", jobs=2, window_size=20)
+        self.assertEqual(list(results), self.expected)
+
+    def test_lazy(self):
+        # documents are only read ahead by a bounded number of chunks
+        consumed = []
+
+        def documents():
+            for i in itertools.count():
+                consumed.append(i)
+                yield self.texts[i % len(self.texts)]
+
+        results = textcomplexity.analyze_many(documents(), preset="core", lang="de", jobs=2, window_size=20)
+        self.assertEqual(consumed, [])
+        first = list(itertools.islice(results, 10))
+        self.assertEqual(first, [self.expected[i % len(self.texts)] for i in range(10)])
+        self.assertLessEqual(len(consumed), 10 + 2 * api.PENDING_CHUNKS_PER_JOB * api.CHUNK_SIZE)
+        results.close()
+
+    def test_jobs(self):
+        for i in range(2):
+            results = textcomplexity.analyze_many(self.texts, preset="core", lang="de", jobs=2, window_size=20)
+            self.assertEqual(list(results), self.expected)
+        # the worker pool is reused
+        self.assertEqual(len(api._pools), 1)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            textcomplexity.analyze_many(self.texts, preset="none")
+        with self.assertRaises(ValueError):
+            textcomplexity.analyze_many(self.texts, lang="other")
+        document = conllu.read_conllu_document(io.StringIO(self.texts[0]), dependencies=False)
+        with self.assertRaises(ValueError):
+            list(textcomplexity.analyze_many([document], preset="core", window_size=20))
+        with self.assertRaises(TypeError):
+            list(textcomplexity.analyze_many([self.texts[0].splitlines()]))
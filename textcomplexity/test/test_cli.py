@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from textcomplexity import cli, index
+from textcomplexity.test.samples import random_text
+from textcomplexity.utils import npz
+from textcomplexity.utils.test import test_treebank
+
+class TestAnalyzeFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filenames = []
+        for i in range(4):
+            filename = os.path.join(self.directory.name, "%d.conllu" % i)
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(random_text(50 + 20 * i, i))
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _results(self, *options):
+        args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "50", "--no-cache", *options, "-i", "conllu", *self.filenames])
+        return list(cli.analyze_files(cli.input_files(args), args))
+
+    def test_input_files(self):
+        list_file = os.path.join(self.directory.name, "files.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.filenames[2:]) + "\n")
+        args = cli.arguments(["--glob", "[01].conllu", "--input-list", list_file, "-i", "conllu", self.directory.name])
+        self.assertEqual(list(cli.input_files(args)), self.filenames[:2] + self.filenames[2:])
+
+    def test_result_names(self):
+        for preset in ("lexical_core", "core", "extended_core"):
+            for lang in ("de", "none"):
+                args = cli.arguments(["--preset", preset, "--lang", lang, "--window-size", "50", "--no-cache", "-i", "conllu", *self.filenames])
+                names = cli.result_names(args, cli.language_definition(args))
+                for filename, results in cli.analyze_files(cli.input_files(args), args):
+                    self.assertEqual([r.name for r in results], names)
+
+    def test_result_names_constituents(self):
+        tsv = os.path.join(self.directory.name, "a.tsv")
+        with open(tsv, "w", encoding="utf-8") as f:
+            f.write(test_treebank.TSV * 30)
+        # binary files with and without constituency trees
+        npz_files = []
+        for path, input_format in ((tsv, "tsv"), (self.filenames[0], "conllu")):
+            npz_files.append(os.path.join(self.directory.name, "%s.npz" % input_format))
+            with open(path, encoding="utf-8") as f:
+                document, ps_trees = index.read_document(f, input_format)
+            with open(npz_files[-1], "wb") as f:
+                npz.save_document(f, document, ps_trees)
+        for preset in ("lexical_core", "core", "extended_core"):
+            for lang in ("de", "none"):
+                for input_format, path in (("tsv", tsv), ("npz", npz_files[0]), ("npz", npz_files[1])):
+                    args = cli.arguments(["--preset", preset, "--lang", lang, "--window-size", "20", "--no-cache", "-i", input_format, path])
+                    paths, constituents = cli._peek_constituents(cli.input_files(args), args)
+                    names = cli.result_names(args, cli.language_definition(args), constituents)
+                    for filename, results in cli.analyze_files(paths, args):
+                        self.assertEqual(filename, path)
+                        self.assertEqual([r.name for r in results], names)
+
+    def test_requirements(self):
+        def requirements(*options):
+            args = cli.arguments([*options, *self.filenames])
+            return cli.requirements(args, cli.language_definition(args))
+        self.assertEqual(requirements("--preset", "lexical_core", "-i", "conllu"), {cli.TOKENS})
+        self.assertEqual(requirements("--preset", "lexical_core", "--lang", "de", "-i", "conllu"), {cli.TOKENS, cli.TAGS})
+        self.assertEqual(requirements("--preset", "core", "-i", "conllu"), {cli.TOKENS, cli.SENTENCES, cli.DEPENDENCIES})
+        self.assertIn(cli.CONSTITUENTS, requirements("--preset", "extended_core", "-i", "tsv"))
+
+    def test_jobs(self):
+        expected = self._results()
+        self.assertEqual([name for name, results in expected], self.filenames)
+        self.assertEqual(self._results("--jobs", "2"), expected)
+        self.assertCountEqual(self._results("--jobs", "2", "--unordered"), expected)
+
+    def test_cache(self):
+        expected = self._results()
+        cache_dir = os.path.join(self.directory.name, "cache")
+        options = ["--cache-dir", cache_dir]
+        args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "50", *options, "-i", "conllu", *self.filenames])
+        self.assertEqual(list(cli.analyze_files(cli.input_files(args), args)), expected)
+        cache = cli.result_cache(args)
+        keys = [cache.key(filename) for filename in self.filenames]
+        self.assertTrue(all(cache.get(key) is not None for key in keys))
+        # cached results are used instead of the files
+        for key in keys:
+            cache.put(key, [["x", 1.0, None, None, None]])
+        self.assertEqual(list(cli.analyze_files(cli.input_files(args), args))[0][1], [cli.Result("x", 1.0, None, None, None)])
+        # other options result in other keys
+        args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "40", *options, "-i", "conllu", *self.filenames])
+        self.assertNotIn(cli.result_cache(args).key(self.filenames[0]), keys)
+
+    def test_shards(self):
+        expected = self._results()
+        self.assertEqual(self._results("--jobs", "3", "--shard-size", "0.002"), expected)
+
+    def test_store(self):
+        expected = self._results()
+        directory = os.path.join(self.directory.name, "store")
+        index.build_store(directory, self.filenames)
+        for jobs in ("1", "2"):
+            args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "50", "--jobs", jobs, "-i", "store", directory])
+            self.assertEqual(list(cli.analyze_files(cli.input_files(args), args)), expected)
+
+
+class TestImports(unittest.TestCase):
+    """Heavy dependencies are only imported when a measure or an input
+    format needs them. The tests run in fresh interpreters.
+
+    """
+
+    def _run(self, code, *argv):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ, PYTHONPATH=root)
+        return subprocess.run([sys.executable, "-c", code, *argv], env=env, capture_output=True, text=True, check=True).stdout.split()
+
+    def test_lazy_imports(self):
+        # the package itself (i.e. textcomplexity.analyze_many) needs
+        # neither the command line interface nor numpy
+        code = "import sys, textcomplexity; print(*(m for m in ('numpy', 'textcomplexity.cli', 'scipy', 'networkx', 'nltk') if m in sys.modules))"
+        self.assertEqual(self._run(code), [])
+        code = "import sys, textcomplexity.cli; print(*(m for m in ('scipy', 'networkx', 'nltk') if m in sys.modules))"
+        self.assertEqual(self._run(code), [])
+        with tempfile.NamedTemporaryFile("w", suffix=".conllu", encoding="utf-8", delete=False) as f:
+            f.write(random_text(50, 0))
+        try:
+            code = ("import sys; from textcomplexity import cli; "
+                    "args = cli.arguments(['--preset', sys.argv[1], '--lang', 'de', '--window-size', '50', '--no-cache', '-i', 'conllu', sys.argv[2]]); "
+                    "list(cli.analyze_files(cli.input_files(args), args)); "
+                    "print(*(m for m in ('scipy', 'networkx', 'nltk') if m in sys.modules))")
+            self.assertEqual(self._run(code, "lexical_core", f.name), [])
+            self.assertEqual(self._run(code, "core", f.name), [])
+        finally:
+            os.unlink(f.name)
+        # sentences with enhanced dependencies are validated without
+        # graphs if no dependency-based measure is selected
+        with tempfile.NamedTemporaryFile("w", suffix=".conllu", encoding="utf-8", delete=False) as f:
+            f.write(random_text(50, 0) + test_treebank.CONLLU)
+        try:
+            self.assertEqual(self._run(code, "lexical_core", f.name), [])
+        finally:
+            os.unlink(f.name)
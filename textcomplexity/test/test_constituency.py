@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from nltk.tree import ParentedTree
+
+from textcomplexity import constituency
+from textcomplexity.utils.treebank import ConstituencyTrees
+
+
+class TestAnalyze(unittest.TestCase):
+    def setUp(self):
+        self.tree = ParentedTree.fromstring("(TOP (CS (S (NP (ART Der) (NN Mann)) (VVFIN sagt) (S (KOUS dass) (PPER es) (VVFIN regnet))) (KON und) (S (PPER er) (VVFIN geht) (PP (APPR nach) (NN Hause)))) ($. .))")
+
+    def test_analyze(self):
+        a = constituency._analyze(self.tree)
+        self.assertEqual(a.t_units, (2, [6, 4]))
+        self.assertEqual(a.complex_t_units, (1, [6]))
+        self.assertEqual(a.clauses, (3, [3, 6, 4]))
+        self.assertEqual(a.dependent_clauses, (1, [3]))
+        self.assertEqual(a.nps, (1, [2]))
+        self.assertEqual(a.vps, (0, []))
+        self.assertEqual(a.pps, (1, [2]))
+        self.assertEqual(a.coordinate_phrases, (0, []))
+        self.assertEqual(a.constituents, len(list(self.tree.subtrees())))
+        self.assertEqual(a.constituents_wo_leaves, len(list(self.tree.subtrees())) - len(self.tree.leaves()))
+        self.assertEqual(a.height, self.tree.height())
+
+    def test_analyzed_trees(self):
+        trees = [self.tree, self.tree.copy(deep=True)]
+        analyses = constituency.analyze(trees)
+        self.assertEqual(constituency.t_units(trees), constituency.t_units(analyses))
+        self.assertEqual(constituency.height(trees), constituency.height(analyses))
+
+    def test_constituency_trees(self):
+        trees = [self.tree, ParentedTree.fromstring("(TOP (S (NP (PPER Er)) (VVFIN sagt) (S (PPER sie) (VVFIN komme))) ($. .))")]
+        constituency_trees = ConstituencyTrees.from_trees(trees)
+        for measure in (constituency.t_units, constituency.complex_t_units, constituency.clauses, constituency.dependent_clauses,
+                        constituency.nps, constituency.constituents, constituency.constituents_wo_leaves, constituency.height):
+            self.assertEqual(measure(trees), measure(constituency_trees))
+
+    def test_leaf_s(self):
+        # a word form "S" is not an S node
+        trees = [ParentedTree.fromstring("(TOP (S (NN S) (VVFIN fährt)) ($. .))"), self.tree, ParentedTree.fromstring("(TOP (S (NP (PPER Er)) (VVFIN sagt) (S (PPER sie) (VVFIN komme))) ($. .))")]
+        self.assertEqual(constituency._analyze(trees[0]).complex_t_units, (0, []))
+        self.assertAlmostEqual(constituency.complex_t_units(trees)[0], 2 / 3)
+        self.assertEqual(constituency.complex_t_units(ConstituencyTrees.from_trees(trees)), constituency.complex_t_units(trees))
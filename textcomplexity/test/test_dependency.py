@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from textcomplexity import dependency
+from textcomplexity.test.samples import random_trees
+from textcomplexity.utils import conllu
+
+
+class TestDependencyTrees(unittest.TestCase):
+    def setUp(self):
+        data = random_trees(300, 42)
+        self.graphs = [g for tokens, g in conllu.read_conllu_sentences(io.StringIO(data))]
+        sentences, self.trees = conllu.read_conllu_treebank(io.StringIO(data))
+        self.assertGreater(len(self.trees.graphs), 0)
+
+    def test_per_sentence_01(self):
+        measures = [dependency.average_dependency_distance,
+                    dependency.closeness_centrality,
+                    dependency.outdegree_centralization,
+                    dependency.closeness_centralization,
+                    dependency.longest_shortest_path,
+                    dependency.dependents_per_word]
+        for measure in measures:
+            expected = dependency.per_sentence(measure, self.graphs).tolist()
+            values = dependency.per_sentence(measure, self.trees).tolist()
+            self.assertEqual(len(values), len(expected))
+            for value, expected_value in zip(values, expected):
+                self.assertAlmostEqual(value, expected_value, places=12, msg=measure.__name__)
+            mean, stdev = measure(self.trees)
+            self.assertAlmostEqual(mean, measure(self.graphs)[0], places=12)
+            self.assertAlmostEqual(stdev, measure(self.graphs)[1], places=12)
+
+    def test_per_sentence_02(self):
+        # a long chain, i.e. a very deep tree
+        lines = ["1\tw\tw\tX\tX\t_\t0\troot\t_\t_"]
+        lines.extend(["%d\tw\tw\tX\tX\t_\t%d\tdep\t_\t_" % (i, i - 1) for i in range(2, 181)])
+        data = "\n".join(lines) + "\n\n"
+        graphs = [g for tokens, g in conllu.read_conllu_sentences(io.StringIO(data))]
+        sentences, trees = conllu.read_conllu_treebank(io.StringIO(data))
+        self.assertEqual(dependency.per_sentence(dependency.longest_shortest_path, trees).tolist(), [179])
+        for measure in (dependency.closeness_centrality, dependency.closeness_centralization):
+            self.assertAlmostEqual(dependency.per_sentence(measure, trees)[0], dependency.per_sentence(measure, graphs)[0], places=12)
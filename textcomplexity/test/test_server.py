@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import http.client
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from textcomplexity import cli, server
+from textcomplexity.test.samples import random_text
+from textcomplexity.utils import writers
+
+
+class BrokenExecutor(concurrent.futures.Executor):
+    """An executor whose worker processes have died."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        future.set_exception(concurrent.futures.process.BrokenProcessPool("A worker process terminated abruptly"))
+        return future
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(2)
+        self.batcher = server.Batcher(self.executor, max_pending_batches=2, max_batch_size=4, max_delay=0.05, max_queue_size=8)
+        self.analysis_server = server.AnalysisServer(self.batcher)
+        self.server = await self.analysis_server.start(port=0)
+        self.address = self.server.sockets[0].getsockname()[:2]
+        self.batcher_task = asyncio.create_task(self.batcher.run())
+
+    async def asyncTearDown(self):
+        self.batcher_task.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    def _request(self, method, path, body=None, chunked=False):
+        connection = http.client.HTTPConnection(*self.address)
+        if body is not None:
+            body = body.encode("utf-8")
+            if chunked:
+                body = iter([body])
+        try:
+            connection.request(method, path, body=body, encode_chunked=chunked)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read().decode("utf-8"))
+        finally:
+            connection.close()
+
+    async def _requests(self, requests):
+        return await asyncio.gather(*(asyncio.to_thread(self._request, *request) for request in requests))
+
+    async def test_analyze(self):
+        texts = [random_text(50 + 10 * i, i) for i in range(6)]
+        args = cli.arguments(["--preset", "core", "--lang", "de", "--window-size", "50", "--no-cache", "-i", "conllu"])
+        ld = cli.language_definition(args)
+        expected = []
+        for text in texts:
+            f = io.StringIO(text)
+            f.name = "<request>"
+            expected.append(writers.result_dict(cli.analyze(f, args, ld, cli.new_vocabularies())))
+        path = "/analyze?input_format=conllu&preset=core&lang=de&window_size=50"
+        responses = await self._requests([("POST", path, text) for text in texts])
+        self.assertEqual(responses, [(200, results) for results in expected])
+        status, stats = await asyncio.to_thread(self._request, "GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["requests"], len(texts))
+        self.assertEqual(stats["errors"], 0)
+        self.assertLess(stats["batches"], len(texts))
+        self.assertGreaterEqual(stats["latency"]["99th percentile"], stats["latency"]["median"])
+
+    async def test_errors(self):
+        responses = await self._requests([("POST", "/analyze?input_format=npz", ""),
+                                          ("POST", "/analyze?input_format=conllu&preset=none", ""),
+                                          ("POST", "/analyze?input_format=conllu", "1\tfoo\n"),
+                                          ("GET", "/analyze")])
+        self.assertEqual([status for status, response in responses], [400, 400, 400, 404])
+        status, stats = await asyncio.to_thread(self._request, "GET", "/stats")
+        self.assertEqual(stats["errors"], 3)
+        self.assertEqual(stats["server errors"], 0)
+
+    async def test_server_errors(self):
+        # failures that are not caused by the text are server errors
+        path = "/analyze?input_format=conllu&preset=lexical_core&window_size=20"
+        with self.assertLogs(level="ERROR"), mock.patch("textcomplexity.cli.analyze", side_effect=ZeroDivisionError("division by zero")):
+            status, response = await asyncio.to_thread(self._request, "POST", path, random_text(20, 0))
+        self.assertEqual(status, 500)
+        self.batcher.executor = BrokenExecutor()
+        with self.assertLogs(level="ERROR"):
+            status, response = await asyncio.to_thread(self._request, "POST", path, random_text(20, 0))
+        self.assertEqual(status, 500)
+        self.assertIn("BrokenProcessPool", response["error"])
+        status, stats = await asyncio.to_thread(self._request, "GET", "/stats")
+        self.assertEqual((stats["errors"], stats["server errors"]), (0, 2))
+
+    async def test_limits(self):
+        self.analysis_server.max_body_size = 100
+        text = random_text(20, 0)
+        self.assertGreater(len(text), 100)
+        path = "/analyze?input_format=conllu&preset=lexical_core&window_size=20"
+        status, response = await asyncio.to_thread(self._request, "POST", path, text)
+        self.assertEqual(status, 413)
+        status, response = await asyncio.to_thread(self._request, "POST", path, text[:50], True)
+        self.assertEqual(status, 411)
+
+    async def test_language_definition(self):
+        # --lang-def is only used for lang=other
+        self.assertIsNone(server.request_arguments({"input_format": ["conllu"], "lang": ["de"]}, "/tmp/lang.json").lang_def)
+        self.assertEqual(server.request_arguments({"input_format": ["conllu"], "lang": ["other"]}, "/tmp/lang.json").lang_def, "/tmp/lang.json")
+        with self.assertRaises(ValueError):
+            server.request_arguments({"input_format": ["conllu"], "lang": ["other"]})
+        # an invalid language definition is an error of the server
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            f.write("{")
+        self.addCleanup(os.unlink, f.name)
+        self.analysis_server.lang_def = f.name
+        with self.assertLogs(level="ERROR"):
+            status, response = await asyncio.to_thread(self._request, "POST", "/analyze?input_format=conllu&lang=other", "")
+        self.assertEqual(status, 500)
+        status, response = await asyncio.to_thread(self._request, "POST", "/analyze?input_format=conllu&lang=de&window_size=20", random_text(20, 0))
+        self.assertEqual(status, 200)
+
+    async def test_backpressure(self):
+        # requests are rejected while the queue is full
+        self.batcher_task.cancel()
+        await asyncio.gather(self.batcher_task, return_exceptions=True)
+        args = server.request_arguments({"input_format": ["conllu"], "preset": ["lexical_core"], "window_size": ["20"]})
+        futures = [self.batcher.submit(args, random_text(50, i)) for i in range(8)]
+        with self.assertRaises(asyncio.QueueFull):
+            self.batcher.submit(args, "")
+        status, response = await asyncio.to_thread(self._request, "POST", "/analyze?input_format=conllu", "")
+        self.assertEqual(status, 503)
+        self.batcher_task = asyncio.create_task(self.batcher.run())
+        outcomes = await asyncio.gather(*futures)
+        self.assertEqual([status for status, results in outcomes], ["ok"] * 8)
+        self.assertEqual(self.batcher.batches, 2)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import pickle
+import unittest
+
+from textcomplexity import dependency, sentence, surface
+from textcomplexity.streaming import StreamingAnalysis
+from textcomplexity.test.samples import random_text
+from textcomplexity.utils import conllu, misc
+from textcomplexity.utils.text import Text
+
+
+class TestStreamingAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.data = random_text(200, 7)
+        self.document = conllu.read_conllu_document(io.StringIO(self.data))
+        self.window_measures = [surface.type_token_ratio, surface.sichel_s, surface.evenness]
+        self.dependency_measures = [dependency.average_dependency_distance, dependency.closeness_centrality]
+
+    def _analysis(self, window_size, batch_size):
+        analysis = StreamingAnalysis(len(self.document.tokens), window_size, self.window_measures, self.dependency_measures,
+                                     punct_tags={"PUNCT"}, moving_windows=True, mtld=True)
+        for document in conllu.read_conllu_batches(io.StringIO(self.data), batch_size=batch_size, chunk_size=64):
+            analysis.add(document)
+        return analysis
+
+    def _merged_analysis(self, window_size, n_sentences):
+        """Analyze parts of n_sentences sentences with separate
+        vocabularies and merge them.
+
+        """
+        text_length = len(self.document.tokens)
+        analysis, start = None, 0
+        for document in conllu.read_conllu_batches(io.StringIO(self.data), batch_size=n_sentences):
+            span = (start, start + len(document.tokens))
+            start = span[1]
+            part = StreamingAnalysis(text_length, window_size, self.window_measures, self.dependency_measures,
+                                     punct_tags={"PUNCT"}, moving_windows=True, mtld=True, span=span)
+            part.add(document)
+            # parts are sent to another process
+            part = pickle.loads(pickle.dumps(part))
+            if analysis is None:
+                analysis = part
+            else:
+                analysis.merge(part)
+        return analysis
+
+    def test_windows(self):
+        for window_size in (7, 100):
+            analysis = self._analysis(window_size, 3)
+            expected = misc.bootstrap_measures(self.window_measures, self.document.tokens, window_size, batch_measures=surface.BATCH_MEASURES)
+            for (mean, ci, results), (expected_mean, expected_ci, expected_results) in zip(analysis.bootstrap(), expected):
+                self.assertEqual(len(results), len(expected_results))
+                for value, expected_value in zip(results, expected_results):
+                    self.assertAlmostEqual(value, expected_value, places=12)
+                self.assertAlmostEqual(mean, expected_mean, places=12)
+                self.assertAlmostEqual(ci, expected_ci, places=12)
+
+    def test_whole_text(self):
+        analysis = self._analysis(50, 5)
+        text = Text.from_tokens(self.document.tokens)
+        self.assertEqual(analysis.mattr_value(), surface.mattr(text, 50))
+        self.assertEqual(analysis.mtld_value(), surface.mtld(text))
+        self.assertEqual(analysis.text_length_characters_value(), surface.text_length_characters(text))
+
+    def test_merge(self):
+        for window_size, n_sentences in ((7, 3), (20, 40)):
+            expected = self._analysis(window_size, 5)
+            analysis = self._merged_analysis(window_size, n_sentences)
+            self.assertEqual(analysis.bootstrap(), expected.bootstrap())
+            self.assertEqual(analysis.mattr_value(), expected.mattr_value())
+            self.assertEqual(analysis.mtld_value(), expected.mtld_value())
+            for measure in [sentence.sentence_length_words, sentence.punctuation_per_token] + self.dependency_measures:
+                self.assertEqual(analysis.evaluate(measure), expected.evaluate(measure))
+
+    def test_close(self):
+        # the temporary files of a span are removed if the analysis is
+        # abandoned
+        part = StreamingAnalysis(len(self.document.tokens), 20, self.window_measures, self.dependency_measures,
+                                 punct_tags={"PUNCT"}, mtld=True, span=(0, len(self.document.tokens)))
+        part.add(self.document)
+        part = pickle.loads(pickle.dumps(part))
+        names = [spool.name for spool, length, translation in part.mtld.segments]
+        self.assertTrue(names)
+        self.assertTrue(all(os.path.exists(name) for name in names))
+        part.close()
+        part.close()
+        self.assertFalse(any(os.path.exists(name) for name in names))
+
+    def test_sentences(self):
+        analysis = self._analysis(50, 5)
+        sentences = self.document.sentences()
+        self.assertEqual(analysis.evaluate(sentence.sentence_length_tokens), sentence.sentence_length_tokens(sentences))
+        self.assertEqual(analysis.evaluate(sentence.sentence_length_characters), sentence.sentence_length_characters(sentences))
+        self.assertEqual(analysis.evaluate(sentence.sentence_length_words), sentence.sentence_length_words(sentences, {"PUNCT"}))
+        self.assertEqual(analysis.evaluate(sentence.punctuation_per_token), sentence.punctuation_per_token(sentences, {"PUNCT"}))
+        for measure in self.dependency_measures:
+            self.assertEqual(analysis.evaluate(measure), measure(self.document.dependency_trees))
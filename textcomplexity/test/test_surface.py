@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
+import math
+import random
+import statistics
 import unittest
 
+import numpy as np
+import scipy.spatial.distance
+
 # sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from textcomplexity import surface
-from textcomplexity.utils import text, windows
+from textcomplexity.utils import misc, text, token, windows
 from textcomplexity.utils.token import Token
 
 
@@ -38,3 +44,111 @@ class TestMattr(unittest.TestCase):
         mean = sum(results) / len(results)
         b = text.Text.from_tokens(b)
         self.assertAlmostEqual(surface.mattr(b, 10), mean, places=10)
+
+
+class TestBatchMeasures(unittest.TestCase):
+    def test_batch_measures_01(self):
+        a = ("the cat sat on the mat and the dog sat on the cat while a bird "
+             "sang on the roof of the house and the dog barked at the bird "
+             "but the cat did not care about the dog or the bird at all").split()
+        a = token.TokenArray.from_tokens([Token(tok, "N/A") for tok in a * 6])
+        stats = windows.batch_window_statistics(a, 45, strategy="spread")
+        texts = list(windows.disjoint_windows(a, 45, strategy="spread"))
+        self.assertEqual(stats.vocabulary_size.tolist(), [t.vocabulary_size for t in texts])
+        for measure, batch_measure in surface.BATCH_MEASURES.items():
+            expected = [measure(t) for t in texts]
+            for value, expected_value in zip(batch_measure(stats).tolist(), expected):
+                self.assertAlmostEqual(value, expected_value, places=10, msg=measure.__name__)
+
+    def test_batch_measures_02(self):
+        # windows for which a measure is not defined behave as with
+        # the scalar measures
+        a = token.TokenArray.from_tokens([Token(tok, "N/A") for tok in "a a a a b c d e f g".split()])
+        for measure, window_size in ((surface.herdan_c, 1), (surface.simpson_d, 1), (surface.evenness, 2)):
+            for batch_measures in (None, surface.BATCH_MEASURES):
+                with self.assertRaises(ZeroDivisionError, msg=measure.__name__):
+                    misc.bootstrap_measures([measure], a, window_size, batch_measures=batch_measures)
+        with self.assertRaises(statistics.StatisticsError):
+            misc.bootstrap_measures([surface.jarvis_evenness], a, 2, batch_measures=surface.BATCH_MEASURES)
+        # Dugast's U is NaN for windows with distinct tokens
+        results = misc.window_results([surface.dugast_u], a, 2, batch_measures=surface.BATCH_MEASURES)[0]
+        self.assertEqual([math.isnan(v) for v in results], [False, False, True, True, True])
+
+
+def _distances_per_type(text):
+    """The original extraction of distances between tokens of the same
+    type.
+
+    """
+    distances = {t: [] for t in text.frequency_list.keys()}
+    first, last = {}, {}
+    for i, token in enumerate(text.tokens):
+        if token in first:
+            dist = i - last[token]
+            distances[token].append(dist)
+        else:
+            first[token] = i
+        last[token] = i
+    for token in distances.keys():
+        dist = first[token] + text.text_length - last[token]
+        distances[token].append(dist)
+    return {t: np.array(dists) for t, dists in distances.items()}
+
+
+def _pairwise_gini_based_dispersion(text, exclude_hapaxes=False):
+    """The original implementation of Gini-based dispersion that uses
+    the pairwise distance matrix of every type.
+
+    """
+    distances = _distances_per_type(text)
+    ginis = {t: scipy.spatial.distance.squareform(scipy.spatial.distance.pdist(dists.reshape(-1, 1))).mean() / (2 * dists.mean()) for t, dists in distances.items()}
+    gini_max = {t: (text.text_length - f) * (f - 1) / (f * text.text_length) for t, f in text.frequency_list.items()}
+    dispersions = {t: 1 if g == 0 else 1 - (g / gini_max[t]) for t, g in ginis.items()}
+    if exclude_hapaxes:
+        dispersions = {t: d for t, d in dispersions.items() if text.frequency_list[t] > 1}
+    return statistics.mean(dispersions.values())
+
+
+class TestGiniBasedDispersion(unittest.TestCase):
+    def test_gini_based_dispersion_01(self):
+        rng = random.Random(42)
+        vocabulary = ["w%d" % i for i in range(50)]
+        weights = [1 / (i + 1) for i in range(50)]
+        for text_length in (10, 100, 1000):
+            a = [Token(tok, "N/A") for tok in rng.choices(vocabulary, weights, k=text_length)]
+            a = text.Text.from_tokens(a)
+            for exclude_hapaxes in (False, True):
+                self.assertAlmostEqual(surface.gini_based_dispersion(a, exclude_hapaxes=exclude_hapaxes),
+                                       _pairwise_gini_based_dispersion(a, exclude_hapaxes=exclude_hapaxes),
+                                       places=12)
+
+    def test_gini_based_dispersion_02(self):
+        a = [Token(tok, "N/A") for tok in "a b a b a b a b".split()]
+        a = text.Text.from_tokens(a)
+        self.assertEqual(surface.gini_based_dispersion(a), 1)
+
+
+def _per_type_evenness_based_dispersion(text, exclude_hapaxes=False):
+    """The original implementation of evenness-based dispersion."""
+    distances = _distances_per_type(text)
+    evenness_scores = {t: (-1 * np.multiply(np.divide(dists, text.text_length), np.log2(np.divide(dists, text.text_length))).sum()) / math.log2(text.frequency_list[t]) if text.frequency_list[t] > 1 else 0 for t, dists in distances.items()}
+    evenness_min = {t: ((1 - f) * (1 / text.text_length) * math.log2(1 / text.text_length) - ((text.text_length - f + 1) / text.text_length) * math.log2((text.text_length - f + 1) / text.text_length)) / math.log2(f) if f > 1 else 0 for t, f in text.frequency_list.items()}
+    dispersions = {t: (e - evenness_min[t]) / (1 - evenness_min[t]) for t, e in evenness_scores.items()}
+    if exclude_hapaxes:
+        dispersions = {t: d for t, d in dispersions.items() if text.frequency_list[t] > 1}
+    return statistics.mean(dispersions.values())
+
+
+class TestEvennessBasedDispersion(unittest.TestCase):
+    def test_evenness_based_dispersion_01(self):
+        rng = random.Random(23)
+        vocabulary = ["w%d" % i for i in range(50)]
+        weights = [1 / (i + 1) for i in range(50)]
+        for text_length in (10, 100, 1000):
+            tokens = [Token(tok, "N/A") for tok in rng.choices(vocabulary, weights, k=text_length)]
+            a = text.Text.from_tokens(tokens)
+            b = text.Text.from_tokens(token.TokenArray.from_tokens(tokens))
+            for exclude_hapaxes in (False, True):
+                expected = _per_type_evenness_based_dispersion(a, exclude_hapaxes=exclude_hapaxes)
+                self.assertAlmostEqual(surface.evenness_based_dispersion(a, exclude_hapaxes=exclude_hapaxes), expected, places=12)
+                self.assertAlmostEqual(surface.evenness_based_dispersion(b, exclude_hapaxes=exclude_hapaxes), expected, places=12)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import tempfile
+
+
+class ResultCache:
+    """On-disk cache for the results of input files. Entries are
+    addressed by a hash of the file content and of the options that
+    determine the results, so that changed files or options never hit
+    stale entries. Every entry is a small JSON file; entries are
+    written atomically, i.e. several processes can share a cache.
+
+    max_size: Size limit of the cache in bytes. It is enforced by
+    evict, which removes the least recently used entries.
+
+    """
+
+    def __init__(self, directory, max_size, options):
+        self.directory = directory
+        self.max_size = max_size
+        self.options = json.dumps(options, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+    def key(self, filename, block_size=1 << 20):
+        """Return the key for the content of a file."""
+        h = hashlib.sha256(self.options)
+        with open(filename, "rb") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                h.update(block)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".json")
+
+    def get(self, key):
+        """Return the results stored for key (or None)."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # the modification time is the time of the last use (see
+        # evict)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return results
+
+    def put(self, key, results):
+        """Store a list of results, i.e. JSON-serializable tuples."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is not
+        larger than max_size.
+
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for mtime, size, path in entries:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_size:
+                break
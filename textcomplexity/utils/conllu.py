@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
+import array
 import collections
 import logging
 import re
 
-import networkx
+import numpy as np
 
 from textcomplexity.utils import graph
-from textcomplexity.utils.token import Token
+from textcomplexity.utils.document import Document
+from textcomplexity.utils.token import Token, TokenArray
+from textcomplexity.utils.treebank import DependencyTreesBuilder
+from textcomplexity.utils.vocabulary import Vocabulary
 
 UdToken = collections.namedtuple("UdToken", "id form lemma upos xpos feats head deprel deps misc".split())
 
@@ -22,7 +26,186 @@ def read_conllu_sentences(f, *, ignore_case=False, warnings=True):
             yield tokens, g
         else:
             if warnings:
-                logging.warn("Ignoring sentence with ID %s: %s" % (sent_id, explanation))
+                logging.warning("Ignoring sentence with ID %s: %s" % (sent_id, explanation))
+
+
+def read_conllu_treebank(f, *, ignore_case=False, warnings=True, relation_vocabulary=None, validate=True, rejections=None):
+    """Read all sentences from f. Return a list of sentences (lists of
+    tokens) and their dependency trees as a DependencyTrees object.
+
+    Sentences with basic dependencies are directly converted to head
+    arrays; only sentences with enhanced dependencies (DEPS column)
+    are read via networkx graphs. Sentences that are not sensible
+    syntactic representations are ignored. Use validate=False to skip
+    the checks for input that is known to be valid. If rejections is
+    a collections.Counter, the reasons for ignoring sentences are
+    counted instead of logged.
+
+    """
+    sentences = []
+    trees = DependencyTreesBuilder(relation_vocabulary)
+    for sentence, sent_id in _read_conllu(f, ignore_case):
+        if all(t.deps == "_" for t in sentence):
+            heads, relations, positions, roots = _get_heads([t.id for t in sentence], [t.head for t in sentence], [t.deprel for t in sentence])
+            if heads is None:
+                sensible, explanation = False, "A dependency head does not exist"
+            elif validate:
+                sensible, explanation = graph.is_sensible_tree(heads, roots)
+            else:
+                # empty sentences (additional empty lines) are always
+                # ignored
+                sensible, explanation = len(heads) > 0, "There is no explicit 'root' vertex"
+            if sensible:
+                trees.add_tree(heads, relations, positions)
+        else:
+            g = _create_nx_digraph(sentence, sent_id)
+            sensible, explanation = graph.is_sensible_graph(g) if validate else (True, "")
+            if sensible:
+                trees.add_graph(g)
+        if sensible:
+            sentences.append([Token(t.form, t.xpos, t.upos) for t in _get_tokens(sentence)])
+        elif rejections is not None:
+            rejections[explanation] += 1
+        elif warnings:
+            logging.warning("Ignoring sentence with ID %s: %s" % (sent_id, explanation))
+    return sentences, trees.build()
+
+
+def log_rejections(name, rejections):
+    """Log the numbers of sentences in the file name that have been
+    ignored, per reason (see the rejections of read_conllu_treebank).
+
+    """
+    if rejections:
+        logging.warning("Ignored %d sentences in %s: %s" % (sum(rejections.values()), name, "; ".join("%s (%d)" % (reason, n) for reason, n in rejections.most_common())))
+
+
+def read_conllu_document(f, *, ignore_case=False, warnings=True, words=None, tags=None, upos=None, relation_vocabulary=None, validate=True, rejections=None, dependencies=True, chunk_size=1 << 22):
+    """Read all sentences from f into a Document with the same tokens
+    and dependency trees as read_conllu_treebank.
+
+    f is read in chunks and the lines of every sentence are only split
+    into fields; multi-word tokens are resolved with plain int
+    parsing. Instead of token objects, the columns are collected and
+    encoded as arrays of ids in the vocabularies words (FORM), tags
+    (XPOS), upos (UPOS) and relation_vocabulary (DEPREL). Only
+    sentences with enhanced dependencies are read via networkx
+    graphs. For validate and rejections, see read_conllu_treebank.
+
+    If dependencies is False, the dependency trees are not built
+    (Document.dependency_trees is None); sentences are still
+    validated, but without networkx graphs, so that the same sentences
+    are ignored.
+
+    """
+    return next(read_conllu_batches(f, ignore_case=ignore_case, warnings=warnings, words=words, tags=tags, upos=upos, relation_vocabulary=relation_vocabulary, validate=validate, rejections=rejections, dependencies=dependencies, chunk_size=chunk_size))
+
+
+def read_conllu_batches(f, *, batch_size=None, ignore_case=False, warnings=True, words=None, tags=None, upos=None, relation_vocabulary=None, validate=True, rejections=None, dependencies=True, chunk_size=1 << 22):
+    """Like read_conllu_document, but yield a Document for every
+    batch_size sentences that are read from f (including sentences
+    that are ignored). All batches share the same vocabularies. If
+    batch_size is None, there is only one batch.
+
+    """
+    words = Vocabulary() if words is None else words
+    tags = Vocabulary() if tags is None else tags
+    upos = Vocabulary() if upos is None else upos
+    relation_vocabulary = Vocabulary() if relation_vocabulary is None else relation_vocabulary
+
+    def document():
+        nonlocal forms, xpos_tags, upos_tags, sentence_offsets, trees
+        if ignore_case:
+            forms = [form.lower() for form in forms]
+        tokens = TokenArray(words.encode(forms), tags.encode(xpos_tags), words, tags)
+        doc = Document(tokens, np.frombuffer(sentence_offsets, dtype=np.int64), trees.build() if dependencies else None, upos.encode(upos_tags), upos)
+        forms, xpos_tags, upos_tags = [], [], []
+        sentence_offsets = array.array("q", [0])
+        trees = DependencyTreesBuilder(relation_vocabulary)
+        return doc
+
+    forms, xpos_tags, upos_tags = [], [], []
+    sentence_offsets = array.array("q", [0])
+    trees = DependencyTreesBuilder(relation_vocabulary)
+    n_sentences = 0
+    for lines, sent_id in _read_conllu_chunked(f, chunk_size):
+        if batch_size is not None and n_sentences == batch_size:
+            yield document()
+            n_sentences = 0
+        n_sentences += 1
+        rows = [line.split("\t") for line in lines]
+        if any(len(row) != 10 for row in rows):
+            raise ValueError("Sentence with ID %s: every line needs 10 fields" % sent_id)
+        if all(row[8] == "_" for row in rows):
+            heads, relations, positions, roots = _get_heads([row[0] for row in rows], [row[6] for row in rows], [row[7] for row in rows])
+            if heads is None:
+                sensible, explanation = False, "A dependency head does not exist"
+            elif validate:
+                sensible, explanation = graph.is_sensible_tree(heads, roots)
+            else:
+                # empty sentences (additional empty lines) are always
+                # ignored
+                sensible, explanation = len(heads) > 0, "There is no explicit 'root' vertex"
+            if sensible and dependencies:
+                trees.add_tree(heads, relations, positions)
+        elif dependencies:
+            g = _create_nx_digraph([UdToken(*row) for row in rows], sent_id)
+            sensible, explanation = graph.is_sensible_graph(g) if validate else (True, "")
+            if sensible:
+                trees.add_graph(g)
+        else:
+            sensible, explanation = _is_sensible_enhanced([UdToken(*row) for row in rows]) if validate else (True, "")
+        if not sensible:
+            if rejections is not None:
+                rejections[explanation] += 1
+            elif warnings:
+                logging.warning("Ignoring sentence with ID %s: %s" % (sent_id, explanation))
+            continue
+        # tokens as in _get_tokens
+        mwt_end = 0
+        for row in rows:
+            token_id = row[0]
+            if token_id.isdecimal():
+                if int(token_id) <= mwt_end:
+                    continue
+            else:
+                start, sep, end = token_id.partition("-")
+                if not (start.isdecimal() and end.isdecimal()):
+                    continue
+                mwt_end = int(end)
+            forms.append(row[1])
+            xpos_tags.append(row[4])
+            upos_tags.append(row[3])
+        sentence_offsets.append(len(forms))
+    yield document()
+
+
+def _get_heads(ids, heads, deprels):
+    """Return head array representation of the basic dependencies of a
+    sentence, given as columns ID, HEAD and DEPREL: governor indices
+    (-1 for vertices without governor), relations, positions of the
+    vertices in the sentence and indices of the vertices that are
+    labeled as root. As in _create_nx_digraph, tokens that are neither
+    root nor part of a dependency relation (e.g. range tokens) are not
+    included. If a head does not exist, return None for the governor
+    indices.
+
+    """
+    id_to_position = {token_id: i for i, token_id in enumerate(ids)}
+    governors, root_positions = {}, []
+    for i, (head, deprel) in enumerate(zip(heads, deprels)):
+        if deprel == "root":
+            root_positions.append(i)
+        elif deprel != "_":
+            if head not in id_to_position:
+                return None, None, None, None
+            governors[i] = (id_to_position[head], deprel)
+    positions = sorted(set(root_positions).union(governors.keys(), (g for g, r in governors.values())))
+    index = {p: i for i, p in enumerate(positions)}
+    heads = [index[governors[p][0]] if p in governors else -1 for p in positions]
+    relations = [governors[p][1] if p in governors else None for p in positions]
+    roots = [index[p] for p in root_positions]
+    return heads, relations, positions, roots
 
 
 def _get_tokens(sentence):
@@ -61,6 +244,8 @@ def _read_conllu(f, ignore_case):
             origid = ""
         else:
             fields = line.split("\t")
+            if len(fields) != 10:
+                raise ValueError("Sentence with ID %s: every line needs 10 fields" % origid)
             if ignore_case:
                 fields[1] = fields[1].lower()
             sentence.append(UdToken(*fields))
@@ -68,8 +253,80 @@ def _read_conllu(f, ignore_case):
         yield sentence, origid
 
 
+def _read_conllu_chunked(f, chunk_size):
+    """Like _read_conllu, but read f in chunks of chunk_size characters
+    and yield the lines of every sentence without splitting them into
+    fields. As in _read_conllu, additional empty lines are yielded as
+    empty sentences, so that they are rejected (and reported) like
+    other sentences that are not sensible.
+
+    """
+    pattern = re.compile(r"^#\s*sent_id\s*=\s*(\S.*)$")
+    sentence = []
+    origid = ""
+    rest = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if chunk:
+            lines = (rest + chunk).split("\n")
+            rest = lines.pop()
+        else:
+            # the last line, if it is not terminated
+            lines, rest = [rest] if rest else [], ""
+        for line in lines:
+            if line.startswith("#"):
+                if "sent_id" in line:
+                    m = pattern.search(line)
+                    if m:
+                        origid = m.group(1)
+                continue
+            line = line.strip()
+            if line == "":
+                yield sentence, origid
+                sentence = []
+                origid = ""
+            else:
+                sentence.append(line)
+        if not chunk:
+            break
+    if len(sentence) > 0:
+        yield sentence, origid
+
+
+def _governors(token, id_to_enumeration):
+    """Return the set of (governor index, relation) tuples of a token,
+    from the enhanced dependencies (DEPS) or, if there are none, from
+    HEAD and DEPREL.
+
+    """
+    relations = set()
+    if token.deps != "_":
+        for rel in token.deps.split("|"):
+            gov, relation = rel.split(":", maxsplit=1)
+            if relation != "root":
+                governor = id_to_enumeration[gov]
+                relations.add((governor, relation))
+    elif token.deprel != "_":
+        if token.deprel != "root":
+            relations.add((id_to_enumeration[token.head], token.deprel))
+    return relations
+
+
+def _is_sensible_enhanced(sentence):
+    """Validate the graph of _create_nx_digraph without constructing
+    it (see graph.is_sensible_edges).
+
+    """
+    id_to_enumeration = {t.id: i for i, t in enumerate(sentence)}
+    roots = [i for i, t in enumerate(sentence) if t.deprel == "root"]
+    edges = [(governor, i) for i, t in enumerate(sentence) for governor, relation in _governors(t, id_to_enumeration)]
+    return graph.is_sensible_edges(len(sentence), edges, roots)
+
+
 def _create_nx_digraph(sentence, origid=None):
     """Return a networkx.DiGraph object of the CoNLL-U representation."""
+    import networkx
+
     def attributes(t):
         return {"word": t.form, "lemma": t.lemma, "wc": t.upos, "pos": t.xpos}
 
@@ -82,17 +339,7 @@ def _create_nx_digraph(sentence, origid=None):
         if token.deprel == "root":
             dg.nodes[i]["root"] = "root"
     for i, token in enumerate(sentence):
-        relations = set()
-        if token.deps != "_":
-            for rel in token.deps.split("|"):
-                gov, relation = rel.split(":", maxsplit=1)
-                if relation != "root":
-                    governor = id_to_enumeration[gov]
-                    relations.add((governor, relation))
-        elif token.deprel != "_":
-            if token.deprel != "root":
-                relations.add((id_to_enumeration[token.head], token.deprel))
-        for governor, relation in relations:
+        for governor, relation in _governors(token, id_to_enumeration):
             # if relation == "punct":
             #     continue
             dg.add_edge(governor, i, relation=relation)
@@ -2,14 +2,14 @@
 
 import collections
 import logging
-
-import networkx
-from nltk.tree import ParentedTree
+import re
 
 from textcomplexity.utils import graph
 from textcomplexity.utils.token import Token
+from textcomplexity.utils.treebank import ConstituencyTreesBuilder, DependencyTreesBuilder
 
 TsvToken = collections.namedtuple("TsvToken", "id word pos head deprel pstree".split())
+PSTREE_TOKEN = re.compile(r"\(\s*([^\s()*]*)|\*|\)|\S")
 
 
 def read_tsv_sentences(f, *, ignore_case=False, warnings=True):
@@ -19,6 +19,8 @@ def read_tsv_sentences(f, *, ignore_case=False, warnings=True):
     sentence. Missing values can be replaced with an underscore (_).
 
     """
+    import networkx
+
     def attributes(t):
         return {"word": t.word, "pos": t.pos}
 
@@ -35,30 +37,144 @@ def read_tsv_sentences(f, *, ignore_case=False, warnings=True):
                     g.add_edge(id_to_enumeration[token.head], i, relation=token.deprel)
             sensible, explanation = graph.is_sensible_graph(g)
             if warnings and not sensible:
-                logging.warn("Ignoring sentence %s: %s" % (sent_id, explanation))
+                logging.warning("Ignoring sentence %s: %s" % (sent_id, explanation))
         if all((t.pstree != "_" for t in sentence)) and sensible:
-            tree_src = []
-            tree = None
-            for token in sentence:
-                tree_tok = token.word
-                tree_tok = tree_tok.replace("(", "-LRB-")
-                tree_tok = tree_tok.replace(")", "-RRB-")
-                tree_pos = token.pos
-                tree_pos = tree_pos.replace("(", "-LRB-")
-                tree_pos = tree_pos.replace(")", "-RRB-")
-                tree_frag = token.pstree
-                tree_frag = tree_frag.replace("*", "(%s %s)" % (tree_pos, tree_tok))
-                tree_src.append(tree_frag)
-            tree_src = "".join(tree_src)
-            try:
-                tree = ParentedTree.fromstring(tree_src)
-            except ValueError:
-                logging.warn("Failed to construct parse tree from sentence %s: %s" % (sent_id, tree_src))
-                tree = None
+            tree = _get_ps_tree(sentence, sent_id)
         if sensible and tree is not None:
             yield tokens, g, tree
 
 
+def read_tsv_treebank(f, *, ignore_case=False, warnings=True, relation_vocabulary=None, label_vocabulary=None, validate=True, rejections=None, dependencies=True, constituents=True):
+    """Read all sentences from f (see read_tsv_sentences). Return a list
+    of sentences (lists of tokens), their dependency trees as a
+    DependencyTrees object and their phrase structure trees as a
+    ConstituencyTrees object.
+
+    Both kinds of trees are directly converted to arrays. Use
+    validate=False to skip the checks for input that is known to be
+    valid. If rejections is a collections.Counter, the reasons for
+    ignoring sentences are counted instead of logged.
+
+    If dependencies or constituents is False, None is returned instead
+    of the corresponding trees. The same sentences are ignored, i.e.
+    both kinds of trees are still checked.
+
+    """
+    sentences = []
+    trees = DependencyTreesBuilder(relation_vocabulary)
+    ps_trees = ConstituencyTreesBuilder(label_vocabulary)
+    for sent_id, sentence in enumerate(_get_sentences(f, ignore_case)):
+        heads, relations, roots = _get_heads(sentence)
+        if heads is None:
+            sensible, explanation = False, "A dependency head does not exist"
+        elif validate:
+            sensible, explanation = graph.is_sensible_tree(heads, roots)
+        else:
+            sensible = True
+        if not sensible:
+            if rejections is not None:
+                rejections[explanation] += 1
+            elif warnings:
+                logging.warning("Ignoring sentence %s: %s" % (sent_id, explanation))
+            continue
+        if any((t.pstree == "_" for t in sentence)):
+            continue
+        tree = _get_ps_tree_arrays(sentence)
+        if tree is None:
+            logging.warning("Failed to construct parse tree from sentence %s: %s" % (sent_id, "".join(t.pstree for t in sentence)))
+            continue
+        sentences.append([Token(t.word, t.pos) for t in sentence])
+        if dependencies:
+            trees.add_tree(heads, relations, range(len(sentence)))
+        if constituents:
+            ps_trees.add_tree(*tree)
+    return sentences, trees.build() if dependencies else None, ps_trees.build() if constituents else None
+
+
+def _get_heads(sentence):
+    """Return governor indices (-1 for vertices without governor),
+    relations and the indices of the root vertices. If a head is
+    missing or does not exist, return None for the governor indices.
+
+    """
+    id_to_enumeration = {t.id: i for i, t in enumerate(sentence)}
+    heads, relations, roots = [], [], []
+    for i, token in enumerate(sentence):
+        if token.head == "-1":
+            roots.append(i)
+            heads.append(-1)
+            relations.append(None)
+        elif token.head in id_to_enumeration and token.deprel != "_":
+            heads.append(id_to_enumeration[token.head])
+            relations.append(token.deprel)
+        else:
+            return None, None, None
+    return heads, relations, roots
+
+
+def _get_ps_tree_arrays(sentence):
+    """Parse the tree fragments of the sentence directly into lists of
+    node labels, parent indices, span starts and span ends (nodes in
+    preorder, see ConstituencyTrees). The asterisk in the fragment of
+    a token stands for its preterminal node. Return None if the
+    fragments do not form a single tree.
+
+    """
+    labels, parents, starts, ends = [], [], [], []
+    stack = []
+    leaf = 0
+    for token in sentence:
+        for m in PSTREE_TOKEN.finditer(token.pstree):
+            symbol = m.group(0)
+            if len(stack) == 0 and len(labels) > 0:
+                # more than one root
+                return None
+            if symbol[0] == "(":
+                stack.append(len(labels))
+                labels.append(m.group(1))
+                parents.append(stack[-2] if len(stack) > 1 else -1)
+                starts.append(leaf)
+                ends.append(None)
+            elif symbol == "*":
+                labels.append(token.pos.replace("(", "-LRB-").replace(")", "-RRB-"))
+                parents.append(stack[-1] if len(stack) > 0 else -1)
+                starts.append(leaf)
+                ends.append(leaf + 1)
+                leaf += 1
+            elif symbol == ")" and len(stack) > 0:
+                ends[stack.pop()] = leaf
+            else:
+                return None
+    if len(stack) > 0 or len(labels) == 0:
+        return None
+    return labels, parents, starts, ends
+
+
+def _get_ps_tree(sentence, sent_id):
+    """Construct the phrase structure tree from the tree fragments of
+    the sentence. Return None if that fails.
+
+    """
+    tree_src = []
+    for token in sentence:
+        tree_tok = token.word
+        tree_tok = tree_tok.replace("(", "-LRB-")
+        tree_tok = tree_tok.replace(")", "-RRB-")
+        tree_pos = token.pos
+        tree_pos = tree_pos.replace("(", "-LRB-")
+        tree_pos = tree_pos.replace(")", "-RRB-")
+        tree_frag = token.pstree
+        tree_frag = tree_frag.replace("*", "(%s %s)" % (tree_pos, tree_tok))
+        tree_src.append(tree_frag)
+    tree_src = "".join(tree_src)
+    from nltk.tree import ParentedTree
+    try:
+        return ParentedTree.fromstring(tree_src)
+    except ValueError:
+        logging.warning("Failed to construct parse tree from sentence %s: %s" % (sent_id, tree_src))
+        return None
+
+
 def _get_sentences(f, ignore_case):
     """A generator over the sentences in f."""
     sentence = []
@@ -69,6 +185,8 @@ def _get_sentences(f, ignore_case):
             sentence = []
         else:
             fields = line.split("\t")
+            if len(fields) != 6:
+                raise ValueError("Every line needs 6 fields: %s" % line)
             if ignore_case:
                 fields[1] = fields[1].lower()
             sentence.append(TsvToken(*fields))
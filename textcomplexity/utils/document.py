@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+
+class Document:
+    """Columnar representation of a text:
+
+    tokens: TokenArray with the word forms and (language-specific)
+    part-of-speech tags of all tokens.
+
+    upos_ids: Ids of the universal part-of-speech tags in the
+    vocabulary upos (or None).
+
+    sentence_offsets: Tokens of sentence i are at
+    sentence_offsets[i]:sentence_offsets[i + 1].
+
+    dependency_trees: DependencyTrees object with one tree per
+    sentence (or None).
+
+    """
+
+    def __init__(self, tokens, sentence_offsets, dependency_trees=None, upos_ids=None, upos=None):
+        self.tokens = tokens
+        self.sentence_offsets = sentence_offsets
+        self.dependency_trees = dependency_trees
+        self.upos_ids = upos_ids
+        self.upos = upos
+
+    def __len__(self):
+        return len(self.sentence_offsets) - 1
+
+    def sentence(self, i):
+        """Tokens of sentence i as TokenArray (a view on tokens)."""
+        return self.tokens[self.sentence_offsets[i]:self.sentence_offsets[i + 1]]
+
+    def sentences(self):
+        """List of the tokens of every sentence."""
+        return [self.sentence(i) for i in range(len(self))]
+
+    def sentence_lengths(self):
+        """Number of tokens in every sentence."""
+        return np.diff(self.sentence_offsets)
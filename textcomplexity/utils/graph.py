@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import networkx
-
 
 def is_sensible_graph(g):
     """Check if g is a sensible syntactic representation of a sentence,
@@ -14,14 +12,91 @@ def is_sensible_graph(g):
         return False, "There is no explicit 'root' vertex"
     if len(roots) > 1:
         return False, "There is more than one explicit 'root' vertex"
+    import networkx
     # is the graph connected?
     if not networkx.is_weakly_connected(g):
         return False, "The graph is not connected"
     # is the "root" vertex really a root, i.e. is there a path to
     # every other vertex?
     root = roots[0]
-    other_vertices = set(g.nodes())
-    other_vertices.remove(root)
-    if not all([networkx.has_path(g, root, v) for v in other_vertices]):
+    if len(networkx.descendants(g, root)) != len(g) - 1:
+        return False, "The vertex labeled as 'root' is not actually a root"
+    return True, ""
+
+
+def is_sensible_tree(heads, roots):
+    """Check if a sentence in head array representation is a sensible
+    syntactic representation, i.e. rooted, connected, … (see
+    is_sensible_graph). heads[i] is the index of the governor of
+    vertex i or -1 if i has no governor; roots are the indices of the
+    vertices that are explicitly labeled as root. Every vertex is
+    visited once.
+
+    """
+    if len(roots) == 0:
+        return False, "There is no explicit 'root' vertex"
+    if len(roots) > 1:
+        return False, "There is more than one explicit 'root' vertex"
+    root = roots[0]
+    if heads[root] != -1:
+        return False, "The vertex labeled as 'root' is not actually a root"
+    # follow the governors of every vertex until we arrive at a vertex
+    # that is known to be connected to the root; other vertices
+    # without a governor and cycles are separate components
+    connected = [False] * len(heads)
+    connected[root] = True
+    on_path = [False] * len(heads)
+    for v in range(len(heads)):
+        path = []
+        while not connected[v]:
+            if heads[v] == -1 or on_path[v]:
+                return False, "The graph is not connected"
+            on_path[v] = True
+            path.append(v)
+            v = heads[v]
+        for u in path:
+            connected[u] = True
+    return True, ""
+
+
+def is_sensible_edges(n, edges, roots):
+    """Check if a graph with the vertices range(n) and the given
+    (governor, dependent) edges is a sensible syntactic representation
+    (see is_sensible_graph) without constructing a networkx graph.
+    Vertices that are neither labeled as root nor part of an edge are
+    not part of the graph; roots are the indices of the vertices that
+    are explicitly labeled as root.
+
+    """
+    if len(roots) == 0:
+        return False, "There is no explicit 'root' vertex"
+    if len(roots) > 1:
+        return False, "There is more than one explicit 'root' vertex"
+    root = roots[0]
+    vertices = {root}
+    dependents = [[] for v in range(n)]
+    # components of the undirected graph (union-find)
+    component = list(range(n))
+
+    def find(v):
+        while component[v] != v:
+            component[v] = component[component[v]]
+            v = component[v]
+        return v
+
+    for s, t in edges:
+        vertices.update((s, t))
+        dependents[s].append(t)
+        component[find(s)] = find(t)
+    if len({find(v) for v in vertices}) > 1:
+        return False, "The graph is not connected"
+    reachable = {root}
+    stack = [root]
+    while stack:
+        for t in dependents[stack.pop()]:
+            if t not in reachable:
+                reachable.add(t)
+                stack.append(t)
+    if len(reachable) != len(vertices):
         return False, "The vertex labeled as 'root' is not actually a root"
     return True, ""
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 
+import collections
+import fractions
 import functools
 import itertools
 import math
 import statistics
+import sys
 
 import numpy
-import scipy.special
 
 from textcomplexity.utils import windows
+from textcomplexity.utils.text import Text
+from textcomplexity.utils.token import TokenArray
 
 
 def confidence_interval(results):
@@ -17,6 +21,7 @@ def confidence_interval(results):
 
 @functools.lru_cache(maxsize=1024)
 def betaln(a, b):
+    import scipy.special
     return scipy.special.betaln(a, b)
 
 
@@ -30,6 +35,17 @@ def hypergeom_pmf(k, M, n, N):
     return numpy.exp(result)
 
 
+def hypergeom_pmf_array(k, M, n, N):
+    """Vectorized version of hypergeom_pmf for NumPy arrays."""
+    import scipy.special
+    tot, good = M, n
+    bad = tot - good
+    result = (scipy.special.betaln(good+1, 1) + scipy.special.betaln(bad+1, 1) + scipy.special.betaln(tot-N+1, N+1) -
+              scipy.special.betaln(k+1, good-k+1) - scipy.special.betaln(N-k+1, bad-N+k+1) -
+              scipy.special.betaln(tot+1, 1))
+    return numpy.exp(result)
+
+
 def geom_pmf(k, p):
     return numpy.power(1-p, k-1) * p
 
@@ -55,6 +71,89 @@ def average_measure_and_length(measure, sentences):
     return statistics.mean(scores), statistics.stdev(scores), statistics.mean(lengths), statistics.stdev(lengths)
 
 
+class RunningStatistics:
+    """Mean and standard deviation of a stream of ints or floats that
+    are identical to statistics.mean and statistics.stdev of the whole
+    stream. As in the statistics module, the sums of the values and of
+    their squares are kept exactly (as integer numerators grouped by
+    denominator) and the square root is correctly rounded. Instances
+    for parts of a stream can be merged.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.is_float = False
+        self.sums = collections.defaultdict(int)
+        self.squares = collections.defaultdict(int)
+        self.nonfinite = None
+
+    def update(self, values):
+        """Add an iterable of values."""
+        sums, squares = self.sums, self.squares
+        for x in values:
+            self.count += 1
+            if type(x) is float:
+                self.is_float = True
+                if not math.isfinite(x):
+                    self.nonfinite = x if self.nonfinite is None else self.nonfinite + x
+                    continue
+                n, d = x.as_integer_ratio()
+            else:
+                n, d = x, 1
+            sums[d] += n
+            squares[d] += n * n
+
+    def merge(self, other):
+        """Add the values of another RunningStatistics object."""
+        self.count += other.count
+        self.is_float = self.is_float or other.is_float
+        for d, n in other.sums.items():
+            self.sums[d] += n
+        for d, n in other.squares.items():
+            self.squares[d] += n
+        if other.nonfinite is not None:
+            self.nonfinite = other.nonfinite if self.nonfinite is None else self.nonfinite + other.nonfinite
+
+    def _sum(self):
+        return sum(fractions.Fraction(n, d) for d, n in self.sums.items())
+
+    def mean(self):
+        if self.count < 1:
+            raise statistics.StatisticsError("mean requires at least one data point")
+        if self.nonfinite is not None:
+            return self.nonfinite / self.count
+        mean = self._sum() / self.count
+        if not self.is_float and mean.denominator == 1:
+            return int(mean)
+        return float(mean)
+
+    def stdev(self):
+        if self.count < 2:
+            raise statistics.StatisticsError("stdev requires at least two data points")
+        if self.nonfinite is not None:
+            return math.nan
+        sx = self._sum()
+        sxx = sum(fractions.Fraction(n, d * d) for d, n in self.squares.items())
+        variance = (self.count * sxx - sx * sx) / self.count / (self.count - 1)
+        return _float_sqrt_of_frac(variance.numerator, variance.denominator)
+
+
+def _float_sqrt_of_frac(n, m):
+    """Square root of n/m as a float, correctly rounded (as in
+    statistics.stdev).
+
+    """
+    def integer_sqrt_of_frac_rto(n, m):
+        a = math.isqrt(n // m)
+        return a | (a * a * m != n)
+
+    q = (n.bit_length() - m.bit_length() - (2 * sys.float_info.mant_dig + 3)) // 2
+    if q >= 0:
+        return (integer_sqrt_of_frac_rto(n, m << 2 * q) << q) / 1
+    return integer_sqrt_of_frac_rto(n << -2 * q, m) / (1 << -q)
+
+
 def bootstrap(measure, tokens, window_size, strategy="spread", **kwargs):
     """Calculate bootstrap for surface-based measures as explained in
     Evert et al. (2017).
@@ -68,9 +167,62 @@ def bootstrap(measure, tokens, window_size, strategy="spread", **kwargs):
     http://purl.org/stefan.evert/PUB/EvertWankerlNoeth2017.pdf
 
     """
-    results = []
-    for window in windows.disjoint_windows(tokens, window_size, strategy):
-        results.append(measure(window, **kwargs))
+    measure = functools.partial(measure, **kwargs)
+    return bootstrap_measures([measure], tokens, window_size, strategy)[0]
+
+
+def bootstrap_measures(measures, tokens, window_size, strategy="spread", batch_measures=None):
+    """Calculate bootstrap for several surface-based measures at once.
+    Every window is only constructed once and then passed to all
+    measures. Return a list with a (mean, confidence interval,
+    results) tuple for every measure.
+
+    batch_measures maps measures to vectorized equivalents that take a
+    windows.WindowStatistics object and return one value per window
+    (e.g. surface.BATCH_MEASURES). If tokens is a TokenArray, these
+    are computed for all windows at once instead of constructing a
+    Text for every window.
+
+    """
+    results = window_results(measures, tokens, window_size, strategy, batch_measures)
+    return [summarize_bootstrap(measure_results) for measure_results in results]
+
+
+def window_results(measures, tokens, window_size, strategy="spread", batch_measures=None, starts=None):
+    """Return a list with the values of every measure for all disjoint
+    windows (see bootstrap_measures). The start positions of the
+    windows can be given explicitly (see windows.disjoint_windows).
+
+    """
+    results = [None for measure in measures]
+    if batch_measures and isinstance(tokens, TokenArray):
+        stats = None
+        for i, measure in enumerate(measures):
+            if measure in batch_measures:
+                if stats is None:
+                    if starts is None:
+                        starts = windows.window_starts(len(tokens), window_size, strategy)
+                    stats = windows.batch_window_statistics(tokens, window_size, strategy, starts)
+                with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                    values = batch_measures[measure](stats)
+                results[i] = values.tolist()
+                # windows for which the vectorized measure is not
+                # finite are computed with the scalar measure, which
+                # raises an exception or returns NaN
+                for j in numpy.flatnonzero(~numpy.isfinite(values)).tolist():
+                    results[i][j] = measure(Text.from_tokens(tokens[starts[j]:starts[j] + window_size]))
+    remaining = [i for i, r in enumerate(results) if r is None]
+    if remaining:
+        for i in remaining:
+            results[i] = []
+        for window in windows.disjoint_windows(tokens, window_size, strategy, starts):
+            for i in remaining:
+                results[i].append(measures[i](window))
+    return results
+
+
+def summarize_bootstrap(results):
+    """Return mean, confidence interval and results."""
     if len(results) == 1:
         return results[0], 0, results
     return statistics.mean(results), confidence_interval(results), results
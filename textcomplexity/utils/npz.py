@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import numpy as np
+
+from textcomplexity.utils.document import Document
+from textcomplexity.utils.token import TokenArray
+from textcomplexity.utils.treebank import ConstituencyTrees, DependencyTrees
+from textcomplexity.utils.vocabulary import Vocabulary
+
+FORMAT_VERSION = 1
+
+
+def save_document(f, document, constituency_trees=None):
+    """Save a Document (and the ConstituencyTrees of its sentences, if
+    available) to f as uncompressed .npz file. Dependency graphs that
+    are not trees are stored as lists of edges and roots.
+
+    """
+    tokens, trees = document.tokens, document.dependency_trees
+    arrays = {"format_version": np.array(FORMAT_VERSION),
+              "word_ids": tokens.word_ids,
+              "tag_ids": tokens.tag_ids,
+              "sentence_offsets": document.sentence_offsets,
+              "dep_heads": trees.heads,
+              "dep_relations": trees.relations,
+              "dep_positions": trees.positions,
+              "dep_offsets": trees.offsets}
+    arrays.update(_encode_strings("words", tokens.words.strings))
+    arrays.update(_encode_strings("tags", tokens.tags.strings))
+    if document.upos_ids is not None:
+        arrays["upos_ids"] = document.upos_ids
+        arrays.update(_encode_strings("upos", document.upos.strings))
+    # the relations of the graphs might extend the (possibly shared)
+    # vocabulary, so they are added to a copy
+    relations = Vocabulary(trees.relation_vocabulary.strings)
+    graph_sentences, edges, roots = [], [], []
+    for i, g in sorted(trees.graphs.items()):
+        graph_sentences.append(i)
+        edges.extend((i, s, t, relations.add(relation)) for s, t, relation in g.edges(data="relation"))
+        roots.extend((i, v) for v, l in g.nodes(data=True) if "root" in l)
+    arrays.update(_encode_strings("relations", relations.strings))
+    arrays["graph_sentences"] = np.array(graph_sentences, dtype=np.int64)
+    arrays["graph_edges"] = np.array(edges, dtype=np.int64).reshape(-1, 4)
+    arrays["graph_roots"] = np.array(roots, dtype=np.int64).reshape(-1, 2)
+    if constituency_trees is not None:
+        arrays.update({"ps_labels": constituency_trees.labels,
+                       "ps_parents": constituency_trees.parents,
+                       "ps_starts": constituency_trees.starts,
+                       "ps_ends": constituency_trees.ends,
+                       "ps_offsets": constituency_trees.offsets})
+        arrays.update(_encode_strings("labels", constituency_trees.label_vocabulary.strings))
+    np.savez(f, **arrays)
+
+
+def load_document(f, *, ignore_case=False, words=None, tags=None, upos=None, relation_vocabulary=None, label_vocabulary=None, dependencies=True, constituents=True):
+    """Load a file that has been written by save_document. Return a
+    Document and ConstituencyTrees (or None).
+
+    The ids are translated to the given vocabularies, which can be
+    shared by several documents. Strings are added in the order of
+    the stored vocabularies, i.e. in order of first occurrence, so that
+    word and tag ids are the same as if the original file had been
+    read. If dependencies or constituents is False, the corresponding
+    trees are not loaded (None).
+
+    """
+    with np.load(f, allow_pickle=False) as data:
+        assert int(data["format_version"]) == FORMAT_VERSION, "Unsupported version of the binary format"
+        word_strings = _decode_strings(data, "words")
+        if ignore_case:
+            word_strings = [w.lower() for w in word_strings]
+        words, word_map = _vocabulary(words, word_strings)
+        tags, tag_map = _vocabulary(tags, _decode_strings(data, "tags"))
+        tokens = TokenArray(word_map[data["word_ids"]], tag_map[data["tag_ids"]], words, tags)
+        upos_ids = None
+        if "upos_ids" in data:
+            upos, upos_map = _vocabulary(upos, _decode_strings(data, "upos"))
+            upos_ids = upos_map[data["upos_ids"]]
+        dependency_trees = None
+        if dependencies:
+            relation_vocabulary, relation_map = _vocabulary(relation_vocabulary, _decode_strings(data, "relations"))
+            # -1 (the relation of the root) is mapped to itself
+            relations = np.append(relation_map, -1)[data["dep_relations"]].astype(np.intc)
+            positions, dep_offsets = data["dep_positions"], data["dep_offsets"]
+            graphs = {}
+            graph_sentences = data["graph_sentences"]
+            # edges and roots are sorted by sentence
+            edges, roots = data["graph_edges"], data["graph_roots"]
+            edge_offsets = np.searchsorted(edges[:, 0], graph_sentences, side="left").tolist() + [len(edges)]
+            root_offsets = np.searchsorted(roots[:, 0], graph_sentences, side="left").tolist() + [len(roots)]
+            if len(graph_sentences) > 0:
+                import networkx
+            for j, i in enumerate(graph_sentences.tolist()):
+                g = networkx.DiGraph()
+                g.add_nodes_from(positions[dep_offsets[i]:dep_offsets[i + 1]].tolist())
+                for sentence, v in roots[root_offsets[j]:root_offsets[j + 1]].tolist():
+                    g.nodes[v]["root"] = "root"
+                for sentence, s, t, relation in edges[edge_offsets[j]:edge_offsets[j + 1]].tolist():
+                    g.add_edge(s, t, relation=relation_vocabulary[int(relation_map[relation])])
+                graphs[i] = g
+            dependency_trees = DependencyTrees(data["dep_heads"], relations, positions, dep_offsets, relation_vocabulary, graphs)
+        document = Document(tokens, data["sentence_offsets"], dependency_trees, upos_ids, upos)
+        constituency_trees = None
+        if constituents and "ps_labels" in data:
+            label_vocabulary, label_map = _vocabulary(label_vocabulary, _decode_strings(data, "labels"))
+            constituency_trees = ConstituencyTrees(label_map[data["ps_labels"]], data["ps_parents"], data["ps_starts"], data["ps_ends"], data["ps_offsets"], label_vocabulary)
+    return document, constituency_trees
+
+
+def has_constituency_trees(f):
+    """Return whether a file that has been written by save_document
+    contains constituency trees. Only the index of the file is read.
+
+    """
+    with np.load(f, allow_pickle=False) as data:
+        return "ps_labels" in data.files
+
+
+def _encode_strings(name, strings):
+    """Store a list of strings as UTF-8 text and character offsets."""
+    text = "".join(strings)
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in strings])
+    return {name + "_text": np.frombuffer(text.encode("utf-8"), dtype=np.uint8), name + "_offsets": offsets}
+
+
+def _decode_strings(data, name):
+    text = data[name + "_text"].tobytes().decode("utf-8")
+    offsets = data[name + "_offsets"].tolist()
+    return [text[start:end] for start, end in zip(offsets, itertools.islice(offsets, 1, None))]
+
+
+def _vocabulary(vocabulary, strings):
+    """Return the vocabulary (a new one, if it is None) and an array
+    that maps the ids of strings to ids in the vocabulary.
+
+    """
+    if vocabulary is None:
+        vocabulary = Vocabulary()
+    return vocabulary, vocabulary.encode(strings)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import re
+
+BLANK_LINE = re.compile(rb"\n[ \t\r\f\v]*\n")
+
+
+def split_at_blank_lines(filename, n, block_size=1 << 16):
+    """Split a file with an empty line after each sentence (e.g. CoNLL-U)
+    into at most n byte ranges of roughly equal size. Ranges start
+    after an empty line, i.e. at the beginning of a sentence. Return a
+    list of (start, end) tuples.
+
+    """
+    size = os.path.getsize(filename)
+    boundaries = [0]
+    with open(filename, "rb") as f:
+        for i in range(1, n):
+            position = max(size * i // n, boundaries[-1])
+            boundary = _next_blank_line(f, position, block_size)
+            if boundary is None:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _next_blank_line(f, position, block_size):
+    """Return the position after the first empty line that ends at or
+    after position (or None).
+
+    """
+    # the newline that precedes the empty line might be just before
+    # position
+    start = max(position - 1, 0)
+    f.seek(start)
+    rest = b""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return None
+        data = rest + block
+        m = BLANK_LINE.search(data)
+        if m:
+            return start - len(rest) + m.end()
+        # an empty line might span two blocks
+        newline = data.rfind(b"\n")
+        rest = data[newline:] if newline >= 0 else b""
+        start += len(block)
+
+
+class _ByteRange(io.RawIOBase):
+    """Raw binary stream of the bytes start:end of a file."""
+
+    def __init__(self, filename, start, end):
+        self.file = open(filename, "rb")
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.file.readinto(memoryview(b)[:min(len(b), self.remaining)])
+        self.remaining -= n
+        return n
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def open_byte_range(filename, start, end, encoding="utf-8"):
+    """Open the bytes start:end of a file as text stream."""
+    return io.TextIOWrapper(io.BufferedReader(_ByteRange(filename, start, end)), encoding=encoding)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+import numpy as np
+
+from textcomplexity.utils.document import Document
+from textcomplexity.utils.token import TokenArray
+from textcomplexity.utils.treebank import DependencyTrees
+from textcomplexity.utils.vocabulary import Vocabulary
+
+FORMAT_VERSION = 1
+# columns of a store and their data types
+COLUMNS = {"word_ids": np.int32,
+           "tag_ids": np.int32,
+           "upos_ids": np.int32,
+           "sentence_offsets": np.int64,
+           "dep_heads": np.intc,
+           "dep_relations": np.intc,
+           "dep_positions": np.intc,
+           "dep_offsets": np.int64,
+           "document_tokens": np.int64,
+           "document_sentences": np.int64,
+           "document_vertices": np.int64,
+           "graph_sentences": np.int64,
+           "graph_edges": np.int64,
+           "graph_roots": np.int64}
+VOCABULARIES = ("words", "tags", "upos", "relations")
+
+
+class CorpusStore:
+    """Read-only columnar store of a parsed corpus in a directory with
+    one binary file per column (see CorpusStoreBuilder). The columns
+    are memory-mapped, i.e. the documents are not deserialized, and
+    processes that open the same store share the pages of the
+    operating system's page cache.
+
+    The tokens of all documents are concatenated and documents are
+    located via the index arrays document_tokens, document_sentences
+    and document_vertices (offsets of the tokens, sentences and
+    dependency vertices of every document). Sentence and vertex
+    offsets are stored relative to the document: the offsets of
+    document i are the rows document_sentences[i] + i to
+    document_sentences[i + 1] + i (inclusive), so that they can be
+    used as views, too.
+
+    If ignore_case is set, word forms are mapped to a lowercased
+    vocabulary, which copies the word ids of every document.
+
+    """
+
+    def __init__(self, directory, ignore_case=False):
+        self.directory = directory
+        with open(os.path.join(directory, "store.json"), encoding="utf-8") as f:
+            metadata = json.load(f)
+        assert metadata["format_version"] == FORMAT_VERSION, "Unsupported version of the corpus store"
+        self.names = metadata["documents"]
+        self.columns = {column: _memory_map(os.path.join(directory, column + ".bin"), COLUMNS[column], shape) for column, shape in metadata["columns"].items()}
+        vocabularies = {}
+        for name in VOCABULARIES:
+            with open(os.path.join(directory, name + ".json"), encoding="utf-8") as f:
+                vocabularies[name] = Vocabulary(json.load(f))
+        self.words, self.tags, self.upos, self.relation_vocabulary = (vocabularies[name] for name in VOCABULARIES)
+        self.word_map = None
+        if ignore_case:
+            lowercased = Vocabulary()
+            self.word_map = lowercased.encode([w.lower() for w in self.words.strings])
+            self.words = lowercased
+
+    def __len__(self):
+        return len(self.names)
+
+    def sentence_range(self, i):
+        """Global indices of the first and the last sentence (exclusive)
+        of document i.
+
+        """
+        document_sentences = self.columns["document_sentences"]
+        return int(document_sentences[i]), int(document_sentences[i + 1])
+
+    def document(self, i, dependencies=True):
+        """Return document i as Document whose arrays are views into the
+        store. If dependencies is False, its dependency_trees are None.
+
+        """
+        c = self.columns
+        start, end = int(c["document_tokens"][i]), int(c["document_tokens"][i + 1])
+        first, last = self.sentence_range(i)
+        vertex_start, vertex_end = int(c["document_vertices"][i]), int(c["document_vertices"][i + 1])
+        word_ids = c["word_ids"][start:end]
+        if self.word_map is not None:
+            word_ids = self.word_map[word_ids]
+        tokens = TokenArray(word_ids, c["tag_ids"][start:end], self.words, self.tags)
+        # offsets of the document are preceded by one extra row per
+        # preceding document
+        sentence_offsets = c["sentence_offsets"][first + i:last + i + 1]
+        if not dependencies:
+            return Document(tokens, sentence_offsets, None, c["upos_ids"][start:end], self.upos)
+        dep_offsets = c["dep_offsets"][first + i:last + i + 1]
+        trees = DependencyTrees(c["dep_heads"][vertex_start:vertex_end], c["dep_relations"][vertex_start:vertex_end],
+                                c["dep_positions"][vertex_start:vertex_end], dep_offsets, self.relation_vocabulary,
+                                self._graphs(first, last, c["dep_positions"][vertex_start:vertex_end], dep_offsets))
+        return Document(tokens, sentence_offsets, trees, c["upos_ids"][start:end], self.upos)
+
+    def _graphs(self, first, last, positions, offsets):
+        """Graphs of the sentences first:last that are not trees, keyed by
+        their index within the document.
+
+        """
+        graphs = {}
+        c = self.columns
+        graph_start, graph_end = np.searchsorted(c["graph_sentences"], [first, last]).tolist()
+        if graph_start == graph_end:
+            return graphs
+        import networkx
+        for sentence in c["graph_sentences"][graph_start:graph_end].tolist():
+            i = sentence - first
+            graphs[i] = networkx.DiGraph()
+            graphs[i].add_nodes_from(positions[offsets[i]:offsets[i + 1]].tolist())
+        edge_start, edge_end = np.searchsorted(c["graph_edges"][:, 0], [first, last]).tolist()
+        for sentence, s, t, relation in c["graph_edges"][edge_start:edge_end].tolist():
+            graphs[sentence - first].add_edge(s, t, relation=self.relation_vocabulary[relation])
+        root_start, root_end = np.searchsorted(c["graph_roots"][:, 0], [first, last]).tolist()
+        for sentence, v in c["graph_roots"][root_start:root_end].tolist():
+            graphs[sentence - first].nodes[v]["root"] = "root"
+        return graphs
+
+
+class CorpusStoreBuilder:
+    """Write documents to a new CorpusStore in directory. The documents
+    have to be read with the vocabularies of the builder (words, tags,
+    upos and relation_vocabulary), e.g. via
+    conllu.read_conllu_document. The columns are appended to their
+    files document by document; only the vocabularies are kept in
+    memory.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.words, self.tags, self.upos, self.relation_vocabulary = Vocabulary(), Vocabulary(), Vocabulary(), Vocabulary()
+        self.names = []
+        self.files = {column: open(os.path.join(directory, column + ".bin"), "wb") for column in COLUMNS}
+        self.lengths = dict.fromkeys(COLUMNS, 0)
+        self.n_tokens, self.n_sentences, self.n_vertices = 0, 0, 0
+        for column in ("document_tokens", "document_sentences", "document_vertices"):
+            self._append(column, [0])
+
+    def _append(self, column, values):
+        values = np.asarray(values, dtype=COLUMNS[column])
+        self.files[column].write(values.tobytes())
+        self.lengths[column] += values.size
+
+    def add_document(self, name, document):
+        """Append a Document."""
+        tokens, trees = document.tokens, document.dependency_trees
+        assert tokens.words is self.words and tokens.tags is self.tags and document.upos is self.upos and trees.relation_vocabulary is self.relation_vocabulary, "Documents have to be read with the vocabularies of the CorpusStoreBuilder"
+        self.names.append(name)
+        self._append("word_ids", tokens.word_ids)
+        self._append("tag_ids", tokens.tag_ids)
+        self._append("upos_ids", document.upos_ids)
+        self._append("sentence_offsets", document.sentence_offsets)
+        self._append("dep_heads", trees.heads)
+        self._append("dep_relations", trees.relations)
+        self._append("dep_positions", trees.positions)
+        self._append("dep_offsets", trees.offsets)
+        for i, g in sorted(trees.graphs.items()):
+            self._append("graph_sentences", [self.n_sentences + i])
+            self._append("graph_edges", [(self.n_sentences + i, s, t, self.relation_vocabulary.add(relation)) for s, t, relation in g.edges(data="relation")])
+            self._append("graph_roots", [(self.n_sentences + i, v) for v, l in g.nodes(data=True) if "root" in l])
+        self.n_tokens += len(tokens)
+        self.n_sentences += len(document)
+        self.n_vertices += len(trees.heads)
+        self._append("document_tokens", [self.n_tokens])
+        self._append("document_sentences", [self.n_sentences])
+        self._append("document_vertices", [self.n_vertices])
+
+    def build(self):
+        """Write the vocabularies and the metadata and return the
+        CorpusStore.
+
+        """
+        for f in self.files.values():
+            f.close()
+        for name, vocabulary in zip(VOCABULARIES, (self.words, self.tags, self.upos, self.relation_vocabulary)):
+            with open(os.path.join(self.directory, name + ".json"), "w", encoding="utf-8") as f:
+                json.dump(vocabulary.strings, f, ensure_ascii=False)
+        # graph edges and roots are appended as flat values
+        shapes = {column: [length] for column, length in self.lengths.items()}
+        shapes["graph_edges"] = [self.lengths["graph_edges"] // 4, 4]
+        shapes["graph_roots"] = [self.lengths["graph_roots"] // 2, 2]
+        with open(os.path.join(self.directory, "store.json"), "w", encoding="utf-8") as f:
+            json.dump({"format_version": FORMAT_VERSION, "documents": self.names, "columns": shapes}, f, ensure_ascii=False)
+        return CorpusStore(self.directory)
+
+
+def _memory_map(filename, dtype, shape):
+    """Map a column read-only into memory (as plain ndarray)."""
+    if np.prod(shape) == 0:
+        # empty files cannot be mapped
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r", shape=tuple(shape)).view(np.ndarray)
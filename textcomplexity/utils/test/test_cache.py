@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from textcomplexity.utils.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filenames = []
+        for i in range(5):
+            filename = os.path.join(self.directory.name, "%d.txt" % i)
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("text %d\n" % i)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        cache = ResultCache(os.path.join(self.directory.name, "cache"), 1 << 20, {"preset": "core"})
+        key = cache.key(self.filenames[0])
+        self.assertIsNone(cache.get(key))
+        results = [["x", 0.1, None, None, None], ["y", float("nan"), 2, 1.5, 0.25]]
+        cache.put(key, results)
+        cached = cache.get(key)
+        self.assertEqual(cached[0], results[0])
+        self.assertEqual(cached[1][2:], results[1][2:])
+        other = ResultCache(cache.directory, 1 << 20, {"preset": "all"})
+        self.assertNotEqual(other.key(self.filenames[0]), key)
+        self.assertNotEqual(cache.key(self.filenames[1]), key)
+
+    def test_evict(self):
+        cache = ResultCache(os.path.join(self.directory.name, "cache"), 1 << 20, {})
+        keys = [cache.key(filename) for filename in self.filenames]
+        for i, key in enumerate(keys):
+            cache.put(key, [["x", i, None, None, None]])
+            os.utime(cache._path(key), (i, i))
+        # using an entry makes it the most recently used one
+        cache.get(keys[0])
+        size = os.path.getsize(cache._path(keys[0]))
+        cache.max_size = 3 * size
+        cache.evict()
+        self.assertEqual([cache.get(key) is not None for key in keys], [True, False, False, True, True])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import collections
+import io
+import unittest
+
+import networkx
+
+from textcomplexity.test.samples import random_trees
+from textcomplexity.utils import conllu, graph
+
+INVALID = """# sent_id = s1
+1	Das	der	DET	ART	_	2	det	_	_
+2	Haus	Haus	NOUN	NN	_	0	root	_	_
+3	brennt	brennen	VERB	VVFIN	_	0	root	_	_
+
+# sent_id = s2
+1	Das	der	DET	ART	_	2	det	_	_
+2	Haus	Haus	NOUN	NN	_	3	nsubj	_	_
+3	brennt	brennen	VERB	VVFIN	_	0	root	_	_
+
+"""
+
+
+class TestIsSensibleTree(unittest.TestCase):
+    def _as_graph(self, heads, roots):
+        g = networkx.DiGraph()
+        g.add_nodes_from(range(len(heads)))
+        for v, h in enumerate(heads):
+            if h != -1:
+                g.add_edge(h, v)
+        for r in roots:
+            g.nodes[r]["root"] = "root"
+        return g
+
+    def test_same_as_graph(self):
+        cases = [([1, -1, 1], [1]),
+                 ([1, -1, 1], []),
+                 ([1, -1, -1], [1, 2]),
+                 ([1, -1, -1], [1]),
+                 ([2, 0, 1, -1], [3]),
+                 ([1, 0, -1], [2]),
+                 ([1, -1, 3, 2], [1]),
+                 ([-1, 0, 1, 2, 3], [0])]
+        for heads, roots in cases:
+            self.assertEqual(graph.is_sensible_tree(heads, roots), graph.is_sensible_graph(self._as_graph(heads, roots)))
+
+    def test_rejections(self):
+        rejections = collections.Counter()
+        sentences, trees = conllu.read_conllu_treebank(io.StringIO(INVALID), rejections=rejections)
+        self.assertEqual(len(trees), 1)
+        self.assertEqual(rejections, {"There is more than one explicit 'root' vertex": 1})
+        sentences, trees = conllu.read_conllu_treebank(io.StringIO(INVALID), validate=False)
+        self.assertEqual(len(trees), 2)
+
+
+class TestIsSensibleEdges(unittest.TestCase):
+    def test_same_as_graph(self):
+        # isolated vertices that are not roots are not part of the graph
+        cases = [(3, [(1, 0), (1, 2)], [1]),
+                 (3, [(1, 0), (1, 2)], []),
+                 (3, [(1, 0)], [1, 2]),
+                 (4, [(1, 0), (1, 2)], [1]),
+                 (3, [(1, 0), (2, 0)], [1]),
+                 (3, [(1, 0), (0, 1), (1, 2)], [2]),
+                 (4, [(0, 1), (1, 2), (2, 3), (1, 3)], [0]),
+                 (3, [(0, 0), (0, 1), (1, 2)], [0])]
+        for n, edges, roots in cases:
+            g = networkx.DiGraph()
+            g.add_nodes_from(roots, root="root")
+            g.add_edges_from(edges)
+            self.assertEqual(graph.is_sensible_edges(n, edges, roots), graph.is_sensible_graph(g))
+
+    def test_enhanced_dependencies(self):
+        # the sentences of INVALID and random sentences with enhanced
+        # dependencies
+        data = INVALID + random_trees(300, 11)
+        sentences = [[conllu.UdToken(*line.split("\t")) for line in lines] for lines, sent_id in conllu._read_conllu_chunked(io.StringIO(data), 1 << 16)]
+        for sentence in sentences:
+            self.assertEqual(conllu._is_sensible_enhanced(sentence), graph.is_sensible_graph(conllu._create_nx_digraph(sentence)))
+        for validate in (True, False):
+            rejections, other_rejections = collections.Counter(), collections.Counter()
+            document = conllu.read_conllu_document(io.StringIO(data), validate=validate, rejections=rejections)
+            other = conllu.read_conllu_document(io.StringIO(data), validate=validate, rejections=other_rejections, dependencies=False)
+            self.assertIsNone(other.dependency_trees)
+            self.assertEqual(other.tokens.word_ids.tolist(), document.tokens.word_ids.tolist())
+            self.assertEqual(other.sentence_offsets.tolist(), document.sentence_offsets.tolist())
+            self.assertEqual(other_rejections, rejections)
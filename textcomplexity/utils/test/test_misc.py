@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import statistics
+import unittest
+
+from textcomplexity import surface
+from textcomplexity.utils import misc
+from textcomplexity.utils.token import Token
+
+
+class TestBootstrap(unittest.TestCase):
+    def test_bootstrap_measures_01(self):
+        tokens = "a b a c d a b e f a g b h a i j a b c k l a m b".split()
+        tokens = [Token(t, "N/A") for t in tokens]
+        measures = [surface.type_token_ratio, surface.evenness, surface.sichel_s]
+        with self.assertWarns(UserWarning):
+            output = misc.bootstrap_measures(measures, tokens, window_size=6)
+        for measure, result in zip(measures, output):
+            with self.assertWarns(UserWarning):
+                self.assertEqual(misc.bootstrap(measure, tokens, window_size=6), result)
+
+
+class TestRunningStatistics(unittest.TestCase):
+    def test_running_statistics_01(self):
+        for values in ([3, 1, 4, 1, 5, 9, 2, 6], [0.1, 0.25, 1e10, -3.5, 0.1], [2, 0.5, 7]):
+            stats, other = misc.RunningStatistics(), misc.RunningStatistics()
+            stats.update(values[:3])
+            other.update(values[3:])
+            stats.merge(other)
+            self.assertEqual(stats.mean(), statistics.mean(values))
+            self.assertEqual(stats.stdev(), statistics.stdev(values))
+            self.assertIs(type(stats.mean()), type(statistics.mean(values)))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from textcomplexity import dependency
+from textcomplexity.index import read_document
+from textcomplexity.test.samples import random_trees
+from textcomplexity.utils import conllu, npz
+from textcomplexity.utils.test.test_treebank import CONLLU, TSV
+from textcomplexity.utils.vocabulary import Vocabulary
+
+
+def _round_trip(document, ps_trees=None, **kwargs):
+    f = io.BytesIO()
+    npz.save_document(f, document, ps_trees)
+    f.seek(0)
+    return npz.load_document(f, **kwargs)
+
+
+class TestNpz(unittest.TestCase):
+    def assertSameDocument(self, document, other):
+        self.assertEqual(document.tokens.words.decode(document.tokens.word_ids), other.tokens.words.decode(other.tokens.word_ids))
+        self.assertEqual(document.tokens.tags.decode(document.tokens.tag_ids), other.tokens.tags.decode(other.tokens.tag_ids))
+        self.assertEqual(document.sentence_offsets.tolist(), other.sentence_offsets.tolist())
+        trees, other_trees = document.dependency_trees, other.dependency_trees
+        for attribute in ("heads", "relations", "positions", "offsets"):
+            self.assertEqual(getattr(trees, attribute).tolist(), getattr(other_trees, attribute).tolist())
+        self.assertEqual(list(trees.graphs), list(other_trees.graphs))
+        for g, h in zip(trees, other_trees):
+            self.assertEqual(list(g.nodes(data="root")), list(h.nodes(data="root")))
+            self.assertEqual(sorted(g.edges(data="relation")), sorted(h.edges(data="relation")))
+
+    def test_conllu_01(self):
+        document = conllu.read_conllu_document(io.StringIO(CONLLU))
+        other, ps_trees = _round_trip(document)
+        self.assertIsNone(ps_trees)
+        self.assertSameDocument(document, other)
+        self.assertEqual(other.upos.decode(other.upos_ids), document.upos.decode(document.upos_ids))
+
+    def test_conllu_02(self):
+        # enhanced dependencies that are not trees
+        document = conllu.read_conllu_document(io.StringIO(random_trees(200, 3)))
+        self.assertGreater(len(document.dependency_trees.graphs), 0)
+        relations = list(document.dependency_trees.relation_vocabulary.strings)
+        other, ps_trees = _round_trip(document)
+        # saving does not change the vocabularies of the document
+        self.assertEqual(document.dependency_trees.relation_vocabulary.strings, relations)
+        self.assertSameDocument(document, other)
+        for measure in (dependency.average_dependency_distance, dependency.closeness_centrality, dependency.longest_shortest_path):
+            self.assertEqual(measure(other.dependency_trees), measure(document.dependency_trees))
+
+    def test_tsv_01(self):
+        document, ps_trees = read_document(io.StringIO(TSV), "tsv")
+        other, other_ps_trees = _round_trip(document, ps_trees)
+        self.assertSameDocument(document, other)
+        self.assertEqual(other_ps_trees.label_vocabulary.decode(other_ps_trees.labels), ps_trees.label_vocabulary.decode(ps_trees.labels))
+        for attribute in ("parents", "starts", "ends", "offsets"):
+            self.assertEqual(getattr(other_ps_trees, attribute).tolist(), getattr(ps_trees, attribute).tolist())
+
+    def test_shared_vocabularies(self):
+        # ids are the same as if the texts had been read with shared
+        # vocabularies
+        words, tags = Vocabulary(), Vocabulary()
+        texts = [CONLLU, random_trees(20, 5)]
+        expected = [conllu.read_conllu_document(io.StringIO(text), words=words, tags=tags) for text in texts]
+        other_words, other_tags = Vocabulary(), Vocabulary()
+        for text, document in zip(texts, expected):
+            other, ps_trees = _round_trip(conllu.read_conllu_document(io.StringIO(text)), words=other_words, tags=other_tags)
+            self.assertEqual(other.tokens.word_ids.tolist(), document.tokens.word_ids.tolist())
+            self.assertEqual(other.tokens.tag_ids.tolist(), document.tokens.tag_ids.tolist())
+
+    def test_ignore_case(self):
+        document = conllu.read_conllu_document(io.StringIO(CONLLU), ignore_case=True)
+        other, ps_trees = _round_trip(conllu.read_conllu_document(io.StringIO(CONLLU)), ignore_case=True)
+        self.assertEqual(other.tokens.word_ids.tolist(), document.tokens.word_ids.tolist())
+        self.assertEqual(other.tokens.words.strings, document.tokens.words.strings)
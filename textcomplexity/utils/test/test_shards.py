@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from textcomplexity.utils import shards
+
+
+class TestShards(unittest.TestCase):
+    def test_split_at_blank_lines_01(self):
+        sentences = ["1\ta\n2\tb\n", "# sent_id = 2\n1\tc\n", "1\td\n2\te\n3\tf\n"] * 20
+        text = "\n".join(sentences) + "\n \n\n"
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "text.conllu")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(text)
+            for n in (1, 2, 5, 100):
+                ranges = shards.split_at_blank_lines(filename, n, block_size=4)
+                self.assertLessEqual(len(ranges), n)
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], len(text.encode("utf-8")))
+                parts = []
+                for start, end in ranges:
+                    with shards.open_byte_range(filename, start, end) as f:
+                        parts.append(f.read())
+                self.assertEqual("".join(parts), text)
+                # every part but the last ends with an empty line
+                for part in parts[:-1]:
+                    self.assertEqual(part.split("\n")[-2].strip(), "")
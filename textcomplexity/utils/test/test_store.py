@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import io
+import tempfile
+import unittest
+
+import numpy as np
+
+from textcomplexity import sentence
+from textcomplexity.test.samples import random_trees
+from textcomplexity.utils import conllu
+from textcomplexity.utils.store import CorpusStore, CorpusStoreBuilder
+from textcomplexity.utils.test.test_treebank import CONLLU
+
+
+class TestCorpusStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.texts = [CONLLU, random_trees(100, 1), random_trees(1, 2), random_trees(50, 3)]
+        builder = CorpusStoreBuilder(self.directory.name)
+        for i, text in enumerate(self.texts):
+            document = conllu.read_conllu_document(io.StringIO(text), words=builder.words, tags=builder.tags, upos=builder.upos, relation_vocabulary=builder.relation_vocabulary)
+            builder.add_document("doc%d" % i, document)
+        self.store = builder.build()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_documents(self):
+        store = CorpusStore(self.directory.name)
+        self.assertEqual(len(store), len(self.texts))
+        self.assertEqual(store.names, ["doc0", "doc1", "doc2", "doc3"])
+        for i, text in enumerate(self.texts):
+            expected = conllu.read_conllu_document(io.StringIO(text))
+            document = store.document(i)
+            self.assertEqual(document.tokens.words.decode(document.tokens.word_ids), expected.tokens.words.decode(expected.tokens.word_ids))
+            self.assertEqual(document.tokens.tags.decode(document.tokens.tag_ids), expected.tokens.tags.decode(expected.tokens.tag_ids))
+            self.assertEqual(document.upos.decode(document.upos_ids), expected.upos.decode(expected.upos_ids))
+            self.assertEqual(document.sentence_offsets.tolist(), expected.sentence_offsets.tolist())
+            trees, expected_trees = document.dependency_trees, expected.dependency_trees
+            for attribute in ("heads", "positions", "offsets"):
+                self.assertEqual(getattr(trees, attribute).tolist(), getattr(expected_trees, attribute).tolist())
+            # relation ids refer to the vocabulary of the store
+            self.assertEqual([trees.relation_vocabulary[r] if r != -1 else None for r in trees.relations.tolist()],
+                             [expected_trees.relation_vocabulary[r] if r != -1 else None for r in expected_trees.relations.tolist()])
+            self.assertEqual(list(trees.graphs), list(expected_trees.graphs))
+            for g, h in zip(trees, expected_trees):
+                self.assertEqual(list(g.nodes(data="root")), list(h.nodes(data="root")))
+                self.assertEqual(sorted(g.edges(data="relation")), sorted(h.edges(data="relation")))
+
+    def test_views(self):
+        document = self.store.document(1)
+        columns = self.store.columns
+        for array, column in ((document.tokens.word_ids, "word_ids"), (document.sentence_offsets, "sentence_offsets"),
+                              (document.dependency_trees.heads, "dep_heads"), (document.dependency_trees.offsets, "dep_offsets")):
+            self.assertTrue(np.shares_memory(array, columns[column]))
+            self.assertFalse(array.flags.writeable)
+
+    def test_ignore_case(self):
+        store = CorpusStore(self.directory.name, ignore_case=True)
+        expected = conllu.read_conllu_document(io.StringIO(CONLLU), ignore_case=True)
+        document = store.document(0)
+        self.assertEqual(document.tokens.words.decode(document.tokens.word_ids), expected.tokens.words.decode(expected.tokens.word_ids))
+
+    def test_sentence_measures(self):
+        # sentence-based measures on views give the same results as on
+        # lists of tokens
+        punctuation = {"$.", "PUNCT"}
+        for i in range(len(self.store)):
+            document = self.store.document(i)
+            sentences = [list(s) for s in document.sentences()]
+            self.assertEqual(sentence.punctuation_per_token(document, punctuation), sentence.punctuation_per_token(sentences, punctuation))
+            if len(sentences) < 2:
+                continue
+            self.assertEqual(sentence.sentence_length_tokens(document), sentence.sentence_length_tokens(sentences))
+            self.assertEqual(sentence.sentence_length_words(document, punctuation), sentence.sentence_length_words(sentences, punctuation))
+            self.assertEqual(sentence.sentence_length_characters(document), sentence.sentence_length_characters(sentences))
+            self.assertEqual(sentence.punctuation_per_sentence(document, punctuation), sentence.punctuation_per_sentence(sentences, punctuation))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from textcomplexity.utils.text import Text, EncodedText
+from textcomplexity.utils.token import Token, TokenArray
+
+
+class TestEncodedText(unittest.TestCase):
+    def test_encoded_text_01(self):
+        tokens = "d c b i c i i h b a d a i e b j h d a j j h a f".split()
+        tokens = [Token(t, t.upper()) for t in tokens]
+        text = Text.from_tokens(tokens)
+        encoded = Text.from_tokens(TokenArray.from_tokens(tokens))
+        self.assertIsInstance(encoded, EncodedText)
+        self.assertEqual(encoded.tokens, text.tokens)
+        self.assertEqual(encoded.tags, text.tags)
+        self.assertEqual(encoded.text_length, text.text_length)
+        self.assertEqual(encoded.vocabulary_size, text.vocabulary_size)
+        self.assertEqual(list(encoded.frequency_list.items()), list(text.frequency_list.items()))
+        self.assertEqual(list(encoded.frequency_spectrum.items()), list(text.frequency_spectrum.items()))
+
+    def test_token_array_slice_01(self):
+        tokens = [Token(t, "N/A") for t in "a b c d e f".split()]
+        token_array = TokenArray.from_tokens(tokens)
+        self.assertEqual([t.word for t in token_array[2:5]], ["c", "d", "e"])
+        self.assertEqual(token_array[1].word, "b")
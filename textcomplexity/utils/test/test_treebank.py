@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import collections
+import io
+import unittest
+
+from textcomplexity.utils import conllu, custom_tsv
+from textcomplexity.utils.treebank import ConstituencyTrees
+
+CONLLU = """# sent_id = s1
+1	Netscape	Netscape	PROPN	NE	_	3	nsubj	_	_
+2-3	hatte's	_	_	_	_	_	_	_	_
+2	hatte	haben	AUX	VAFIN	_	3	aux	_	_
+3	beherrscht	beherrschen	VERB	VVPP	_	0	root	_	_
+4	.	.	PUNCT	$.	_	3	punct	_	_
+
+# sent_id = s2
+1	Sieben	sieben	NUM	CARD	_	3	nummod	3:nummod	_
+2	und	und	CCONJ	KON	_	3	cc	3:cc	_
+3	weitere	weitere	ADJ	ADJA	_	0	root	0:root	_
+4	begleiteten	begleiten	VERB	VVFIN	_	3	conj	3:conj|1:dep	_
+
+"""
+
+TSV = """1	Der	ART	2	NK	(TOP(S(NP*
+2	Mann	NN	3	SB	*)
+3	sagt	VVFIN	-1	--	*
+4	(	$(	3	PUNC	*
+5	nichts	PIS	3	OA	*)
+6	.	$.	3	PUNC	*)
+
+1	Falsch	ADJD	-1	--	(TOP(AP*
+2	.	$.	1	PUNC	*)
+
+"""
+
+
+class TestDependencyTrees(unittest.TestCase):
+    def test_dependency_trees_01(self):
+        graphs = [g for tokens, g in conllu.read_conllu_sentences(io.StringIO(CONLLU))]
+        sentences, trees = conllu.read_conllu_treebank(io.StringIO(CONLLU))
+        self.assertEqual(len(trees), 2)
+        self.assertEqual(trees.positions[trees.offsets[0]:trees.offsets[1]].tolist(), [0, 2, 3, 4])
+        self.assertEqual(trees.heads[trees.offsets[0]:trees.offsets[1]].tolist(), [2, 2, -1, 2])
+        # the second sentence is not a tree and is kept as graph
+        self.assertEqual(list(trees.graphs), [1])
+        for g, h in zip(graphs, trees):
+            self.assertEqual(list(g.nodes(data="root")), list(h.nodes(data="root")))
+            self.assertEqual(sorted(g.edges(data="relation")), sorted(h.edges(data="relation")))
+
+
+class TestConstituencyTrees(unittest.TestCase):
+    def test_constituency_trees_01(self):
+        nltk_trees = [tree for tokens, g, tree in custom_tsv.read_tsv_sentences(io.StringIO(TSV))]
+        sentences, dependency_trees, trees = custom_tsv.read_tsv_treebank(io.StringIO(TSV))
+        self.assertEqual(len(trees), 1)
+        self.assertEqual(trees.label_vocabulary.decode(trees.labels), ["TOP", "S", "NP", "ART", "NN", "VVFIN", "$-LRB-", "PIS", "$."])
+        self.assertEqual(trees.parents.tolist(), [-1, 0, 1, 2, 2, 1, 1, 1, 0])
+        self.assertEqual(trees.starts.tolist(), [0, 0, 0, 0, 1, 2, 3, 4, 5])
+        self.assertEqual(trees.ends.tolist(), [6, 5, 2, 1, 2, 3, 4, 5, 6])
+        other = ConstituencyTrees.from_trees(nltk_trees)
+        for attribute in ("parents", "starts", "ends", "offsets"):
+            self.assertEqual(getattr(trees, attribute).tolist(), getattr(other, attribute).tolist())
+
+
+class TestConlluDocument(unittest.TestCase):
+    def test_read_conllu_document_01(self):
+        sentences, trees = conllu.read_conllu_treebank(io.StringIO(CONLLU))
+        # small chunks, so that lines and sentences are split across chunks
+        document = conllu.read_conllu_document(io.StringIO(CONLLU + "\n\n"), chunk_size=7)
+        self.assertEqual(len(document), 2)
+        self.assertEqual([[t.word for t in s] for s in document.sentences()], [[t.word for t in s] for s in sentences])
+        self.assertEqual([[t.pos for t in s] for s in document.sentences()], [[t.pos for t in s] for s in sentences])
+        self.assertEqual(document.upos.decode(document.upos_ids), ["PROPN", "_", "PUNCT", "NUM", "CCONJ", "ADJ", "VERB"])
+        for attribute in ("heads", "relations", "positions", "offsets"):
+            self.assertEqual(getattr(document.dependency_trees, attribute).tolist(), getattr(trees, attribute).tolist())
+        self.assertEqual(list(document.dependency_trees.graphs), list(trees.graphs))
+
+    def test_empty_sentences(self):
+        # additional empty lines are rejected as by read_conllu_treebank
+        text = "\n" + CONLLU + "\n\n"
+        expected = collections.Counter()
+        conllu.read_conllu_treebank(io.StringIO(text), rejections=expected)
+        self.assertEqual(sum(expected.values()), 3)
+        for validate in (True, False):
+            rejections = collections.Counter()
+            document = conllu.read_conllu_document(io.StringIO(text), chunk_size=7, validate=validate, rejections=rejections)
+            self.assertEqual(len(document), 2)
+            self.assertEqual(rejections, expected)
+
+    def test_malformed_lines(self):
+        text = CONLLU.replace("\t_\n", "\n", 1)
+        with self.assertRaises(ValueError):
+            conllu.read_conllu_document(io.StringIO(text))
+        with self.assertRaises(ValueError):
+            list(conllu.read_conllu_treebank(io.StringIO(text)))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import collections
+import io
+import json
+import unittest
+
+from textcomplexity.utils import writers
+
+Result = collections.namedtuple("Result", ["name", "value", "stdev", "length", "length_stdev"])
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.results = [("a.conllu", [Result("x", 1.5, None, None, None), Result("y", 2, 0.5, None, None)]),
+                        ("b.conllu", [Result("x", 3.25, None, None, None), Result("z", 4, 1.0, 7.5, 2.0)])]
+
+    def _write(self, output_format, results):
+        f = io.StringIO()
+        writer = writers.WRITERS[output_format](f, ["x", "y", "z"])
+        for name, r in results:
+            writer.write(name, r)
+        writer.close()
+        return f.getvalue()
+
+    def test_json(self):
+        for results in (self.results, self.results[:1], []):
+            expected = {name: writers.result_dict(r) for name, r in results}
+            self.assertEqual(self._write("json", results), json.dumps(expected, ensure_ascii=False, indent=4) + "\n")
+
+    def test_jsonl(self):
+        lines = self._write("jsonl", self.results).splitlines()
+        self.assertEqual([json.loads(line)["filename"] for line in lines], ["a.conllu", "b.conllu"])
+        self.assertEqual(json.loads(lines[1])["results"]["z"], {"value": 4, "stdev": 1.0, "length": 7.5, "length stdev": 2.0})
+
+    def test_tsv(self):
+        self.assertEqual(self._write("tsv", self.results), "filename\tx\ty\tz\na.conllu\t1.5\t2\t\nb.conllu\t3.25\t\t4\n")
+
+    def test_tsv_missing_column(self):
+        results = [(name, r + [Result("w", 0, None, None, None)]) for name, r in self.results]
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(self._write("tsv", results), self._write("tsv", self.results))
+        self.assertEqual(len(logs.output), 1)
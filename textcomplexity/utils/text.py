@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
 import collections
+import functools
+
+import numpy as np
+
+from textcomplexity.utils.token import TokenArray
 
 
 class Text:
@@ -16,9 +21,11 @@ class Text:
     @classmethod
     def from_tokens(cls, tokens):
         """Create Text object from iterable of tokens, i.e. named tuples
-        (word, pos).
+        (word, pos). If tokens is a TokenArray, return an EncodedText.
 
         """
+        if isinstance(tokens, TokenArray):
+            return EncodedText(tokens)
         toks = [t.word for t in tokens]
         tags = [t.pos for t in tokens]
         text_length = len(tokens)
@@ -26,3 +33,39 @@ class Text:
         vocabulary_size = len(frequency_list)
         frequency_spectrum = dict(collections.Counter(frequency_list.values()))
         return cls(toks, tags, text_length, vocabulary_size, frequency_list, frequency_spectrum)
+
+
+class EncodedText(Text):
+    """Text backed by a TokenArray. Frequency list and frequency
+    spectrum are computed with NumPy on the int-encoded tokens; the
+    attributes tokens, tags and frequency_list are only decoded to
+    strings when they are accessed.
+
+    """
+
+    def __init__(self, token_array):
+        self.token_array = token_array
+        self.token_ids = token_array.word_ids
+        self.text_length = len(token_array)
+        # types in order of first occurrence, as with collections.Counter
+        type_ids, first, counts = np.unique(self.token_ids, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        self.type_ids = type_ids[order]
+        self.type_frequencies = counts[order]
+        self.vocabulary_size = len(self.type_ids)
+        freqs, first = np.unique(self.type_frequencies, return_index=True)
+        freq_sizes = np.bincount(self.type_frequencies)[freqs]
+        order = np.argsort(first)
+        self.frequency_spectrum = dict(zip(freqs[order].tolist(), freq_sizes[order].tolist()))
+
+    @functools.cached_property
+    def tokens(self):
+        return self.token_array.words.decode(self.token_ids)
+
+    @functools.cached_property
+    def tags(self):
+        return self.token_array.tags.decode(self.token_array.tag_ids)
+
+    @functools.cached_property
+    def frequency_list(self):
+        return collections.Counter(dict(zip(self.token_array.words.decode(self.type_ids), self.type_frequencies.tolist())))
@@ -1,7 +1,53 @@
 #!/usr/bin/env python3
 
+import numpy as np
+
+from textcomplexity.utils.vocabulary import Vocabulary
+
+
 class Token:
     def __init__(self, word, pos, upos=""):
         self.word = word
         self.pos = pos
         self.upos = upos
+
+
+class TokenArray:
+    """Int-encoded sequence of tokens. Word forms and part-of-speech
+    tags are stored as int32 arrays of ids into the vocabularies words
+    and tags, which can be shared by all texts of a corpus. Slicing
+    returns a TokenArray that shares memory with the original one.
+
+    """
+
+    def __init__(self, word_ids, tag_ids, words, tags):
+        self.word_ids = word_ids
+        self.tag_ids = tag_ids
+        self.words = words
+        self.tags = tags
+
+    @classmethod
+    def from_tokens(cls, tokens, words=None, tags=None):
+        """Create TokenArray from iterable of tokens, i.e. objects with
+        attributes word and pos.
+
+        """
+        if words is None:
+            words = Vocabulary()
+        if tags is None:
+            tags = Vocabulary()
+        word_ids = words.encode((t.word for t in tokens))
+        tag_ids = tags.encode((t.pos for t in tokens))
+        return cls(word_ids, tag_ids, words, tags)
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return Token(self.words[self.word_ids[key]], self.tags[self.tag_ids[key]])
+        return TokenArray(self.word_ids[key], self.tag_ids[key], self.words, self.tags)
+
+    def __iter__(self):
+        for word, tag in zip(self.words.decode(self.word_ids), self.tags.decode(self.tag_ids)):
+            yield Token(word, tag)
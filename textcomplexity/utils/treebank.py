@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import array
+
+import numpy as np
+
+from textcomplexity.utils.vocabulary import Vocabulary
+
+
+class DependencyTrees:
+    """Dependency trees of a whole corpus, stored as flat arrays with
+    one entry per vertex and per-sentence offsets:
+
+    heads: Index of the governor within the sentence (-1 for the root
+    vertex).
+
+    relations: Id of the dependency relation in the vocabulary
+    relation_vocabulary (-1 for the root vertex).
+
+    positions: Position of the vertex in the sentence. Dependency
+    distances are computed on positions, i.e. they are the same as
+    for the vertex labels of the corresponding networkx graph.
+
+    offsets: Vertices of sentence i are at offsets[i]:offsets[i + 1].
+
+    Sentences that are not trees, e.g. enhanced dependency graphs with
+    more than one governor per vertex, are kept as networkx.DiGraph
+    objects in the dictionary graphs (keyed by sentence index). In the
+    arrays, all their vertices have head -1.
+
+    """
+
+    def __init__(self, heads, relations, positions, offsets, relation_vocabulary, graphs=None):
+        self.heads = heads
+        self.relations = relations
+        self.positions = positions
+        self.offsets = offsets
+        self.relation_vocabulary = relation_vocabulary
+        self.graphs = {} if graphs is None else graphs
+
+    @classmethod
+    def from_graphs(cls, graphs, relation_vocabulary=None):
+        """Create DependencyTrees from an iterable of networkx.DiGraph
+        objects as created by the readers in textcomplexity.utils. The
+        graphs are converted one by one, so that only those that are
+        not trees are kept in memory.
+
+        """
+        builder = DependencyTreesBuilder(relation_vocabulary)
+        for g in graphs:
+            builder.add_graph(g)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.graph(i)
+
+    def sentence_lengths(self):
+        """Number of vertices in every sentence."""
+        return np.diff(self.offsets)
+
+    def graph(self, i):
+        """Return sentence i as networkx.DiGraph."""
+        if i in self.graphs:
+            return self.graphs[i]
+        import networkx
+        start, end = self.offsets[i], self.offsets[i + 1]
+        heads = self.heads[start:end].tolist()
+        relations = self.relations[start:end].tolist()
+        positions = self.positions[start:end].tolist()
+        g = networkx.DiGraph()
+        g.add_nodes_from(positions)
+        for position, head, relation in zip(positions, heads, relations):
+            if head == -1:
+                g.nodes[position]["root"] = "root"
+            else:
+                g.add_edge(positions[head], position, relation=self.relation_vocabulary[relation])
+        return g
+
+
+class DependencyTreesBuilder:
+    """Collect sentences for a DependencyTrees object."""
+
+    def __init__(self, relation_vocabulary=None):
+        self.relation_vocabulary = Vocabulary() if relation_vocabulary is None else relation_vocabulary
+        self.heads = array.array("i")
+        self.relations = array.array("i")
+        self.positions = array.array("i")
+        self.offsets = array.array("q", [0])
+        self.graphs = {}
+
+    def add_tree(self, heads, relations, positions):
+        """Add a sentence given as lists of governor indices (-1 for the
+        root), relation names (None for the root) and positions.
+
+        """
+        self.heads.extend(heads)
+        self.relations.extend((-1 if r is None else self.relation_vocabulary.add(r) for r in relations))
+        self.positions.extend(positions)
+        self.offsets.append(len(self.heads))
+
+    def add_graph(self, g):
+        """Add a sentence given as networkx.DiGraph with a vertex that is
+        labeled as root. If the graph is not a tree, it is stored as
+        is.
+
+        """
+        vertices = sorted(g.nodes)
+        index = {v: i for i, v in enumerate(vertices)}
+        heads = [-1] * len(vertices)
+        relations = [None] * len(vertices)
+        is_tree = g.number_of_edges() == len(vertices) - 1
+        for s, t, relation in g.edges(data="relation"):
+            if heads[index[t]] != -1:
+                is_tree = False
+                break
+            heads[index[t]] = index[s]
+            relations[index[t]] = relation
+        if is_tree:
+            is_tree = all(("root" in l) == (heads[index[v]] == -1) for v, l in g.nodes(data=True))
+        if not is_tree:
+            self.graphs[len(self.offsets) - 1] = g
+            heads = [-1] * len(vertices)
+            relations = [None] * len(vertices)
+        self.add_tree(heads, relations, vertices)
+
+    def build(self):
+        """Return the DependencyTrees object."""
+        return DependencyTrees(np.frombuffer(self.heads, dtype=np.intc),
+                               np.frombuffer(self.relations, dtype=np.intc),
+                               np.frombuffer(self.positions, dtype=np.intc),
+                               np.frombuffer(self.offsets, dtype=np.int64),
+                               self.relation_vocabulary,
+                               self.graphs)
+
+
+class ConstituencyTrees:
+    """Phrase structure trees of a whole corpus, stored as flat arrays
+    with one entry per node and per-sentence offsets. The nodes of a
+    sentence are in preorder, i.e. the root comes first, and include
+    the preterminals (part-of-speech tags), but not the leaves:
+
+    labels: Id of the node label in the vocabulary label_vocabulary.
+
+    parents: Index of the parent node within the sentence (-1 for the
+    root).
+
+    starts, ends: The node spans the leaves starts[i]:ends[i] of the
+    sentence.
+
+    offsets: Nodes of sentence i are at offsets[i]:offsets[i + 1].
+
+    """
+
+    def __init__(self, labels, parents, starts, ends, offsets, label_vocabulary):
+        self.labels = labels
+        self.parents = parents
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.label_vocabulary = label_vocabulary
+
+    @classmethod
+    def from_trees(cls, trees, label_vocabulary=None):
+        """Create ConstituencyTrees from an iterable of nltk.tree.Tree
+        objects.
+
+        """
+        builder = ConstituencyTreesBuilder(label_vocabulary)
+        for tree in trees:
+            builder.add_nltk_tree(tree)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sentence_index(self):
+        """Index of the sentence of every node."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def global_parents(self):
+        """Corpus-wide index of the parent of every node (-1 for the
+        roots).
+
+        """
+        sentence_starts = np.repeat(self.offsets[:-1], np.diff(self.offsets))
+        return np.where(self.parents == -1, -1, self.parents + sentence_starts)
+
+
+class ConstituencyTreesBuilder:
+    """Collect sentences for a ConstituencyTrees object."""
+
+    def __init__(self, label_vocabulary=None):
+        self.label_vocabulary = Vocabulary() if label_vocabulary is None else label_vocabulary
+        self.labels = array.array("i")
+        self.parents = array.array("i")
+        self.starts = array.array("i")
+        self.ends = array.array("i")
+        self.offsets = array.array("q", [0])
+
+    def add_tree(self, labels, parents, starts, ends):
+        """Add a sentence given as lists of node labels, parent indices,
+        span starts and span ends (nodes in preorder).
+
+        """
+        self.labels.extend(self.label_vocabulary.add(label) for label in labels)
+        self.parents.extend(parents)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.offsets.append(len(self.labels))
+
+    def add_nltk_tree(self, tree):
+        """Add a sentence given as nltk.tree.Tree."""
+        labels, parents, starts, ends = [], [], [], []
+
+        def visit(node, parent, start):
+            i = len(labels)
+            labels.append(node.label())
+            parents.append(parent)
+            starts.append(start)
+            ends.append(None)
+            end = start
+            for child in node:
+                if isinstance(child, str):
+                    end += 1
+                else:
+                    end = visit(child, i, end)
+            ends[i] = end
+            return end
+
+        visit(tree, -1, 0)
+        self.add_tree(labels, parents, starts, ends)
+
+    def build(self):
+        """Return the ConstituencyTrees object."""
+        return ConstituencyTrees(np.frombuffer(self.labels, dtype=np.intc),
+                                 np.frombuffer(self.parents, dtype=np.intc),
+                                 np.frombuffer(self.starts, dtype=np.intc),
+                                 np.frombuffer(self.ends, dtype=np.intc),
+                                 np.frombuffer(self.offsets, dtype=np.int64),
+                                 self.label_vocabulary)
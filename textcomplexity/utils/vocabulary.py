@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import numpy as np
+
+
+class Vocabulary:
+    """Map strings (e.g. word forms or part-of-speech tags) to integer
+    ids and back. Ids are assigned consecutively in order of first
+    occurrence.
+
+    """
+
+    def __init__(self, strings=()):
+        self.strings = []
+        self.ids = {}
+        for s in strings:
+            self.add(s)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, s):
+        return s in self.ids
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def add(self, s):
+        """Return the id of s; add s to the vocabulary if necessary."""
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.ids[s] = i
+            self.strings.append(s)
+        return i
+
+    def encode(self, strings):
+        """Return an int32 array with the ids of strings; unknown strings
+        are added to the vocabulary.
+
+        """
+        ids = self.ids
+        setdefault = ids.setdefault
+        # new strings get the next id, i.e. the current size of ids
+        encoded = np.array([setdefault(s, len(ids)) for s in strings], dtype=np.int32)
+        self.strings.extend(itertools.islice(ids, len(self.strings), None))
+        return encoded
+
+    def decode(self, ids):
+        """Return the list of strings for an iterable of ids."""
+        strings = self.strings
+        return [strings[i] for i in ids]
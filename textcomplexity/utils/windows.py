@@ -3,10 +3,15 @@
 import collections
 import warnings
 
+import numpy as np
+
 from textcomplexity.utils.text import Text
+from textcomplexity.utils.token import TokenArray
+
+WindowStatistics = collections.namedtuple("WindowStatistics", ["text_length", "vocabulary_size", "hapaxes", "frequency_spectrum"])
 
 
-def disjoint_windows(tokens, window_size, strategy="spread"):
+def disjoint_windows(tokens, window_size, strategy="spread", starts=None):
     """Yield disjoint windows of text. If the last window would be smaller
     than window_size, the position of the windows is determined
     according to strategy.
@@ -23,14 +28,57 @@ def disjoint_windows(tokens, window_size, strategy="spread"):
     strategy="spread": Spread out the windows, omitting tokens between
     the windows.
 
+    tokens can be a list of tokens or a TokenArray; in the latter case,
+    the windows are EncodedText objects. Instead of a strategy, the
+    start positions of the windows can also be given explicitly.
+
+    """
+    if starts is None:
+        starts = window_starts(len(tokens), window_size, strategy)
+    for start in starts:
+        yield Text.from_tokens(tokens[start:start + window_size])
+
+
+def batch_window_statistics(tokens, window_size, strategy="spread", starts=None):
+    """Compute the statistics of all disjoint windows (see
+    disjoint_windows) in one pass. tokens can be a TokenArray or an
+    array of token ids. Return a WindowStatistics object with arrays
+    that have one entry (or row) per window: text_length,
+    vocabulary_size, hapaxes and frequency_spectrum, where
+    frequency_spectrum[i, f] is the number of types with frequency f
+    in window i. As in disjoint_windows, the start positions of the
+    windows can be given explicitly.
+
     """
+    if isinstance(tokens, TokenArray):
+        tokens = tokens.word_ids
+    if starts is None:
+        starts = window_starts(len(tokens), window_size, strategy)
+    starts = np.array(starts, dtype=np.int64)
+    n_windows = len(starts)
+    # sort the token ids within every window; runs of identical ids
+    # are the types of the window
+    ids = np.sort(tokens[starts.reshape(-1, 1) + np.arange(window_size)], axis=1)
+    new_type = np.ones(ids.shape, dtype=bool)
+    new_type[:, 1:] = ids[:, 1:] != ids[:, :-1]
+    type_starts = np.flatnonzero(new_type)
+    type_frequencies = np.diff(np.append(type_starts, ids.size))
+    window_of_type = type_starts // window_size
+    vocabulary_size = np.bincount(window_of_type, minlength=n_windows)
+    frequency_spectrum = np.bincount(window_of_type * (window_size + 1) + type_frequencies, minlength=n_windows * (window_size + 1)).reshape(n_windows, window_size + 1)
+    text_length = np.full(n_windows, window_size)
+    return WindowStatistics(text_length, vocabulary_size, frequency_spectrum[:, 1], frequency_spectrum)
+
+
+def window_starts(text_length, window_size, strategy="spread"):
+    """Return the start positions of the disjoint windows."""
     strategies = set("left right center spread".split())
     assert strategy in strategies
-    text_length = len(tokens)
     assert window_size <= text_length
     n_windows, rest = divmod(text_length, window_size)
     if n_windows < 5:
         warnings.warn(f"Less than five windows for text length {text_length} and window size {window_size}. Results might be unreliable. You might want to decrease the window size.", UserWarning)
+    starts = []
     for i in range(n_windows):
         if strategy == "left":
             skip = 0
@@ -43,7 +91,8 @@ def disjoint_windows(tokens, window_size, strategy="spread"):
                 skip = (i * rest) // (n_windows - 1)
             else:
                 skip = rest // 2
-        yield Text.from_tokens(tokens[skip + i * window_size:(skip + i * window_size) + window_size])
+        starts.append(skip + i * window_size)
+    return starts
 
 
 def moving_windows(tokens, window_size, step_size=1):
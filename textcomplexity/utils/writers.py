@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+
+
+def result_dict(results):
+    """Return a dictionary with value, standard deviation and length
+    (if available) of every result.
+
+    """
+    d = {}
+    for r in results:
+        d[r.name] = {"value": r.value}
+        if r.stdev is not None:
+            d[r.name]["stdev"] = r.stdev
+        if r.length is not None:
+            d[r.name]["length"] = r.length
+            d[r.name]["length stdev"] = r.length_stdev
+    return d
+
+
+class JsonWriter:
+    """Write the results of all files as one JSON object with the file
+    names as keys. Every file is written as soon as its results are
+    available; the output is the same as that of json.dumps with
+    indent=4 for the complete object.
+
+    """
+
+    def __init__(self, f, columns):
+        self.f = f
+        self.empty = True
+
+    def write(self, name, results):
+        entry = json.dumps({name: result_dict(results)}, ensure_ascii=False, indent=4)
+        # strip the braces of the enclosing object
+        self.f.write(("{\n" if self.empty else ",\n") + entry[2:-2])
+        self.f.flush()
+        self.empty = False
+
+    def close(self):
+        self.f.write("{}\n" if self.empty else "\n}\n")
+        self.f.flush()
+
+
+class JsonLinesWriter:
+    """Write one JSON object per file and line, with the file name and
+    the results.
+
+    """
+
+    def __init__(self, f, columns):
+        self.f = f
+
+    def write(self, name, results):
+        self.f.write(json.dumps({"filename": name, "results": result_dict(results)}, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class TsvWriter:
+    """Write one line of tab-separated values per file, i.e. the values
+    of the results (without standard deviations and lengths). The
+    columns are fixed in advance; results that are missing for a file
+    are written as empty cells. Results that have no column are
+    dropped with a warning (once per name).
+
+    """
+
+    def __init__(self, f, columns):
+        self.f = f
+        self.columns = columns
+        # columns and the names that have already been warned about
+        self.known = set(columns)
+        self.f.write("\t".join(["filename"] + columns) + "\n")
+
+    def write(self, name, results):
+        values = {r.name: str(r.value) for r in results}
+        dropped = values.keys() - self.known
+        if dropped:
+            logging.warning("The TSV output has no columns for these results of %s: %s" % (name, ", ".join(sorted(dropped))))
+            self.known.update(dropped)
+        self.f.write("\t".join([name] + [values.get(column, "") for column in self.columns]) + "\n")
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+WRITERS = {"json": JsonWriter, "jsonl": JsonLinesWriter, "tsv": TsvWriter}